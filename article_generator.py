@@ -20,23 +20,35 @@ if sys.platform == 'win32':
 import os
 import re
 import csv
-import json
 import argparse
 import pathlib
 import random
+import shutil
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from typing import Any, Dict, List, Tuple, Optional
 
 # 共通モジュール
 from lib.config import Config
 from lib.llm import LLMClient
-from lib.utils import read_text, read_json, read_lines_strip, save_text, save_json
+from lib.csv_status import FixedWidthStatusCSV
+from lib.utils import read_text, read_json, read_lines_strip, save_text, save_json, dumps_json, write_bytes_atomic
+
+try:
+    from lib.semantic_cache import SemanticCache, embed_texts
+except ImportError:
+    SemanticCache = None
+    embed_texts = None
 
 ROOT = pathlib.Path(__file__).resolve().parent
 
 
 # ─────────────── プレースホルダ処理 ───────────────
 _PLACEHOLDER_LINE_RE = re.compile(r'^\s*[#>\-\s]*<{3}[^>]+>{3}\s*$')
+_H1_PAT = re.compile(r'^\s*#\s*(.+?)\s*$')
+_TITLE_NORM_RE = re.compile(r"[ \t\u3000「」『』\"'【】\[\]()（）!?！？\-—｜|：:・…]")
+_SLUG_RE = re.compile(r"[^0-9A-Za-z一-龥ぁ-んァ-ヶー_]+")
 
 def preprocess_prompt(text: str, selected_title: str, primary_keyword: str) -> str:
     """プロンプト前処理"""
@@ -44,38 +56,46 @@ def preprocess_prompt(text: str, selected_title: str, primary_keyword: str) -> s
         return text
     text = text.replace("<<<SELECTED_TITLE>>>", selected_title)
     text = text.replace("<<<PRIMARY_KEYWORD>>>", primary_keyword)
-    lines = [ln for ln in text.splitlines() if not _PLACEHOLDER_LINE_RE.match(ln)]
+    # 残りのプレースホルダが無ければ行単位の正規表現は不要
+    if "<<<" not in text:
+        return "\n".join(text.splitlines()).strip()
+    lines = [ln for ln in text.splitlines()
+             if "<<<" not in ln or not _PLACEHOLDER_LINE_RE.match(ln)]
     return "\n".join(lines).strip()
 
 def sanitize_generated_markdown(md: str, selected_title: str) -> str:
-    """生成物のサニタイズ"""
-    lines = [ln for ln in md.splitlines() if not _PLACEHOLDER_LINE_RE.match(ln)]
-    
-    # H1正規化
-    h1_pat = re.compile(r'^\s*#\s*(.+?)\s*$')
-    found_h1 = False
-    new_lines = []
-    for ln in lines:
-        m = h1_pat.match(ln)
-        if m and not found_h1:
-            new_lines.append(f"# {selected_title}")
-            found_h1 = True
-        else:
-            new_lines.append(ln)
-    lines = new_lines
-    
-    # 重複H1削除
-    deduped = []
+    """
+    生成物のサニタイズ（1パス）
+    - プレースホルダ行を削除
+    - 最初の見出し行を「# {selected_title}」に正規化
+    - 以降に現れる同名H1は重複として削除
+    """
+    title = selected_title.strip()
+    # 高速経路：プレースホルダが無く、最初の見出しが既に「# {selected_title}」で
+    # タイトルが他に現れない（＝同名見出しの重複も無い）なら何も変わらない
+    if "<<<" not in md and title and md.count(title) <= 1:
+        lines = md.splitlines()
+        first = next((ln for ln in lines if "#" in ln and _H1_PAT.match(ln)), None)
+        if first is None or first == f"# {selected_title}":
+            return "\n".join(lines).strip()
+    
+    out: List[str] = []
     h1_seen = False
-    for ln in lines:
-        m = h1_pat.match(ln)
-        if m and m.group(1).strip() == selected_title.strip():
-            if h1_seen:
+    # 正規表現は "<<<" / "#" を含む行だけに掛ける（大半の本文行は部分文字列検索で素通り）
+    for ln in md.splitlines():
+        if "<<<" in ln and _PLACEHOLDER_LINE_RE.match(ln):
+            continue
+        m = _H1_PAT.match(ln) if "#" in ln else None
+        if m:
+            if not h1_seen:
+                out.append(f"# {selected_title}")
+                h1_seen = True
                 continue
-            h1_seen = True
-        deduped.append(ln)
+            if m.group(1).strip() == title:
+                continue
+        out.append(ln)
     
-    return "\n".join(deduped).strip()
+    return "\n".join(out).strip()
 
 # ─────────────── info派生ヘルパ ───────────────
 def derive_persona_label(info: Dict[str, Any]) -> str:
@@ -101,91 +121,221 @@ def derive_primary_keyword(info: Dict[str, Any]) -> str:
     raise ValueError("primary_keyword が info.json に存在しません")
 
 # ─────────────── プロンプト充填 ───────────────
-def fill_title_prompt(tpl: str, info: Dict[str, Any], persona_urls: List[str]) -> str:
-    return (tpl
-            .replace("<<<INFO_JSON>>>", json.dumps(info, ensure_ascii=False))
-            .replace("<<<PERSONA_URLS>>>", json.dumps(persona_urls, ensure_ascii=False))
-            .replace("<<<TITLE_SAMPLES>>>", json.dumps(title_samples(info), ensure_ascii=False))
-            .replace("<<<PRIMARY_KEYWORD>>>", derive_primary_keyword(info)))
-
-def fill_outline_prompt(tpl: str, info: Dict[str, Any], persona_urls: List[str], 
-                       selected_title: str) -> str:
-    return (tpl
-            .replace("<<<INFO_JSON>>>", json.dumps(info, ensure_ascii=False))
-            .replace("<<<PERSONA_URLS>>>", json.dumps(persona_urls, ensure_ascii=False))
-            .replace("<<<TITLE_SAMPLES>>>", json.dumps(title_samples(info), ensure_ascii=False))
-            .replace("<<<TARGET_NAME>>>", derive_target(info))
-            .replace("<<<PERSONA_LABEL>>>", derive_persona_label(info))
-            .replace("<<<SELECTED_TITLE>>>", selected_title))
-
-def fill_draft_prompt(tpl: str, info: Dict[str, Any], persona_urls: List[str], 
-                     outline_text: str) -> str:
-    approx_len = info.get("target_length_chars", 3000)
-    return (tpl
-            .replace("<<<INFO_JSON>>>", json.dumps(info, ensure_ascii=False))
-            .replace("<<<PERSONA_URLS>>>", json.dumps(persona_urls, ensure_ascii=False))
-            .replace("<<<OUTLINE_TEXT>>>", outline_text)
-            .replace("<<<TARGET_NAME>>>", derive_target(info))
-            .replace("<<<PERSONA_LABEL>>>", derive_persona_label(info))
-            .replace("<<<TARGET_LENGTH_CHARS>>>", str(approx_len)))
+# 行ごとに変わる値（キーワード・タイトル・アウトライン）はテンプレート中では記号参照に置き換え、
+# 本文は末尾の DYNAMIC セクションにまとめる。先頭（テンプレート＋固定情報）が全行で同一になり、
+# OpenAI の自動プロンプトキャッシュ（1024トークン以上のプレフィックス一致）が効く。
+DYNAMIC_SEPARATOR = "\n---DYNAMIC---\n"
+_DYNAMIC_REFS = {
+    "<<<PRIMARY_KEYWORD>>>": "【PRIMARY_KEYWORD】",
+    "<<<SELECTED_TITLE>>>": "【SELECTED_TITLE】",
+    "<<<OUTLINE_TEXT>>>": "【OUTLINE_TEXT】",
+}
+
+# 大きな固定資料（info/ペルソナURL/タイトル例）はプロンプトに埋め込まず、
+# 全呼び出しで共通の CONTEXT ドキュメント（system の先頭・キャッシュ対象）に1回だけ載せて参照する
+_CONTEXT_REFS = {
+    "<<<INFO_JSON>>>": "【CONTEXT: INFO_JSON】",
+    "<<<PERSONA_URLS>>>": "【CONTEXT: PERSONA_URLS】",
+    "<<<TITLE_SAMPLES>>>": "【CONTEXT: TITLE_SAMPLES】",
+}
+
+def build_context_doc(info_base: Dict[str, Any], persona_urls: List[str]) -> str:
+    """CONTEXT ドキュメント（Markdown）。CSVでは全行・全ステージで同一文字列"""
+    # primary_keyword は行ごとに変わるため DYNAMIC 側で渡す
+    stable_info = {k: v for k, v in info_base.items() if k != "primary_keyword"}
+    samples = title_samples(info_base)
+    return "\n".join([
+        "# CONTEXT（参照資料）",
+        "以下はユーザーメッセージ中の【CONTEXT: ...】から参照される資料です。",
+        "",
+        "## PERSONA_LABEL",
+        derive_persona_label(info_base),
+        "",
+        "## TARGET_NAME",
+        derive_target(info_base),
+        "",
+        "## TITLE_SAMPLES",
+        *([f"- {t}" for t in samples] or ["（なし）"]),
+        "",
+        "## PERSONA_URLS",
+        *([f"- {u}" for u in persona_urls] or ["（なし）"]),
+        "",
+        "## INFO_JSON",
+        "```json",
+        dumps_json(stable_info, indent=True),
+        "```",
+    ])
+
+def stable_placeholder_values(info_base: Dict[str, Any]) -> Dict[str, str]:
+    """行に依存しないプレースホルダの置換値（大きな資料は CONTEXT 参照に置き換える）"""
+    values = {
+        "<<<TARGET_NAME>>>": derive_target(info_base),
+        "<<<PERSONA_LABEL>>>": derive_persona_label(info_base),
+        "<<<TARGET_LENGTH_CHARS>>>": str(info_base.get("target_length_chars", 3000)),
+    }
+    values.update(_CONTEXT_REFS)
+    values.update(_DYNAMIC_REFS)
+    return values
+
+def build_stable_prefix(tpl: str, values: Dict[str, str]) -> str:
+    """行に依存しない部分だけを充填したプロンプト先頭部（CSV全行で共通）"""
+    for placeholder, value in values.items():
+        tpl = tpl.replace(placeholder, value)
+    return tpl
+
+def build_dynamic_suffix(kw: str, sel_title: str = "", outline: str = "",
+                         info_overrides: Optional[Dict[str, Any]] = None) -> str:
+    """行ごとに変わる値のセクション（空の値は出力しない）"""
+    parts = [f"{_DYNAMIC_REFS['<<<PRIMARY_KEYWORD>>>']}\n{kw}"]
+    if sel_title:
+        parts.append(f"{_DYNAMIC_REFS['<<<SELECTED_TITLE>>>']}\n{sel_title}")
+    if outline:
+        parts.append(f"{_DYNAMIC_REFS['<<<OUTLINE_TEXT>>>']}\n{outline}")
+    if info_overrides:
+        parts.append(f"【INFO_OVERRIDES】\n{dumps_json(info_overrides)}")
+    return "\n\n".join(parts)
+
+def build_stable_prefixes(info_base: Dict[str, Any], persona_urls: List[str],
+                          title_tpl: str, outline_tpl: str, draft_tpl: str) -> Dict[str, str]:
+    """タイトル/アウトライン/本文の先頭部と CONTEXT ドキュメントをまとめて構築"""
+    values = stable_placeholder_values(info_base)
+    return {
+        "context": build_context_doc(info_base, persona_urls),
+        "title": build_stable_prefix(title_tpl, values),
+        "outline": build_stable_prefix(outline_tpl, values),
+        "draft": build_stable_prefix(draft_tpl, values),
+    }
+
+def info_overrides(info: Dict[str, Any], info_base: Dict[str, Any]) -> Dict[str, Any]:
+    """CSV行で上書きされた info 項目（primary_keyword 以外）"""
+    return {k: v for k, v in info.items()
+            if k != "primary_keyword" and info_base.get(k) != v}
+
+def compose_user_prompt(prefix: str, suffix: str) -> str:
+    return prefix + DYNAMIC_SEPARATOR + suffix
+
+# ─────────────── ステージ別プロンプト ───────────────
+# 同期生成（generate_once_from_info）とバッチ生成（process_csv_batch）で共用する
+TITLE_MAX_TOKENS = 2000
+OUTLINE_MAX_TOKENS = 10000
+DRAFT_MAX_TOKENS = 16000
+
+# タイトルから削除する括弧・引用符（str.translate で1パス）
+_TITLE_QUOTES = str.maketrans("", "", '「」『』"')
+# str.splitlines() と同じ改行文字（1行目だけを切り出すのに使う）
+_LINE_BREAK_RE = re.compile(r"[\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+
+def strip_title_quotes(title: str) -> str:
+    """タイトルから「」『』""を削除"""
+    return title.translate(_TITLE_QUOTES).strip()
+
+def resolve_initial_title(info: Dict[str, Any], pk: str) -> Tuple[str, bool]:
+    """info からタイトル候補を決め、生成が必要かどうかを返す"""
+    sel_title = (
+        (info.get("selected_title") or "").strip()
+        or (info.get("title") or "").strip()
+        or pk
+    )
+    
+    def _norm(s: str) -> str:
+        return _TITLE_NORM_RE.sub("", s or "")
+    
+    needs_gen = (not sel_title) or (_norm(sel_title) == _norm(pk)) or (len(sel_title) < max(6, len(pk) + 2))
+    return sel_title, needs_gen
+
+def title_from_generation(gen: str) -> str:
+    """タイトル生成の応答から1行目を取り出す（空なら例外）"""
+    # 応答全体を行分割せず、最初の改行までだけを見る
+    first_line = _LINE_BREAK_RE.split(gen, 1)[0].strip().strip('\'"') if gen else ""
+    if not first_line:
+        raise RuntimeError("タイトル生成に失敗しました（モデル応答が空）")
+    return strip_title_quotes(first_line)
+
+def title_messages(prefixes: Dict[str, str], pk: str,
+                   overrides: Dict[str, Any]) -> Tuple[str, str]:
+    system_title = (
+        f"あなたはnote記事の編集者です。<<<PRIMARY_KEYWORD>>>を自然に含めた、"
+        f"検索意図に合致し読みたくなるSEOタイトルを1本だけ返してください。"
+    )
+    user_title = compose_user_prompt(
+        prefixes["title"], build_dynamic_suffix(pk, info_overrides=overrides))
+    return system_title, user_title
+
+def outline_messages(persona_label: str, prefixes: Dict[str, str], pk: str, sel_title: str,
+                     overrides: Dict[str, Any]) -> Tuple[str, str]:
+    system_outline = (
+        f"あなたは{persona_label}として、編集構成を作る熟練の構成作家です。"
+    )
+    user_outline = compose_user_prompt(
+        prefixes["outline"], build_dynamic_suffix(pk, sel_title, info_overrides=overrides))
+    user_outline = preprocess_prompt(user_outline, selected_title=sel_title, primary_keyword=pk)
+    return system_outline, user_outline
+
+def draft_messages(persona_label: str, prefixes: Dict[str, str], pk: str, sel_title: str,
+                   outline_text: str, overrides: Dict[str, Any]) -> Tuple[str, str]:
+    system_draft = (
+        f"あなたは{persona_label}として、冷静で説得力のある本文を書く熟練ライターです。"
+    )
+    user_draft = compose_user_prompt(
+        prefixes["draft"], build_dynamic_suffix(pk, sel_title, outline_text, info_overrides=overrides))
+    user_draft = preprocess_prompt(user_draft, selected_title=sel_title, primary_keyword=pk)
+    return system_draft, user_draft
+
+def save_context(outdir: pathlib.Path, persona_label: str, pk: str, sel_title: str,
+                 config: Config) -> Dict[str, Any]:
+    """コンテキスト保存"""
+    ctx = {
+        "provider": config.provider,
+        "models": {
+            "title": config.model_title,
+            "outline": config.model_outline,
+            "draft": config.model_draft
+        },
+        "persona_label": persona_label,
+        "primary_keyword": pk,
+        "selected_title": sel_title,
+    }
+    save_json(outdir / "context.json", ctx)
+    return ctx
 
 # ─────────────── 1本生成 ───────────────
 def generate_once_from_info(
     info: Dict[str, Any],
-    persona_urls: List[str],
-    title_prompt_path: pathlib.Path,
-    outline_tpl: str,
-    draft_tpl: str,
+    prefixes: Dict[str, str],
     outdir: pathlib.Path,
     llm: LLMClient,
-    config: Config
+    config: Config,
+    info_base: Optional[Dict[str, Any]] = None,
+    primary_keyword: Optional[str] = None,
+    persona_label: Optional[str] = None
 ) -> Dict[str, Any]:
-    """1記事生成（temperatureパラメータを削除）"""
+    """
+    1記事生成（temperatureパラメータを削除）
+    prefixes は build_stable_prefixes() の戻り値（CSVでは全行で使い回す）
+    primary_keyword / persona_label は呼び出し側で導出済みなら渡す（未指定なら info から導出）
+    """
     outdir.mkdir(parents=True, exist_ok=True)
+    overrides = info_overrides(info, info_base) if info_base is not None else {}
+    pk = primary_keyword if primary_keyword is not None else derive_primary_keyword(info).strip()
+    if persona_label is None:
+        persona_label = derive_persona_label(info)
     
     # ① タイトル
     print("[STEP] Title resolution start")
-    sel_title = (
-        (info.get("selected_title") or "").strip()
-        or (info.get("title") or "").strip()
-        or derive_primary_keyword(info).strip()
-    )
-    
-    pk = derive_primary_keyword(info).strip()
-    
-    def _norm(s: str) -> str:
-        return re.sub(r"[ \t\u3000「」『』\"'【】\[\]()（）!?！？\-—｜|：:・…]", "", s or "")
-    
-    needs_gen = (not sel_title) or (_norm(sel_title) == _norm(pk)) or (len(sel_title) < max(6, len(pk) + 2))
+    sel_title, needs_gen = resolve_initial_title(info, pk)
     
     # ※ プロンプトが存在しない場合は main() 側で弾いている
     if needs_gen:
         print("[STEP] Generating title...")
-        tpl = read_text(title_prompt_path)
-        user_title = fill_title_prompt(tpl, info, persona_urls)
-        system_title = (
-            f"あなたはnote記事の編集者です。<<<PRIMARY_KEYWORD>>>を自然に含めた、"
-            f"検索意図に合致し読みたくなるSEOタイトルを1本だけ返してください。"
-        )
-        gen = llm.generate(config.model_title, system_title, user_title, max_tokens=2000)
-        first_line = (gen.splitlines()[0] if gen else "").strip().strip('\'"')
-        if first_line:
-            sel_title = first_line
-            # タイトルから「」『』""を削除
-            sel_title = sel_title.replace('「', '').replace('」', '')
-            sel_title = sel_title.replace('『', '').replace('』', '')
-            sel_title = sel_title.replace('"', '').replace('"', '')
-            sel_title = sel_title.strip()
-            save_text(outdir / "title_candidates.txt", gen)
-            print(f"[STEP] Title: {sel_title}")
-        else:
-            raise RuntimeError("タイトル生成に失敗しました（モデル応答が空）")
+        system_title, user_title = title_messages(prefixes, pk, overrides)
+        gen = llm.generate(config.model_title, system_title, user_title, max_tokens=TITLE_MAX_TOKENS,
+                           first_line_only=True, context=prefixes["context"])
+        sel_title = title_from_generation(gen)
+        save_text(outdir / "title_candidates.txt", gen)
+        print(f"[STEP] Title: {sel_title}")
     else:
         # 既存タイトルからも引用符を削除
-        sel_title = sel_title.replace('「', '').replace('」', '')
-        sel_title = sel_title.replace('『', '').replace('』', '')
-        sel_title = sel_title.replace('"', '').replace('"', '')
-        sel_title = sel_title.strip()
+        sel_title = strip_title_quotes(sel_title)
         save_text(outdir / "title_candidates.txt", "SKIPPED\n")
         print(f"[STEP] Title from info: {sel_title}")
     
@@ -193,46 +343,80 @@ def generate_once_from_info(
     
     # ② アウトライン
     print("[STEP] Generating outline...")
-    system_outline = (
-        f"あなたは{derive_persona_label(info)}として、編集構成を作る熟練の構成作家です。"
-    )
-    user_outline = fill_outline_prompt(outline_tpl, info, persona_urls, sel_title)
-    user_outline = preprocess_prompt(user_outline, selected_title=sel_title, primary_keyword=pk)
-    
-    outline_text = llm.generate(config.model_outline, system_outline, user_outline, max_tokens=10000)
+    system_outline, user_outline = outline_messages(persona_label, prefixes, pk, sel_title, overrides)
+    outline_text = llm.generate(config.model_outline, system_outline, user_outline,
+                                max_tokens=OUTLINE_MAX_TOKENS, context=prefixes["context"])
     save_text(outdir / "outline.txt", outline_text)
     print("[STEP] Outline saved")
     
     # ③ 本文
     print("[STEP] Generating article...")
-    system_draft = (
-        f"あなたは{derive_persona_label(info)}として、冷静で説得力のある本文を書く熟練ライターです。"
-    )
-    user_draft = fill_draft_prompt(draft_tpl, info, persona_urls, outline_text)
-    user_draft = preprocess_prompt(user_draft, selected_title=sel_title, primary_keyword=pk)
-    
-    article_text = llm.generate(config.model_draft, system_draft, user_draft, max_tokens=16000)
+    system_draft, user_draft = draft_messages(persona_label, prefixes, pk, sel_title, outline_text, overrides)
+    article_text = llm.generate(config.model_draft, system_draft, user_draft,
+                                max_tokens=DRAFT_MAX_TOKENS, context=prefixes["context"])
     article_text = sanitize_generated_markdown(article_text, selected_title=sel_title)
     
     save_text(outdir / "article.md", article_text)
     print("[STEP] Article saved")
     
-    # コンテキスト保存
-    ctx = {
-        "provider": config.provider,
-        "models": {
-            "title": config.model_title,
-            "outline": config.model_outline,
-            "draft": config.model_draft
-        },
-        "persona_label": derive_persona_label(info),
-        "primary_keyword": pk,
-        "selected_title": sel_title,
-    }
-    save_json(outdir / "context.json", ctx)
-    return ctx
+    return save_context(outdir, persona_label, pk, sel_title, config)
+
+# ─────────────── 意味的キャッシュ ───────────────
+def semantic_text(kw: str, info: Dict[str, Any], info_base: Dict[str, Any]) -> str:
+    """埋め込み対象の文字列（キーワード＋行で上書きされた info 項目）"""
+    overrides = info_overrides(info, info_base)
+    if not overrides:
+        return kw
+    return f"{kw}\n{dumps_json(overrides, sort_keys=True)}"
+
+def reuse_semantic_hit(hit: Dict[str, Any], article_out: pathlib.Path) -> bool:
+    """ヒットした既存記事の成果物を article_out にコピー（元記事が消えていれば False）"""
+    src = pathlib.Path(hit["path"])
+    if not (src / "article.md").exists():
+        return False
+    shutil.copytree(src, article_out, dirs_exist_ok=True)
+    ctx_path = article_out / "context.json"
+    ctx = read_json(ctx_path) if ctx_path.exists() else {}
+    ctx["semantic_cache"] = {"source_keyword": hit["keyword"], "similarity": hit["similarity"]}
+    save_json(ctx_path, ctx)
+    return True
 
 # ─────────────── CSV処理 ───────────────
+def write_csv_atomic(csv_path: pathlib.Path, fieldnames: List[str], rows: List[Dict[str, str]]):
+    """CSVを一時ファイルに書いてから置換（途中で落ちても元ファイルが壊れない）"""
+    buf = io.StringIO(newline="")
+    writer = csv.DictWriter(buf, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+    write_bytes_atomic(csv_path, buf.getvalue().encode("utf-8"))
+
+def read_csv_rows(csv_path: pathlib.Path, keyword_col: str, status_col: str) -> Tuple[List[Dict[str, str]], List[str]]:
+    """CSVを読み込み (rows, fieldnames) を返す（ステータス列が無ければ追加）"""
+    with csv_path.open(encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        fieldnames = list(reader.fieldnames or [])
+    
+    if keyword_col not in fieldnames:
+        raise ValueError(f"CSVに '{keyword_col}' 列がありません")
+    if status_col not in fieldnames:
+        fieldnames.append(status_col)
+    return rows, fieldnames
+
+def build_row_info(base_info: Dict[str, Any], row: Dict[str, str], kw: str,
+                   optional_cols: Dict[str, str]) -> Dict[str, Any]:
+    """info合成（ベース info に行のキーワードと任意列を上書き）"""
+    info = dict(base_info)
+    info["primary_keyword"] = kw
+    for info_key, csv_col in optional_cols.items():
+        if csv_col and (csv_col in row) and row[csv_col].strip():
+            info[info_key] = row[csv_col].strip()
+    return info
+
+def row_slug(kw: str) -> str:
+    """出力先ディレクトリ名"""
+    return _SLUG_RE.sub("_", kw)[:64]
+
 def process_csv(
     csv_path: pathlib.Path,
     base_info_path: pathlib.Path,
@@ -248,30 +432,168 @@ def process_csv(
     ready_values: List[str],
     done_value: str,
     optional_cols: Dict[str, str],
-    limit: int
+    limit: int,
+    sem_cache_threshold: float = 0.0,
+    concurrency: int = 1,
+    flush_every: int = 1,
+    status_width: int = 0
 ):
-    """CSV一括処理（temperatureパラメータを削除）"""
+    """
+    CSV一括処理（temperatureパラメータを削除）
+    sem_cache_threshold > 0 のとき、埋め込みのコサイン類似度がしきい値以上の
+    生成済み記事があればLLMを呼ばずにコピーして使い回す
+    concurrency 行を同時に生成し、flush_every 行完了ごとにCSVを書き戻す
+    status_width > 0 のときはステータス列を固定幅にし、以降は該当欄だけを mmap で上書きする
+    """
     outdir.mkdir(parents=True, exist_ok=True)
-    
-    with csv_path.open(encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-        fieldnames = list(reader.fieldnames or [])
-    
-    if keyword_col not in fieldnames:
-        raise ValueError(f"CSVに '{keyword_col}' 列がありません")
-    if status_col not in fieldnames:
-        fieldnames.append(status_col)
+    rows, fieldnames = read_csv_rows(csv_path, keyword_col, status_col)
     
     base_info = read_json(base_info_path)
     persona_urls = read_lines_strip(persona_path)
-    outline_tpl = read_text(outline_prompt_path)
-    draft_tpl = read_text(draft_prompt_path)
+    # 行に依存しない先頭部はループ外で1回だけ構築し、全行で同一文字列を使い回す
+    prefixes = build_stable_prefixes(
+        base_info, persona_urls,
+        read_text(title_prompt_path), read_text(outline_prompt_path), read_text(draft_prompt_path)
+    )
+    
+    # 意味的キャッシュ：対象行の埋め込みはループ前に1回の呼び出しでまとめて取得
+    sem_cache = None
+    row_vecs: Dict[int, Any] = {}
+    if sem_cache_threshold > 0:
+        sem_cache = SemanticCache(outdir / ".semcache", threshold=sem_cache_threshold)
+        pending: Dict[int, str] = {}
+        for idx, row in enumerate(rows):
+            status = (row.get(status_col, "") or "").strip().upper()
+            kw = (row.get(keyword_col, "") or "").strip()
+            if kw and not (status and status not in ready_values):
+                pending[idx] = semantic_text(kw, build_row_info(base_info, row, kw, optional_cols), base_info)
+        if pending:
+            # 同一テキストは1回だけ埋め込む（text → ベクトル）
+            uniq = list(dict.fromkeys(pending.values()))
+            text_vecs = dict(zip(uniq, embed_texts(config.openai_api_key, uniq)))
+            row_vecs = {idx: text_vecs[text] for idx, text in pending.items()}
+            print(f"[STEP] Embedded {len(uniq)} keywords for semantic cache")
+    
+    sem_lock = threading.Lock()
+    
+    def _run_row(idx: int, row: Dict[str, str], kw: str) -> str:
+        """1行分の生成（ワーカースレッドで実行）。ログ用の補足文字列を返す"""
+        info = build_row_info(base_info, row, kw, optional_cols)
+        article_out = outdir / row_slug(kw)
+        vec = row_vecs.get(idx)
+        
+        if vec is not None:
+            with sem_lock:
+                hit = sem_cache.lookup(vec, exclude_path=article_out)
+            if hit and reuse_semantic_hit(hit, article_out):
+                return f" (semantic cache: {hit['keyword']} sim={hit['similarity']:.3f})"
+        
+        generate_once_from_info(
+            info, prefixes, article_out, llm, config, info_base=base_info,
+            primary_keyword=kw, persona_label=derive_persona_label(info)
+        )
+        if vec is not None:
+            with sem_lock:
+                sem_cache.add(vec, {"keyword": kw, "path": str(article_out)})
+        return ""
+    
+    def _ready_rows():
+        for idx, row in enumerate(rows):
+            status = (row.get(status_col, "") or "").strip().upper()
+            kw = (row.get(keyword_col, "") or "").strip()
+            if not kw or (status and status not in ready_values):
+                continue
+            yield idx, row, kw
+    
+    ready_rows = _ready_rows()
+    
+    # 固定幅ステータス：ここで1回だけ全体を書き出し、以降は行ごとの欄だけを更新
+    status_file = FixedWidthStatusCSV(csv_path, fieldnames, rows, status_col, status_width) if status_width > 0 else None
     
     processed = 0
+    finished = 0
+    inflight: Dict[Any, Tuple[int, str]] = {}
+    
+    # LLM呼び出しはほぼネットワーク待ちなのでスレッドで並列化する
+    # （concurrency=1 なら従来どおり1行ずつ順番に処理）
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
+        def _fill():
+            # limit は成功件数の上限なので、実行中の件数も見込んで投入を止める
+            while len(inflight) < max(1, concurrency) and not (limit and processed + len(inflight) >= limit):
+                nxt = next(ready_rows, None)
+                if nxt is None:
+                    return
+                idx, row, kw = nxt
+                inflight[ex.submit(_run_row, idx, row, kw)] = (idx, kw)
+        
+        _fill()
+        while inflight:
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                idx, kw = inflight.pop(fut)
+                try:
+                    note = fut.result()
+                    rows[idx][status_col] = done_value
+                    processed += 1
+                    print(f"[OK] {kw} -> DONE{note} (#{processed})")
+                except Exception as e:
+                    rows[idx][status_col] = f"ERROR: {e}"
+                    print(f"[ERROR] {kw} -> {e}")
+                finished += 1
+                if status_file is not None:
+                    status_file.set(idx, rows[idx][status_col])
+                # flush_every 行ごとに書き戻し（中断しても完了済みの行は再実行されない）
+                if finished % max(1, flush_every) == 0:
+                    if status_file is not None:
+                        status_file.flush()
+                    else:
+                        write_csv_atomic(csv_path, fieldnames, rows)
+            _fill()
     
+    # CSV書き戻し
+    if status_file is not None:
+        status_file.close()
+    else:
+        write_csv_atomic(csv_path, fieldnames, rows)
+    print(f"[DONE] CSV updated")
+
+def process_csv_batch(
+    csv_path: pathlib.Path,
+    base_info_path: pathlib.Path,
+    persona_path: pathlib.Path,
+    title_prompt_path: pathlib.Path,
+    outline_prompt_path: pathlib.Path,
+    draft_prompt_path: pathlib.Path,
+    outdir: pathlib.Path,
+    llm: LLMClient,
+    config: Config,
+    keyword_col: str,
+    status_col: str,
+    ready_values: List[str],
+    done_value: str,
+    optional_cols: Dict[str, str],
+    limit: int
+):
+    """
+    CSV一括処理（Batch API版）
+    タイトル → アウトライン → 本文の順にステージごとに全行をまとめて投入する。
+    アウトラインは確定タイトルに依存するため、前ステージの完了を待ってから次を組み立てる。
+    """
+    outdir.mkdir(parents=True, exist_ok=True)
+    rows, fieldnames = read_csv_rows(csv_path, keyword_col, status_col)
+    
+    base_info = read_json(base_info_path)
+    persona_urls = read_lines_strip(persona_path)
+    prefixes = build_stable_prefixes(
+        base_info, persona_urls,
+        read_text(title_prompt_path), read_text(outline_prompt_path), read_text(draft_prompt_path)
+    )
+    batch_dir = outdir / "_batch"
+    
+    # 対象行の収集（custom_id は行番号）
+    jobs: Dict[str, Dict[str, Any]] = {}
     for idx, row in enumerate(rows):
-        if limit and processed >= limit:
+        if limit and len(jobs) >= limit:
             break
         
         status = (row.get(status_col, "") or "").strip().upper()
@@ -280,35 +602,89 @@ def process_csv(
         if not kw or (status and status not in ready_values):
             continue
         
-        # info合成
-        info = dict(base_info)
-        info["primary_keyword"] = kw
-        for info_key, csv_col in optional_cols.items():
-            if csv_col and (csv_col in row) and row[csv_col].strip():
-                info[info_key] = row[csv_col].strip()
-        
-        # 出力先
-        slug = re.sub(r"[^0-9A-Za-z一-龥ぁ-んァ-ヶー_]+", "_", kw)[:64]
-        article_out = outdir / slug
-        
-        try:
-            generate_once_from_info(
-                info, persona_urls, title_prompt_path, outline_tpl, draft_tpl,
-                article_out, llm, config
-            )
-            rows[idx][status_col] = done_value
-            processed += 1
-            print(f"[OK] {kw} -> DONE (#{processed})")
-        except Exception as e:
-            rows[idx][status_col] = f"ERROR: {e}"
-            print(f"[ERROR] {kw} -> {e}")
+        info = build_row_info(base_info, row, kw, optional_cols)
+        sel_title, needs_gen = resolve_initial_title(info, kw)
+        jobs[f"row{idx}"] = {
+            "idx": idx, "kw": kw, "pk": kw, "persona_label": derive_persona_label(info),
+            "sel_title": sel_title, "needs_gen": needs_gen,
+            "overrides": info_overrides(info, base_info),
+            "out": outdir / row_slug(kw),
+        }
     
-    # CSV書き戻し
-    with csv_path.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-    print(f"[DONE] CSV updated")
+    if not jobs:
+        print("[DONE] 対象行がありません")
+        return
+    print(f"[STEP] Batch mode: {len(jobs)}件")
+    
+    def _fail(cid: str, stage: str):
+        job = jobs.pop(cid)
+        rows[job["idx"]][status_col] = f"ERROR: {stage} batch failed"
+        print(f"[ERROR] {job['kw']} -> {stage} batch failed")
+    
+    # ① タイトル
+    title_reqs = {
+        cid: title_messages(prefixes, job["pk"], job["overrides"])
+        for cid, job in jobs.items() if job["needs_gen"]
+    }
+    titles = llm.generate_batch(config.model_title, title_reqs, TITLE_MAX_TOKENS, batch_dir, "title",
+                                context=prefixes["context"])
+    for cid in list(jobs):
+        job = jobs[cid]
+        job["out"].mkdir(parents=True, exist_ok=True)
+        if job["needs_gen"]:
+            gen = titles.get(cid, "")
+            if not gen:
+                _fail(cid, "title")
+                continue
+            try:
+                job["sel_title"] = title_from_generation(gen)
+            except RuntimeError as e:
+                # 空白や引用符だけの応答など。その行だけ失敗扱いにして他の行は続ける
+                print(f"[warn] {job['kw']}: {e}")
+                _fail(cid, "title")
+                continue
+            save_text(job["out"] / "title_candidates.txt", gen)
+        else:
+            job["sel_title"] = strip_title_quotes(job["sel_title"])
+            save_text(job["out"] / "title_candidates.txt", "SKIPPED\n")
+        save_text(job["out"] / "selected_title.txt", job["sel_title"])
+    write_csv_atomic(csv_path, fieldnames, rows)
+    
+    # ② アウトライン
+    outline_reqs = {
+        cid: outline_messages(job["persona_label"], prefixes, job["pk"], job["sel_title"], job["overrides"])
+        for cid, job in jobs.items()
+    }
+    outlines = llm.generate_batch(config.model_outline, outline_reqs, OUTLINE_MAX_TOKENS, batch_dir, "outline",
+                                  context=prefixes["context"])
+    for cid in list(jobs):
+        if cid not in outlines:
+            _fail(cid, "outline")
+            continue
+        jobs[cid]["outline"] = outlines[cid]
+        save_text(jobs[cid]["out"] / "outline.txt", outlines[cid])
+    write_csv_atomic(csv_path, fieldnames, rows)
+    
+    # ③ 本文
+    draft_reqs = {
+        cid: draft_messages(job["persona_label"], prefixes, job["pk"], job["sel_title"], job["outline"], job["overrides"])
+        for cid, job in jobs.items()
+    }
+    drafts = llm.generate_batch(config.model_draft, draft_reqs, DRAFT_MAX_TOKENS, batch_dir, "draft",
+                                context=prefixes["context"])
+    for cid in list(jobs):
+        if cid not in drafts:
+            _fail(cid, "draft")
+            continue
+        job = jobs[cid]
+        article_text = sanitize_generated_markdown(drafts[cid], selected_title=job["sel_title"])
+        save_text(job["out"] / "article.md", article_text)
+        save_context(job["out"], job["persona_label"], job["pk"], job["sel_title"], config)
+        rows[job["idx"]][status_col] = done_value
+        print(f"[OK] {job['kw']} -> DONE")
+    
+    write_csv_atomic(csv_path, fieldnames, rows)
+    print(f"[DONE] CSV updated ({len(jobs)}件完了)")
 
 # ─────────────── Config/.env 優先のプロンプト解決 ───────────────
 def _resolve_prompt_paths_with_config(config: Config) -> Dict[str, pathlib.Path]:
@@ -356,6 +732,10 @@ def main():
     ap.add_argument("--draft_prompt", default="", help="本文生成プロンプト（未指定ならConfig/.envを使用）")
     ap.add_argument("--out", default="out", help="出力ディレクトリ（既定: out）")
     
+    # LLM応答キャッシュ
+    ap.add_argument("--no_cache", action="store_true", help="LLM応答のディスクキャッシュを無効化")
+    ap.add_argument("--cache_dir", default="", help="LLM応答キャッシュの保存先（既定: <out>/.llm_cache）")
+    
     # CSV一括モード
     ap.add_argument("--keywords_csv", default="", help="CSVファイルパス（一括処理モード）")
     ap.add_argument("--csv_keyword_col", default="keyword", help="キーワード列名")
@@ -363,6 +743,14 @@ def main():
     ap.add_argument("--csv_ready_values", default=",READY", help="処理対象とする値（カンマ区切り）")
     ap.add_argument("--csv_done_value", default="DONE", help="完了時に書き込む値")
     ap.add_argument("--limit", type=int, default=0, help="処理上限（0=無制限）")
+    ap.add_argument("--mode", choices=["sync", "batch"], default="sync",
+                    help="CSV一括モードの実行方式（batch=Batch APIで投入・最大24時間・約半額）")
+    ap.add_argument("--sem_cache_threshold", type=float, default=0.0,
+                    help="意味的キャッシュのコサイン類似度しきい値（例: 0.95、0=無効・syncモードのみ）")
+    ap.add_argument("--concurrency", type=int, default=1, help="CSV一括モードで同時に生成する行数（syncモードのみ）")
+    ap.add_argument("--csv_flush_every", type=int, default=1, help="何行完了ごとにCSVを書き戻すか")
+    ap.add_argument("--csv_status_width", type=int, default=0,
+                    help="ステータス列を指定幅に固定し、その場書き換えで更新（0=毎回CSV全体を書き直す・syncモードのみ）")
     
     # 任意列マッピング
     ap.add_argument("--csv_affiliate_col", default="affiliate_url")
@@ -372,13 +760,30 @@ def main():
     ap.add_argument("--csv_persona_col", default="persona")
     
     args = ap.parse_args()
+    if args.mode == "batch" and not args.keywords_csv:
+        ap.error("--mode batch は --keywords_csv と併用してください")
+    if args.sem_cache_threshold > 0:
+        if args.mode == "batch":
+            ap.error("--sem_cache_threshold は --mode sync のみ対応です")
+        if SemanticCache is None:
+            ap.error("--sem_cache_threshold には numpy が必要です: pip install numpy")
+    if 0 < args.csv_status_width < len(args.csv_done_value):
+        ap.error("--csv_status_width は --csv_done_value の長さ以上にしてください")
     
     # 設定読み込み（★ Config を先に）— .env をロードして各パスを解決
     config = Config()  # will load .env and validate provider/keys
+    # 意味的キャッシュの埋め込みは provider に関係なく OpenAI を使う
+    if args.sem_cache_threshold > 0 and not config.openai_api_key:
+        ap.error("--sem_cache_threshold には OPENAI_API_KEY が必要です（埋め込みに OpenAI を使用）")
     
     # LLMクライアント初期化
     api_key = config.claude_api_key if config.provider == "anthropic" else config.openai_api_key
-    llm = LLMClient(config.provider, api_key)
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = pathlib.Path(args.cache_dir) if args.cache_dir else pathlib.Path(args.out) / ".llm_cache"
+    llm = LLMClient(config.provider, api_key, cache_dir=cache_dir)
+    # 最初のリクエストの接続確立待ちを隠すため、並列数ぶんの接続を先に張っておく
+    llm.prewarm(config.model_title, connections=args.concurrency if args.keywords_csv else 1)
     
     print(f"[BOOT] {config.provider} / {config.model_title}")
     
@@ -413,11 +818,17 @@ def main():
         }
         
         # プロンプト本文の事前読込（存在チェック済みなので FileNotFound は起きない）
-        process_csv(
+        csv_args = (
             csv_path, info_path, persona_path, title_prompt, outline_prompt, draft_prompt,
             outdir, llm, config, args.csv_keyword_col, args.csv_status_col,
             ready_values, args.csv_done_value, optional_cols, args.limit
         )
+        if args.mode == "batch":
+            process_csv_batch(*csv_args)
+        else:
+            process_csv(*csv_args, sem_cache_threshold=args.sem_cache_threshold,
+                        concurrency=args.concurrency, flush_every=args.csv_flush_every,
+                        status_width=args.csv_status_width)
         print("[OK] CSV batch completed")
         return
     
@@ -426,14 +837,13 @@ def main():
     _ = derive_primary_keyword(info)
     
     persona_urls = read_lines_strip(persona_path)
-    outline_tpl = read_text(outline_prompt)
-    draft_tpl = read_text(draft_prompt)
-    
-    ctx = generate_once_from_info(
-        info, persona_urls, title_prompt, outline_tpl, draft_tpl,
-        outdir, llm, config
+    prefixes = build_stable_prefixes(
+        info, persona_urls,
+        read_text(title_prompt), read_text(outline_prompt), read_text(draft_prompt)
     )
     
+    ctx = generate_once_from_info(info, prefixes, outdir, llm, config)
+    
     save_json(outdir / "context_root.json", {
         "paths": {
             "info": str(info_path),
@@ -114,29 +114,34 @@ def fetch_url_content(url: str, timeout: int = 15) -> Optional[Dict[str, str]]:
         return None
 
 
+# 優先度高いドメイン
+PRIORITY_DOMAINS = [
+    'openwork.jp', 'en-hyouban.com', 'careerconnection.jp',  # 口コミサイト
+    'jp.fsc.go.jp', 'edinet-fsa.go.jp',  # 金融庁・EDINET
+    'e-stat.go.jp', 'stat.go.jp',  # 統計データ
+    'nikkei.com', 'asahi.com', 'mainichi.jp',  # 大手メディア
+]
+
+# 除外ドメイン
+EXCLUDE_DOMAINS = [
+    'wikipedia.org', 'twitter.com', 'x.com', 'facebook.com', 
+    'instagram.com', 'youtube.com', 'tiktok.com',
+    'amazon.co.jp', 'rakuten.co.jp', 'yahoo.co.jp',
+]
+
+# ドメインごとに部分一致を繰り返す代わりに、1本の正規表現で URL を1回だけ走査する
+RX_PRIORITY_DOMAINS = re.compile("|".join(map(re.escape, PRIORITY_DOMAINS)))
+RX_EXCLUDE_DOMAINS = re.compile("|".join(map(re.escape, EXCLUDE_DOMAINS)))
+
+
 def is_relevant_url(url: str, bank_name: str) -> bool:
     """銀行情報として有用なURLか判定"""
     url_lower = url.lower()
     
-    # 優先度高いドメイン
-    priority_domains = [
-        'openwork.jp', 'en-hyouban.com', 'careerconnection.jp',  # 口コミサイト
-        'jp.fsc.go.jp', 'edinet-fsa.go.jp',  # 金融庁・EDINET
-        'e-stat.go.jp', 'stat.go.jp',  # 統計データ
-        'nikkei.com', 'asahi.com', 'mainichi.jp',  # 大手メディア
-    ]
-    
-    if any(domain in url_lower for domain in priority_domains):
+    if RX_PRIORITY_DOMAINS.search(url_lower):
         return True
     
-    # 除外ドメイン
-    exclude_domains = [
-        'wikipedia.org', 'twitter.com', 'x.com', 'facebook.com', 
-        'instagram.com', 'youtube.com', 'tiktok.com',
-        'amazon.co.jp', 'rakuten.co.jp', 'yahoo.co.jp',
-    ]
-    
-    if any(domain in url_lower for domain in exclude_domains):
+    if RX_EXCLUDE_DOMAINS.search(url_lower):
         return False
     
     return True
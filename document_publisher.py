@@ -14,23 +14,22 @@ import argparse
 import io
 import re
 import html
-from typing import List, Tuple, Optional
-
-from bs4 import BeautifulSoup, Tag
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
+import zlib
+from typing import Dict, Iterator, List, Tuple, Optional
 
 # 共通モジュール
 from lib.auth import GoogleAuth
 from lib.config import Config
+from lib.doc_manifest import DocManifest, doc_manifest_key
+from lib.html_cache import get_or_render
 
 # ───────────── Markdown → HTML 変換 ─────────────
 RX_UL_HEAD = re.compile(r"^\s*-\s+")
 RX_OL_HEAD = re.compile(r"^\s*\d+[.)]\s+")
-RX_UL_INLINE_START = re.compile(r"-\s+\S")
-RX_OL_INLINE_START = re.compile(r"\d+[.)]\s+\S")
-RX_UL_SPLIT = re.compile(r"-\s+")
-RX_OL_SPLIT = re.compile(r"\d+[.)]\s+")
+# 最初の「# 」行（タイトル）。行リストを作らず、見つかった時点で走査を打ち切る
+RX_H1_LINE = re.compile(r"^# (.*)$", re.M)
+# 行中の箇条書きマーカー（「- 」「1. 」「1) 」）。finditer 1回で全マーカーの位置を取る
+RX_INLINE_LIST = re.compile(r"(?P<ul>-)\s+(?=\S)|(?P<ol>\d+[.)])\s+(?=\S)")
 RX_POST_TOKENS = re.compile("|".join(map(re.escape, [
     "これらの", "これにより", "続いて", "次に", "ここでは", "なお", "ただし",
     "一方で", "以上", "また", "さらに", "加えて", "最後に"
@@ -45,6 +44,9 @@ def _split_last_item(item: str) -> Tuple[str, str]:
 
 def render_inline(text: str) -> str:
     """インライン要素のレンダリング"""
+    # 太字の無い行（大半）は照合もリスト作成もせずにエスケープだけ
+    if "**" not in text:
+        return html.escape(text)
     out: List[str] = []
     pos = 0
     for m in BOLD_RX.finditer(text):
@@ -55,10 +57,86 @@ def render_inline(text: str) -> str:
     out.append(html.escape(text[pos:]))
     return "".join(out)
 
+def _split_inline_list(ln: str) -> Optional[Tuple[str, str, List[str]]]:
+    """
+    1行に詰め込まれた箇条書き（「- a - b - c」「1. a 2. b 3. c」）を (タグ, 前置き, 項目) に分ける
+    - 最初に現れたマーカーの種類で ul/ol を決め、同じ種類のマーカー位置で切る
+    - 項目が3つ未満なら None
+    """
+    marks = list(RX_INLINE_LIST.finditer(ln))
+    if not marks:
+        return None
+    kind = marks[0].lastgroup
+    cuts = [m for m in marks if m.lastgroup == kind]
+    ends = [m.start() for m in cuts[1:]] + [len(ln)]
+    parts = [ln[m.end():e].strip() for m, e in zip(cuts, ends)]
+    parts = [p for p in parts if p]
+    if len(parts) < 3:
+        return None
+    return kind, ln[:cuts[0].start()].strip(), parts
+
+def md_title(md: str) -> Optional[str]:
+    """最初の H1（「# 」行）の見出し文字列。無ければ None"""
+    m = RX_H1_LINE.search(md)
+    return (m.group(1).strip() or None) if m else None
+
+def _md_blocks(md: str) -> Iterator[Tuple[str, str]]:
+    """
+    Markdown を (種類, 本文) のブロック列にする（md_to_html / md_to_docs_requests 共通）
+    - 種類: h1/h2/h3/p/hr/blank、箇条書きの項目は ul/ol
+    - end は行中の箇条書きの前後の区切り（直前のリストをそこで閉じる）
+    """
+    for ln in md.splitlines():
+        # 先頭文字で行の種類を振り分け、正規表現は候補になった行にだけ使う
+        c = ln.lstrip()[:1]
+        if not c:
+            yield "blank", ""; continue
+
+        if c == "#":
+            if ln.startswith("### "):
+                yield "h3", ln[4:].strip(); continue
+            if ln.startswith("## "):
+                yield "h2", ln[3:].strip(); continue
+            if ln.startswith("# "):
+                yield "h1", ln[2:].strip(); continue
+        elif c == "-":
+            if ln.strip() == "---":
+                yield "hr", ""; continue
+            m = RX_UL_HEAD.match(ln)
+            if m:
+                yield "ul", ln[m.end():].strip(); continue
+        elif c.isdigit():
+            m = RX_OL_HEAD.match(ln)
+            if m:
+                yield "ol", ln[m.end():].strip(); continue
+
+        inline = _split_inline_list(ln)
+        if inline:
+            tag, prefix, parts = inline
+            parts[-1], post = _split_last_item(parts[-1])
+            if prefix: yield "p", prefix
+            yield "end", ""
+            for it in parts: yield tag, it
+            yield "end", ""
+            if post: yield "p", post
+            continue
+
+        yield "p", ln
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width,initial-scale=1">
+<title>Imported Article</title>
+</head>
+<body>"""
+_HTML_TAIL = "</body>\n</html>"
+
 def md_to_html(md: str) -> str:
     """Markdown→HTML変換（簡易版）"""
-    lines = md.splitlines()
-    out: List[str] = []
+    # 外枠（<!DOCTYPE>〜<body>、</body></html>）も同じリストに入れ、文書全体を1回の join で作る
+    out: List[str] = [_HTML_HEAD]
     in_list = False
     list_tag: Optional[str] = None
 
@@ -78,94 +156,42 @@ def md_to_html(md: str) -> str:
             in_list = True
             list_tag = tag
 
-    for raw in lines:
-        ln = raw.rstrip("\n")
-
-        if ln.strip() == "---":
-            close_list(); out.append("<hr>"); continue
-        if ln.startswith("### "):
-            close_list(); out.append(f"<h3>{render_inline(ln[4:].strip())}</h3>"); continue
-        if ln.startswith("## "):
-            close_list(); out.append(f"<h2>{render_inline(ln[3:].strip())}</h2>"); continue
-        if ln.startswith("# "):
-            close_list(); out.append(f"<h1>{render_inline(ln[2:].strip())}</h1>"); continue
-
-        if RX_UL_HEAD.match(ln):
-            after = RX_UL_HEAD.sub("", ln).strip()
-            open_list("ul"); out.append(f"<li>{render_inline(after)}</li>"); continue
-        if RX_OL_HEAD.match(ln):
-            after = RX_OL_HEAD.sub("", ln, count=1).strip()
-            open_list("ol"); out.append(f"<li>{render_inline(after)}</li>"); continue
-
-        m_ul = RX_UL_INLINE_START.search(ln)
-        m_ol = RX_OL_INLINE_START.search(ln)
-        if m_ul or m_ol:
-            if m_ul and (not m_ol or m_ul.start() <= m_ol.start()):
-                prefix = ln[:m_ul.start()].strip(); rest = ln[m_ul.start():].strip()
-                parts = [s.strip() for s in RX_UL_SPLIT.split(rest) if s.strip()]
-                if len(parts) >= 3:
-                    parts[-1], post = _split_last_item(parts[-1])
-                    close_list()
-                    if prefix: out.append(f"<p>{render_inline(prefix)}</p>")
-                    open_list("ul")
-                    for it in parts: out.append(f"<li>{render_inline(it)}</li>")
-                    close_list()
-                    if post: out.append(f"<p>{render_inline(post)}</p>")
-                    continue
-            else:
-                prefix = ln[:m_ol.start()].strip(); rest = ln[m_ol.start():].strip()
-                parts = [s.strip() for s in RX_OL_SPLIT.split(rest) if s.strip()]
-                if len(parts) >= 3:
-                    parts[-1], post = _split_last_item(parts[-1])
-                    close_list()
-                    if prefix: out.append(f"<p>{render_inline(prefix)}</p>")
-                    open_list("ol")
-                    for it in parts: out.append(f"<li>{render_inline(it)}</li>")
-                    close_list()
-                    if post: out.append(f"<p>{render_inline(post)}</p>")
-                    continue
-
-        if ln.strip() == "":
-            close_list(); out.append(""); continue
-
-        close_list(); out.append(f"<p>{render_inline(ln)}</p>")
+    for kind, text in _md_blocks(md):
+        if kind in ("ul", "ol"):
+            open_list(kind); out.append(f"<li>{render_inline(text)}</li>"); continue
+        close_list()
+        if kind == "blank":
+            # 連続する空行は1つにまとめる（close_list で閉じタグが入れば別の空行として残す）
+            if not out or out[-1] != "":
+                out.append("")
+        elif kind == "hr":
+            out.append("<hr>")
+        elif kind != "end":
+            out.append(f"<{kind}>{render_inline(text)}</{kind}>")
 
     close_list()
 
-    html_body: List[str] = []
-    prev_blank = False
-    for x in out:
-        if x == "":
-            if not prev_blank:
-                html_body.append("")
-            prev_blank = True
-        else:
-            html_body.append(x)
-            prev_blank = False
-
-    body = "\n".join(html_body)
-    return f"""<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8">
-<meta name="viewport" content="width=device-width,initial-scale=1">
-<title>Imported Article</title>
-</head>
-<body>
-{body}
-</body>
-</html>"""
+    if len(out) == 1:
+        # 本文が空でも <body> と </body> の間の空行は残す
+        out.append("")
+    out.append(_HTML_TAIL)
+    return "\n".join(out)
 
 # ───────────── リズム改行処理 ─────────────
 INLINE_OK = {"b","strong","i","em","span","a","br","u","s","small","mark","sub","sup","code"}
 SKIP_TAGS = {"code","pre","table","thead","tbody","tr","th","td","ul","ol","li","blockquote"}
 HEADING_TAGS = {"h1","h2","h3","h4","h5","h6"}
+RX_REFLOW_NEWLINES = re.compile(r"[ \t]*\n+[ \t]*")
+RX_QUOTE_PERIOD = re.compile(r'([」』])([。．])')
+RX_QUOTE_SPACE_PERIOD = re.compile(r'([」』])[　\s]+([。．])')
+RX_LEADING_PUNCT = re.compile(r'^[。、．，）"』]+\s*')
+RX_NEWLINE_WS = re.compile(r"\s*\n\s*")
 
 def _reflow_paragraph_text(text: str, sentences_per_para: int = 2) -> List[str]:
     """テキストを句点で分割してN文ごとに段落化"""
-    txt = re.sub(r"[ \t]*\n+[ \t]*", "", text)
-    txt = re.sub(r'([」』])([。．])', r'\1', txt)
-    txt = re.sub(r'([」』])[　\s]+([。．])', r'\1', txt)
+    txt = RX_REFLOW_NEWLINES.sub("", text)
+    txt = RX_QUOTE_PERIOD.sub(r'\1', txt)
+    txt = RX_QUOTE_SPACE_PERIOD.sub(r'\1', txt)
 
     sentences: List[str] = []
     current: List[str] = []
@@ -193,7 +219,7 @@ def _reflow_paragraph_text(text: str, sentences_per_para: int = 2) -> List[str]:
 
     cleaned_sentences: List[str] = []
     for sent in sentences:
-        cleaned = re.sub(r'^[。、．，）"』]+\s*', '', sent).strip()
+        cleaned = RX_LEADING_PUNCT.sub('', sent).strip()
         if cleaned:
             cleaned_sentences.append(cleaned)
 
@@ -209,6 +235,8 @@ def _reflow_paragraph_text(text: str, sentences_per_para: int = 2) -> List[str]:
 
 def rhythmic_reflow_html(html_text: str, sentences_per_para: int = 2) -> str:
     """HTMLのリズム改行処理"""
+    from bs4 import BeautifulSoup, Tag
+    
     soup = BeautifulSoup(html_text, "html.parser")
     root = soup.body or soup
     
@@ -263,7 +291,7 @@ def rhythmic_reflow_html(html_text: str, sentences_per_para: int = 2) -> str:
             combined_text = ""
             for tag in block:
                 text = tag.get_text()
-                text = re.sub(r"\s*\n\s*", "", text).strip()
+                text = RX_NEWLINE_WS.sub("", text).strip()
                 if text:
                     combined_text += text
             
@@ -298,65 +326,131 @@ def rhythmic_reflow_html(html_text: str, sentences_per_para: int = 2) -> str:
     return str(soup)
 
 # ───────────── Google Drive/Docs/Sheets操作 ─────────────
-def drive_create_gdoc_from_html(auth: GoogleAuth, html_text: str, name: str, 
+# 429・5xx・接続断は googleapiclient 組み込みの指数バックオフ（ジッター付き）で再試行する
+API_RETRIES = 5
+# これ以上のサイズは再開可能アップロード（チャンク単位で送信）にする
+RESUMABLE_UPLOAD_MIN_BYTES = 5 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+
+def drive_create_gdoc_from_html(auth: GoogleAuth, html_text: str, name: str,
                                folder_id: Optional[str] = None) -> Tuple[str, str]:
-    """HTMLからGoogleドキュメントを作成"""
+    """
+    HTMLからGoogleドキュメントを作成
+    RESUMABLE_UPLOAD_MIN_BYTES 以上は再開可能アップロードにし、途中で切れても送信済みのチャンクから続ける
+    """
+    from googleapiclient.http import MediaIoBaseUpload
+    
     drive = auth.build_service("drive", "v3")
-    media = MediaIoBaseUpload(io.BytesIO(html_text.encode("utf-8")), 
-                             mimetype="text/html", resumable=False)
+    data = html_text.encode("utf-8")
+    resumable = len(data) >= RESUMABLE_UPLOAD_MIN_BYTES
+    media = MediaIoBaseUpload(io.BytesIO(data), mimetype="text/html",
+                              chunksize=UPLOAD_CHUNK_BYTES, resumable=resumable)
     metadata = {"name": name, "mimeType": "application/vnd.google-apps.document"}
     if folder_id:
         metadata["parents"] = [folder_id]
-    file = drive.files().create(body=metadata, media_body=media, 
-                               fields="id, webViewLink").execute()
+    request = drive.files().create(body=metadata, media_body=media, fields="id, webViewLink")
+    if not resumable:
+        file = request.execute(num_retries=API_RETRIES)
+    else:
+        file = None
+        while file is None:
+            _, file = request.next_chunk(num_retries=API_RETRIES)
     return file["id"], file.get("webViewLink", "")
 
+def drive_file_alive(auth: GoogleAuth, file_id: str) -> bool:
+    """ファイルが存在し、ゴミ箱にも入っていないか"""
+    from googleapiclient.errors import HttpError
+    
+    drive = auth.build_service("drive", "v3")
+    try:
+        file = drive.files().get(fileId=file_id, fields="id,trashed").execute(num_retries=API_RETRIES)
+    except HttpError as e:
+        if e.resp.status == 404:
+            return False
+        raise
+    return not file.get("trashed", False)
+
 def drive_share_anyone_writer(auth: GoogleAuth, file_id: str):
     """誰でも編集可能に設定"""
     drive = auth.build_service("drive", "v3")
     drive.permissions().create(fileId=file_id, 
-                              body={"type": "anyone", "role": "writer"}).execute()
+                              body={"type": "anyone", "role": "writer"}).execute(num_retries=API_RETRIES)
+
+# (spreadsheet_id, シート名) → シートID。フォルダ一括処理で2件目以降は Sheets に問い合わせない
+_SHEET_IDS: Dict[Tuple[str, str], int] = {}
+
+def sheets_get_or_create_sheet_id(auth: GoogleAuth, spreadsheet_id: str,
+                                  sheet_name: str, widths_px: Optional[List[int]] = None) -> int:
+    """
+    シートIDを取得（なければ作成）し、widths_px があれば列幅も設定する
+    - まず addSheet と列幅設定を1回の batchUpdate で送り、作成したシートIDを返信から読む
+    - 既にある場合は sheets.properties だけを get して、列幅を別途設定する
+    - 同じプロセスで解決済みのシートは、API を呼ばずに覚えている ID を返す
+    """
+    from googleapiclient.errors import HttpError
+
+    cached = _SHEET_IDS.get((spreadsheet_id, sheet_name))
+    if cached is not None:
+        return cached
 
-def sheets_get_or_create_sheet_id(auth: GoogleAuth, spreadsheet_id: str, 
-                                  sheet_name: str) -> int:
-    """シートIDを取得（なければ作成）"""
     sheets = auth.build_service("sheets", "v4")
-    meta = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-    
-    for sh in meta.get("sheets", []):
-        if sh.get("properties", {}).get("title") == sheet_name:
-            return int(sh["properties"]["sheetId"])
-    
-    sheets.spreadsheets().batchUpdate(
-        spreadsheetId=spreadsheet_id,
-        body={"requests": [{"addSheet": {"properties": {"title": sheet_name}}}]}
-    ).execute()
-    
-    meta = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+    # 列幅の指定に ID が要るので、作成前にタイトルから決めておく（0 は既定シートと重なるので避ける）
+    sheet_id = zlib.crc32(sheet_name.encode("utf-8")) & 0x7FFFFFFF or 1
+    reqs = [{"addSheet": {"properties": {"sheetId": sheet_id, "title": sheet_name}}}]
+    reqs += _column_width_requests(sheet_id, widths_px or [])
+    try:
+        resp = sheets.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id, body={"requests": reqs}
+        ).execute(num_retries=API_RETRIES)
+        sheet_id = int(resp["replies"][0]["addSheet"]["properties"]["sheetId"])
+        _SHEET_IDS[(spreadsheet_id, sheet_name)] = sheet_id
+        return sheet_id
+    except HttpError as e:
+        if e.resp.status != 400 or "already exists" not in str(e):
+            raise
+
+    meta = sheets.spreadsheets().get(
+        spreadsheetId=spreadsheet_id, fields="sheets.properties(sheetId,title)"
+    ).execute(num_retries=API_RETRIES)
     for sh in meta.get("sheets", []):
         if sh.get("properties", {}).get("title") == sheet_name:
-            return int(sh["properties"]["sheetId"])
-    
-    raise RuntimeError(f"シート作成失敗: {sheet_name}")
-
-def sheets_set_column_widths(auth: GoogleAuth, spreadsheet_id: str, 
-                            sheet_id: int, widths_px: List[int]):
-    """列幅設定"""
+            sheet_id = int(sh["properties"]["sheetId"])
+            break
+    else:
+        # タイトルは無いのに ID が他のシートと重なった場合。ID は API に任せて作り直す
+        resp = sheets.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={"requests": [{"addSheet": {"properties": {"title": sheet_name}}}]}
+        ).execute(num_retries=API_RETRIES)
+        sheet_id = int(resp["replies"][0]["addSheet"]["properties"]["sheetId"])
+
+    if widths_px:
+        sheets_set_column_widths(auth, spreadsheet_id, sheet_id, widths_px)
+    _SHEET_IDS[(spreadsheet_id, sheet_name)] = sheet_id
+    return sheet_id
+
+def _column_width_requests(sheet_id: int, widths_px: List[int]) -> List[dict]:
+    """A列から順に widths_px の幅を設定する updateDimensionProperties 群"""
     reqs = []
     for idx, px in enumerate(widths_px):
         reqs.append({
             "updateDimensionProperties": {
-                "range": {"sheetId": sheet_id, "dimension": "COLUMNS", 
+                "range": {"sheetId": sheet_id, "dimension": "COLUMNS",
                          "startIndex": idx, "endIndex": idx+1},
                 "properties": {"pixelSize": int(px)},
                 "fields": "pixelSize"
             }
         })
+    return reqs
+
+def sheets_set_column_widths(auth: GoogleAuth, spreadsheet_id: str,
+                            sheet_id: int, widths_px: List[int]):
+    """列幅設定"""
     sheets = auth.build_service("sheets", "v4")
     sheets.spreadsheets().batchUpdate(
         spreadsheetId=spreadsheet_id,
-        body={"requests": reqs}
-    ).execute()
+        body={"requests": _column_width_requests(sheet_id, widths_px)}
+    ).execute(num_retries=API_RETRIES)
 
 def sheets_append_title_url(auth: GoogleAuth, spreadsheet_id: str, 
                            sheet_name: str, title: str, url: str):
@@ -368,7 +462,7 @@ def sheets_append_title_url(auth: GoogleAuth, spreadsheet_id: str,
         valueInputOption="USER_ENTERED",
         insertDataOption="INSERT_ROWS",
         body={"values": [[title, url]]}
-    ).execute()
+    ).execute(num_retries=API_RETRIES)
 
 # ───────────── Docs編集ユーティリティ ─────────────
 def _normalize_url(url: str) -> str:
@@ -377,9 +471,28 @@ def _normalize_url(url: str) -> str:
         u = "https:" + u
     return u
 
+# documents().get で受け取る項目（各処理が読む部分だけに絞り、本文全体の JSON を毎回受け取らない）
+DOC_FIELDS_HEADINGS = "body.content(startIndex,endIndex,paragraph.paragraphStyle.namedStyleType)"
+DOC_FIELDS_TEXT = "body.content.paragraph.elements(startIndex,textRun.content)"
+
+# batchUpdate 1回あたりのリクエスト数（途中で失敗しても、それまでのチャンクは反映済みになる）
+DOCS_BATCH_CHUNK = 200
+
+def docs_batch_update_chunked(docs_svc, document_id: str, requests: List[dict]):
+    """
+    requests を DOCS_BATCH_CHUNK 件ずつ先頭から順に batchUpdate する
+    削除を含む場合は、前のチャンクが後のチャンクの位置をずらさないよう末尾側から並べて渡す
+    """
+    for i in range(0, len(requests), DOCS_BATCH_CHUNK):
+        docs_svc.documents().batchUpdate(
+            documentId=document_id,
+            body={"requests": requests[i:i + DOCS_BATCH_CHUNK]}
+        ).execute(num_retries=API_RETRIES)
+
 def _find_heading1_insert_index(docs_svc, document_id: str) -> int:
     """H1の直後位置を取得"""
-    doc = docs_svc.documents().get(documentId=document_id).execute()
+    doc = docs_svc.documents().get(documentId=document_id,
+                                   fields=DOC_FIELDS_HEADINGS).execute(num_retries=API_RETRIES)
     for c in doc.get("body", {}).get("content", []):
         para = c.get("paragraph")
         if not para:
@@ -391,79 +504,132 @@ def _find_heading1_insert_index(docs_svc, document_id: str) -> int:
                 return end_index
     return 1
 
-def _find_range_for_text(doc: dict, needle: str, prefer: str = "last", 
-                        near_index: Optional[int] = None) -> Tuple[Optional[int], Optional[int]]:
-    """テキストの範囲を検索"""
-    best_start = best_end = None
-    best_metric = -1 if prefer == "last" else 10**12
-
-    for c in doc.get("body", {}).get("content", []):
-        para = c.get("paragraph")
-        if not para:
-            continue
-        for el in para.get("elements", []):
-            tr = el.get("textRun")
-            if not tr:
-                continue
-            text = tr.get("content", "")
-            idx = text.find(needle)
-            if idx < 0:
+def _utf16_len(text: str) -> int:
+    """Docs API のインデックスは UTF-16 単位（絵文字などは2つ分）"""
+    return len(text.encode("utf-16-le")) // 2
+
+_DOCS_NAMED_STYLE = {"h1": "HEADING_1", "h2": "HEADING_2", "h3": "HEADING_3"}
+_DOCS_BULLET_PRESET = {"ul": "BULLET_DISC_CIRCLE_SQUARE", "ol": "NUMBERED_DECIMAL_ALPHA_ROMAN"}
+
+def md_to_docs_requests(md: str) -> List[dict]:
+    """
+    Markdown から Docs API の batchUpdate リクエストを直接組み立てる（HTML の生成・取り込みを経由しない）
+    - 本文は insertText 1回で先頭に入れ、見出し・箇条書き・太字はその後の書式指定で付ける
+    - 書式指定は位置をずらさないので、チャンク分割して送ってもよい
+    - 水平線（---）は API で挿入できないため省く
+    """
+    texts: List[str] = []
+    styles: List[dict] = []
+    bullets: List[dict] = []
+    bolds: List[dict] = []
+    index = 1
+    list_tag: Optional[str] = None
+    list_start = 0
+    
+    def close_list():
+        nonlocal list_tag
+        if list_tag:
+            bullets.append({"createParagraphBullets": {
+                "range": {"startIndex": list_start, "endIndex": index},
+                "bulletPreset": _DOCS_BULLET_PRESET[list_tag]
+            }})
+            list_tag = None
+    
+    for kind, text in _md_blocks(md):
+        if kind in ("ul", "ol"):
+            if list_tag != kind:
+                close_list()
+                list_tag, list_start = kind, index
+        else:
+            close_list()
+            if kind in ("blank", "hr", "end"):
                 continue
-            start = (el.get("startIndex") or 0) + idx
-            end = start + len(needle)
-
-            if prefer == "last":
-                metric = start
-                if best_start is None or metric >= best_metric:
-                    best_start, best_end, best_metric = start, end, metric
-            elif prefer == "near" and near_index is not None:
-                dist = max(0, start - near_index)
-                if best_start is None or dist < best_metric:
-                    best_start, best_end, best_metric = start, end, dist
-
-    return best_start, best_end
+    
+        # **..** は記号を外して入れ、太字にする範囲だけ覚えておく
+        start = index
+        pos = 0
+        for m in BOLD_RX.finditer(text):
+            before, inner = text[pos:m.start()], m.group(1)
+            texts.append(before)
+            index += _utf16_len(before)
+            bolds.append({"updateTextStyle": {
+                "range": {"startIndex": index, "endIndex": index + _utf16_len(inner)},
+                "textStyle": {"bold": True},
+                "fields": "bold"
+            }})
+            texts.append(inner)
+            index += _utf16_len(inner)
+            pos = m.end()
+        rest = text[pos:] + "\n"
+        texts.append(rest)
+        index += _utf16_len(rest)
+    
+        if kind in _DOCS_NAMED_STYLE:
+            styles.append({"updateParagraphStyle": {
+                "range": {"startIndex": start, "endIndex": index},
+                "paragraphStyle": {"namedStyleType": _DOCS_NAMED_STYLE[kind]},
+                "fields": "namedStyleType"
+            }})
+    
+    close_list()
+    
+    if not texts:
+        return []
+    insert = {"insertText": {"location": {"index": 1}, "text": "".join(texts)}}
+    return [insert] + styles + bullets + bolds
+
+def docs_create_from_markdown(auth: GoogleAuth, md_text: str, name: str,
+                              folder_id: Optional[str] = None) -> Tuple[str, str]:
+    """
+    空の Google ドキュメントを作り、md_to_docs_requests の内容を書き込む
+    HTML のアップロードと Drive 側の HTML 変換を省ける
+    """
+    drive = auth.build_service("drive", "v3")
+    metadata = {"name": name, "mimeType": "application/vnd.google-apps.document"}
+    if folder_id:
+        metadata["parents"] = [folder_id]
+    file = drive.files().create(body=metadata, fields="id, webViewLink").execute(num_retries=API_RETRIES)
+    
+    docs = auth.build_service("docs", "v1")
+    docs_batch_update_chunked(docs, file["id"], md_to_docs_requests(md_text))
+    return file["id"], file.get("webViewLink", "")
 
 def docs_insert_disclosure_below_title(auth: GoogleAuth, document_id: str, text: str):
     """タイトル直下に注意書き挿入"""
     docs = auth.build_service("docs", "v1")
     
     insert_at = _find_heading1_insert_index(docs, document_id)
-    to_insert = text.strip() + "\n\n"
-    docs.documents().batchUpdate(
-        documentId=document_id,
-        body={"requests": [{"insertText": {"location": {"index": insert_at}, "text": to_insert}}]}
-    ).execute()
-    
-    doc = docs.documents().get(documentId=document_id).execute()
-    start_idx, end_idx = _find_range_for_text(doc, text.strip(), prefer="near", near_index=insert_at)
-    if start_idx is None:
-        print("[warn] disclosure text not found", file=sys.stderr)
-        return
-    
+    text = text.strip()
+    # 挿入した文字列は insert_at から並ぶので、書式を付ける範囲は再取得せずに決まる
+    end_idx = insert_at + _utf16_len(text)
     docs.documents().batchUpdate(
         documentId=document_id,
         body={
-            "requests": [{
-                "updateTextStyle": {
-                    "range": {"startIndex": start_idx, "endIndex": end_idx},
-                    "textStyle": {
-                        "bold": True,
-                        "link": None,
-                        "fontSize": {"magnitude": 11, "unit": "PT"}
-                    },
-                    "fields": "bold,link,fontSize"
+            "requests": [
+                {"insertText": {"location": {"index": insert_at}, "text": text + "\n\n"}},
+                {
+                    "updateTextStyle": {
+                        "range": {"startIndex": insert_at, "endIndex": end_idx},
+                        "textStyle": {
+                            "bold": True,
+                            "link": None,
+                            "fontSize": {"magnitude": 11, "unit": "PT"}
+                        },
+                        "fields": "bold,link,fontSize"
+                    }
                 }
-            }]
+            ]
         }
-    ).execute()
+    ).execute(num_retries=API_RETRIES)
     print("[ok] disclosure inserted")
 
-def docs_insert_midpage_cta(auth: GoogleAuth, document_id: str, anchor_text: str, 
+def docs_insert_midpage_cta(auth: GoogleAuth, document_id: str, anchor_text: str,
                            url: str, bold: bool = True, font_size_pt: Optional[int] = None):
     """中盤にCTA挿入"""
     docs = auth.build_service("docs", "v1")
     
-    doc = docs.documents().get(documentId=document_id).execute()
+    doc = docs.documents().get(documentId=document_id,
+                               fields=DOC_FIELDS_HEADINGS).execute(num_retries=API_RETRIES)
     h2_positions: List[int] = []
     for c in doc.get("body", {}).get("content", []):
         para = c.get("paragraph")
@@ -482,18 +648,6 @@ def docs_insert_midpage_cta(auth: GoogleAuth, document_id: str, anchor_text: str
     h2_positions.sort()
     insert_at = h2_positions[len(h2_positions) // 2]
     
-    docs.documents().batchUpdate(
-        documentId=document_id,
-        body={"requests": [{"insertText": {"location": {"index": insert_at}, 
-                                          "text": "\n" + anchor_text + "\n\n"}}]}
-    ).execute()
-    
-    doc = docs.documents().get(documentId=document_id).execute()
-    start_idx, end_idx = _find_range_for_text(doc, anchor_text, prefer="near", near_index=insert_at)
-    if start_idx is None:
-        print("[warn] mid CTA text not found", file=sys.stderr)
-        return
-    
     url = _normalize_url(url)
     style = {"link": {"url": url}, "bold": bool(bold)}
     fields = "link,bold"
@@ -501,57 +655,61 @@ def docs_insert_midpage_cta(auth: GoogleAuth, document_id: str, anchor_text: str
         style["fontSize"] = {"magnitude": int(font_size_pt), "unit": "PT"}
         fields += ",fontSize"
     
+    # "\n" + anchor_text + "\n\n" を挿入するので、アンカーは insert_at + 1 から始まる
+    start_idx = insert_at + 1
+    end_idx = start_idx + _utf16_len(anchor_text)
     docs.documents().batchUpdate(
         documentId=document_id,
         body={
-            "requests": [{
-                "updateTextStyle": {
-                    "range": {"startIndex": start_idx, "endIndex": end_idx},
-                    "textStyle": style,
-                    "fields": fields
+            "requests": [
+                {"insertText": {"location": {"index": insert_at},
+                                "text": "\n" + anchor_text + "\n\n"}},
+                {
+                    "updateTextStyle": {
+                        "range": {"startIndex": start_idx, "endIndex": end_idx},
+                        "textStyle": style,
+                        "fields": fields
+                    }
                 }
-            }]
+            ]
         }
-    ).execute()
+    ).execute(num_retries=API_RETRIES)
     print(f"[ok] mid CTA inserted (bold={bold}, font={font_size_pt or 'default'})")
 
-def docs_append_anchor_link(auth: GoogleAuth, document_id: str, anchor_text: str, 
+def docs_append_anchor_link(auth: GoogleAuth, document_id: str, anchor_text: str,
                            url: str, bold: bool = True):
     """末尾にアンカーリンク追加"""
     docs = auth.build_service("docs", "v1")
     
-    insert_text = f"\n\n{anchor_text}\n"
-    docs.documents().batchUpdate(
-        documentId=document_id,
-        body={"requests": [{"insertText": {"endOfSegmentLocation": {}, "text": insert_text}}]}
-    ).execute()
-    
-    doc = docs.documents().get(documentId=document_id).execute()
-    start_idx, end_idx = _find_range_for_text(doc, anchor_text, prefer="last")
-    if start_idx is None:
-        print("[warn] anchor text not found", file=sys.stderr)
-        return
+    # 末尾への挿入位置は本文最後の改行の直前（endOfSegmentLocation と同じ位置）
+    doc = docs.documents().get(documentId=document_id,
+                               fields="body.content.endIndex").execute(num_retries=API_RETRIES)
+    content = doc.get("body", {}).get("content", [])
+    end_of_body = (content[-1].get("endIndex") or 1) - 1 if content else 1
     
-    url = _normalize_url(url)
+    requests = [{"insertText": {"endOfSegmentLocation": {}, "text": f"\n\n{anchor_text}\n"}}]
+    if anchor_text:
+        # "\n\n" の後ろにアンカーが並ぶ
+        start_idx = end_of_body + 2
+        requests.append({
+            "updateTextStyle": {
+                "range": {"startIndex": start_idx, "endIndex": start_idx + _utf16_len(anchor_text)},
+                "textStyle": {"link": {"url": _normalize_url(url)}, "bold": bool(bold)},
+                "fields": "link,bold"
+            }
+        })
     docs.documents().batchUpdate(
         documentId=document_id,
-        body={
-            "requests": [{
-                "updateTextStyle": {
-                    "range": {"startIndex": start_idx, "endIndex": end_idx},
-                    "textStyle": {"link": {"url": url}, "bold": bool(bold)},
-                    "fields": "link,bold"
-                }
-            }]
-        }
-    ).execute()
+        body={"requests": requests}
+    ).execute(num_retries=API_RETRIES)
     print(f"[ok] anchor link appended")
 
 def docs_add_links_to_all_keywords(auth: GoogleAuth, document_id: str, 
                                   keyword: str, url: str):
     """全キーワードにリンク付与"""
     docs = auth.build_service("docs", "v1")
-    doc = docs.documents().get(documentId=document_id).execute()
+    doc = docs.documents().get(documentId=document_id,
+                               fields=DOC_FIELDS_TEXT).execute(num_retries=API_RETRIES)
     
     ranges_to_update: List[Tuple[int, int]] = []
     
@@ -590,21 +748,18 @@ def docs_add_links_to_all_keywords(auth: GoogleAuth, document_id: str,
             }
         })
     
-    docs.documents().batchUpdate(
-        documentId=document_id,
-        body={"requests": requests}
-    ).execute()
+    docs_batch_update_chunked(docs, document_id, requests)
     
     print(f"[ok] {len(ranges_to_update)} keyword links added")
 
 def docs_bold_markdown_asterisks(auth: GoogleAuth, document_id: str):
     """残った**記法を太字化"""
     docs = auth.build_service("docs", "v1")
-    doc = docs.documents().get(documentId=document_id).execute()
+    doc = docs.documents().get(documentId=document_id,
+                               fields=DOC_FIELDS_TEXT).execute(num_retries=API_RETRIES)
     
     bold_requests = []
     delete_ranges = []
-    pat = re.compile(r"\*\*(.+?)\*\*")
     
     for c in doc.get("body", {}).get("content", []):
         para = c.get("paragraph")
@@ -616,7 +771,7 @@ def docs_bold_markdown_asterisks(auth: GoogleAuth, document_id: str):
                 continue
             txt = tr.get("content", "")
             base = (el.get("startIndex") or 0)
-            for m in pat.finditer(txt):
+            for m in BOLD_RX.finditer(txt):
                 inner_start = base + m.start() + 2
                 inner_end = base + m.end() - 2
                 bold_requests.append({
@@ -633,16 +788,15 @@ def docs_bold_markdown_asterisks(auth: GoogleAuth, document_id: str):
         print("[info] no '**..**' found")
         return
     
+    # 書式変更は位置をずらさないので、そのままチャンク分割して送る
     if bold_requests:
-        docs.documents().batchUpdate(documentId=document_id, 
-                                    body={"requests": bold_requests}).execute()
+        docs_batch_update_chunked(docs, document_id, bold_requests)
     
     if delete_ranges:
-        delete_ranges.sort(key=lambda x: x[0], reverse=True)
-        del_reqs = [{"deleteContentRange": {"range": {"startIndex": s, "endIndex": e}}} 
-                   for s, e in delete_ranges]
-        docs.documents().batchUpdate(documentId=document_id, 
-                                    body={"requests": del_reqs}).execute()
+        # 本文を先頭から走査して集めたので昇順。逆順にすれば末尾側から削除できる
+        del_reqs = [{"deleteContentRange": {"range": {"startIndex": s, "endIndex": e}}}
+                    for s, e in reversed(delete_ranges)]
+        docs_batch_update_chunked(docs, document_id, del_reqs)
     
     print(f"[ok] {len(delete_ranges)//2} bold regions fixed")
 
@@ -664,6 +818,11 @@ def main():
     ap.add_argument("--reflow", type=int, default=1)
     ap.add_argument("--sentences-per-para", type=int, default=2)
     ap.add_argument("--fix-bold", type=int, default=1)
+    ap.add_argument("--direct-docs", type=int, default=0,
+                    help="1=HTMLを経由せずDocs APIで本文を直接書き込む（リズム改行・水平線は入らない）")
+    ap.add_argument("--cache-dir", default=".cache/html", help="生成HTMLのキャッシュ先（空文字でキャッシュしない）")
+    ap.add_argument("--manifest", default=".cache/gdoc_manifest.json",
+                    help="作成済みDocの対応表（同じ内容なら作り直さない。空文字で無効）")
     
     args = ap.parse_args()
     
@@ -676,31 +835,60 @@ def main():
         raise FileNotFoundError(f"md not found: {md_path}")
     
     md_text = md_path.read_text(encoding="utf-8").strip()
-    doc_title = None
-    for line in md_text.splitlines():
-        if line.startswith("# "):
-            doc_title = line[2:].strip()
-            break
-    if not doc_title:
-        doc_title = md_path.stem
+    doc_title = md_title(md_text) or md_path.stem
     
     name = (args.title_prefix + " " + doc_title).strip() if args.title_prefix else doc_title
-    html_text = md_to_html(md_text)
-    
-    # リズム改行
-    if int(args.reflow) == 1:
-        html_text = html_text.replace('<strong>', '【BOLDSTART】').replace('</strong>', '【BOLDEND】')
-        html_text = rhythmic_reflow_html(html_text, sentences_per_para=max(1, int(args.sentences_per_para)))
-        html_text = html_text.replace('【BOLDSTART】', '<strong>').replace('【BOLDEND】', '</strong>')
-        print("[ok] reflow completed")
+    sentences_per_para = max(1, int(args.sentences_per_para))
+
+    def _render() -> str:
+        html_text = md_to_html(md_text)
+        # リズム改行
+        if int(args.reflow) == 1:
+            html_text = html_text.replace('<strong>', '【BOLDSTART】').replace('</strong>', '【BOLDEND】')
+            html_text = rhythmic_reflow_html(html_text, sentences_per_para=sentences_per_para)
+            html_text = html_text.replace('【BOLDSTART】', '<strong>').replace('【BOLDEND】', '</strong>')
+            print("[ok] reflow completed")
+        return html_text
+
+    direct = int(args.direct_docs) == 1
+    if direct:
+        html_text = None
+    else:
+        # 同じMD・同じ設定なら前回の変換結果（HTML）を使い回す
+        html_text = get_or_render(
+            md_text, _render, pathlib.Path(__file__),
+            pathlib.Path(args.cache_dir) if args.cache_dir else None,
+            options=f"reflow={int(args.reflow)};sentences_per_para={sentences_per_para}"
+        )
     
     # Google認証
     auth = GoogleAuth()
     
+    # 同じHTML・同じ設定で作成済みの Doc が残っていれば作り直さない
+    manifest = DocManifest(pathlib.Path(args.manifest)) if args.manifest else None
+    # 直接書き込みのときは MD 本文をキーにする（HTML とは別エントリになる）
+    doc_key = doc_manifest_key(md_text if direct else html_text, {
+        "name": name, "folder_id": args.folder_id, "share": int(args.share_anyone_writer),
+        "sheet": args.sheet, "tab": args.tab, "ad_disclosure": args.ad_disclosure,
+        "mid_cta_text": args.mid_cta_text, "last_cta_text": args.last_cta_text,
+        "official_url": config.official_url or "", "fix_bold": int(args.fix_bold),
+    })
+    if manifest is not None:
+        hit = manifest.get(doc_key)
+        if hit and drive_file_alive(auth, hit["file_id"]):
+            print(f"[skip] unchanged, reusing Google Doc: {hit['file_id']}")
+            print(f"[link] {hit['link']}")
+            return
+        if hit:
+            manifest.drop(doc_key)
+    
     # ドキュメント作成
-    file_id, link = drive_create_gdoc_from_html(
-        auth, html_text, name, args.folder_id or None
-    )
+    if direct:
+        file_id, link = docs_create_from_markdown(auth, md_text, name, args.folder_id or None)
+    else:
+        file_id, link = drive_create_gdoc_from_html(
+            auth, html_text, name, args.folder_id or None
+        )
     print(f"[ok] Google Doc created: {file_id}")
     print(f"[link] {link}")
     
@@ -711,13 +899,14 @@ def main():
     
     # スプレッドシート追記
     if args.sheet:
-        sheet_id = sheets_get_or_create_sheet_id(auth, args.sheet, args.tab)
+        sheets_get_or_create_sheet_id(auth, args.sheet, args.tab,
+                                       [args.col_a_width, args.col_b_width])
         sheets_append_title_url(auth, args.sheet, args.tab, doc_title, link)
-        sheets_set_column_widths(auth, args.sheet, sheet_id, 
-                                [args.col_a_width, args.col_b_width])
         print(f"[ok] sheet updated")
     
     official_url = config.official_url or None
+    # 以下の編集は失敗しても続行する。1つでも失敗した Doc は対応表に登録しない（再実行で作り直す）
+    edits_ok = True
     
     # 注意書き
     try:
@@ -725,6 +914,7 @@ def main():
             docs_insert_disclosure_below_title(auth, file_id, args.ad_disclosure.strip())
     except Exception as e:
         print(f"[warn] disclosure failed: {e}", file=sys.stderr)
+        edits_ok = False
     
     # 中盤CTA
     if official_url and args.mid_cta_text:
@@ -733,6 +923,7 @@ def main():
                                    official_url, bold=True, font_size_pt=11)
         except Exception as e:
             print(f"[warn] mid CTA failed: {e}", file=sys.stderr)
+            edits_ok = False
     
     # 末尾CTA
     if official_url:
@@ -741,6 +932,7 @@ def main():
                                    official_url, bold=True)
         except Exception as e:
             print(f"[warn] last CTA failed: {e}", file=sys.stderr)
+            edits_ok = False
     
     # キーワードリンク
     if official_url:
@@ -748,6 +940,7 @@ def main():
             docs_add_links_to_all_keywords(auth, file_id, "公式サイト", official_url)
         except Exception as e:
             print(f"[warn] keyword links failed: {e}", file=sys.stderr)
+            edits_ok = False
     
     # **記法修正
     if int(args.fix_bold) == 1:
@@ -755,6 +948,13 @@ def main():
             docs_bold_markdown_asterisks(auth, file_id)
         except Exception as e:
             print(f"[warn] bold fix failed: {e}", file=sys.stderr)
+            edits_ok = False
+    
+    if manifest is not None:
+        if edits_ok:
+            manifest.put(doc_key, file_id, link, str(md_path))
+        else:
+            print("[info] some edits failed; not recorded in manifest")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
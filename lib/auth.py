@@ -3,12 +3,13 @@
 """Google認証の統合管理"""
 import pathlib
 import sys
-from typing import List
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google.auth.exceptions import RefreshError
-from googleapiclient.discovery import build
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+# Google のクライアントライブラリは import だけで数百ms かかるため、実際に認証・構築するときに読み込む
+# （--help や Markdown 変換だけの実行では読み込まない）
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
 
 SCOPES = [
     "https://www.googleapis.com/auth/drive",
@@ -23,10 +24,14 @@ class GoogleAuth:
                  token_path: str = "token.json"):
         self.credentials_path = pathlib.Path(credentials_path)
         self.token_path = pathlib.Path(token_path)
-        self._creds: Credentials = None
+        self._creds: "Credentials" = None
+        # 構築済みサービスはスレッドごとに持つ（httplib2.Http はスレッドセーフでないため）
+        self._local = threading.local()
     
-    def _run_flow(self) -> Credentials:
+    def _run_flow(self) -> "Credentials":
         """認証フローを実行"""
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        
         if not self.credentials_path.exists():
             raise FileNotFoundError(f"credentials.json が見つかりません: {self.credentials_path}")
         
@@ -43,11 +48,15 @@ class GoogleAuth:
         self.token_path.write_text(creds.to_json(), encoding="utf-8")
         return creds
     
-    def get_credentials(self, force_login: bool = False) -> Credentials:
+    def get_credentials(self, force_login: bool = False) -> "Credentials":
         """認証情報を取得（キャッシュあり）"""
         if self._creds and not force_login:
             return self._creds
         
+        from google.oauth2.credentials import Credentials
+        from google.auth.transport.requests import Request
+        from google.auth.exceptions import RefreshError
+        
         if force_login and self.token_path.exists():
             try:
                 self.token_path.unlink()
@@ -72,7 +81,30 @@ class GoogleAuth:
         self._creds = self._run_flow()
         return self._creds
     
-    def build_service(self, service_name: str, version: str, force_login: bool = False):
-        """Google APIサービスを構築"""
+    def _service_cache(self) -> Dict[Tuple[str, str], Any]:
+        cache = getattr(self._local, "services", None)
+        if cache is None:
+            cache = self._local.services = {}
+        return cache
+    
+    def build_service(self, service_name: str, version: str, force_login: bool = False, **kwargs):
+        """
+        Google APIサービスを構築
+        - 認証情報は get_credentials のキャッシュを共有するので、続けて複数サービスを作ってもトークン更新は1回
+        - static_discovery=True: パッケージ同梱のディスカバリ文書を使い、起動時の取得を省く
+        - cache_discovery=False: oauth2client 4系以降では使われないファイルキャッシュの試行（と警告）を省く
+        - 同じスレッドで同じ (service_name, version) は2回目以降、構築済みのサービスを返す（kwargs 指定時・再ログイン時は作り直す）
+        - HTTP 接続（httplib2.Http）はスレッドセーフでないため、サービス間・スレッド間では共有しない
+        - kwargs は googleapiclient.discovery.build にそのまま渡す
+        """
+        key = (service_name, version)
+        cache = self._service_cache()
+        if not kwargs and not force_login and key in cache:
+            return cache[key]
         creds = self.get_credentials(force_login)
-        return build(service_name, version, credentials=creds)
\ No newline at end of file
+        from googleapiclient.discovery import build
+        options = {"static_discovery": True, "cache_discovery": False, **kwargs}
+        service = build(service_name, version, credentials=creds, **options)
+        if not kwargs:
+            cache[key] = service
+        return service
\ No newline at end of file
@@ -4,19 +4,25 @@
 動画テキストから記事用の情報を抽出
 """
 import json
+import asyncio
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 
 from lib.llm import LLMClient
 
+# 抽出時のチャンク幅と、隣り合うチャンクの重なり（境界で話の流れが切れないように）
+EXTRACTION_CHUNK_CHARS = 30000
+EXTRACTION_CHUNK_OVERLAP = 300
 
-def chunk_text(text: str, max_chars: int = 30000) -> List[str]:
+
+def chunk_text(text: str, max_chars: int = 30000, overlap: int = 0) -> List[str]:
     """
     長いテキストを段落優先で分割
     
     Args:
         text: 分割対象のテキスト
         max_chars: 1チャンクの最大文字数
+        overlap: 次のチャンクを前のチャンク末尾から何文字重ねて始めるか
     
     Returns:
         List[str]: チャンクのリスト
@@ -35,7 +41,15 @@ def chunk_text(text: str, max_chars: int = 30000) -> List[str]:
         chunk = text[i:k].strip()
         if chunk:
             chunks.append(chunk)
-        i = k
+        if k >= n:
+            break
+        
+        # 重ねる場合も行の途中からは始めない
+        nxt = k
+        if overlap > 0:
+            nl = text.find("\n", k - overlap, k)
+            nxt = nl if nl > i else max(k - overlap, i + 1)
+        i = nxt
     
     return chunks
 
@@ -65,6 +79,24 @@ def inject_text_to_prompt(prompt_template: str, text: str) -> str:
     return f"{prompt_template}\n\n【テキスト】\n{text}"
 
 
+def split_prompt_for_cache(prompt_template: str, text: str) -> Tuple[str, str]:
+    """
+    プロンプトを (context, user) に分ける
+    
+    テンプレートは全動画・全キーワードで共通なので context（プロバイダ側キャッシュ対象）に置き、
+    動画ごとに変わるテキストだけを user に回す。
+    テンプレート内の「【テキスト】」欄はユーザーメッセージを指す注記に置き換える。
+    """
+    note = "【テキスト】\n（ユーザーメッセージの【テキスト】を参照）"
+    if "【テキスト】\n添付ファイル" in prompt_template:
+        context = prompt_template.replace("【テキスト】\n添付ファイル", note)
+    elif "【テキスト】" in prompt_template:
+        context = prompt_template.replace("【テキスト】", note)
+    else:
+        context = prompt_template
+    return context, f"【テキスト】\n{text}"
+
+
 def extract_json_from_response(response: str) -> Dict[str, Any]:
     """
     LLMレスポンスからJSON部分を抽出してパース
@@ -108,6 +140,57 @@ def extract_json_from_response(response: str) -> Dict[str, Any]:
     raise ValueError("レスポンスからJSONを抽出できませんでした")
 
 
+EXTRACT_SYSTEM_PROMPT = "あなたは哲学に精通した編集者です。動画から読み応えのある記事素材を抽出してください。"
+EXTRACT_PART_SYSTEM_PROMPT = "あなたは哲学に精通した編集者です。動画の一部から読み応えのある記事素材を抽出してください。"
+MERGE_SYSTEM_PROMPT = "あなたは哲学に精通した編集者です。部分情報を統合して完全な記事素材を作成してください。"
+
+
+def extract_chunk_partial(
+    chunk: str,
+    idx: int,
+    total: int,
+    llm: LLMClient,
+    model: str,
+    prompt_template: str,
+    max_tokens: int = 16000
+) -> str:
+    """
+    チャンク1つから情報を抽出し、統合用のテキスト（JSON文字列 or 生レスポンス）を返す
+    """
+    chunk_with_header = f"[動画の一部: Part {idx}/{total}]\n{chunk}"
+    context, user_prompt = split_prompt_for_cache(prompt_template, chunk_with_header)
+    
+    response = llm.generate(model, EXTRACT_PART_SYSTEM_PROMPT, user_prompt, max_tokens=max_tokens, context=context)
+    try:
+        partial_json = extract_json_from_response(response)
+        return json.dumps(partial_json, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"[warn] チャンク{idx}のJSON抽出失敗: {e}")
+        return response
+
+
+def merge_partial_extractions(
+    partial_results: List[str],
+    llm: LLMClient,
+    model: str,
+    max_tokens: int = 16000
+) -> Dict[str, Any]:
+    """チャンクごとの抽出結果を1つの記事用JSONに統合"""
+    merged_text = "\n\n---\n\n".join(partial_results)
+    
+    reduce_prompt = f"""以下は同一動画の部分ごとに抽出された情報です。
+これらを統合して、一つの記事用JSON情報にまとめてください。
+重複を避け、動画全体の流れを保ちながら統合してください。
+（隣り合う部分は境界付近が少し重なっています）
+
+【部分抽出結果】
+{merged_text}
+"""
+    
+    response = llm.generate(model, MERGE_SYSTEM_PROMPT, reduce_prompt, max_tokens=max_tokens)
+    return extract_json_from_response(response)
+
+
 def extract_video_content(
     video_text: str,
     llm: LLMClient,
@@ -129,14 +212,12 @@ def extract_video_content(
         Dict: 抽出された情報（JSON形式）
     """
     prompt_template = load_prompt(extraction_prompt_path)
-    chunks = chunk_text(video_text, max_chars=30000)
+    chunks = chunk_text(video_text, max_chars=EXTRACTION_CHUNK_CHARS, overlap=EXTRACTION_CHUNK_OVERLAP)
     
     # 短い動画（1チャンク）
     if len(chunks) == 1:
-        user_prompt = inject_text_to_prompt(prompt_template, chunks[0])
-        system_prompt = "あなたは哲学に精通した編集者です。動画から読み応えのある記事素材を抽出してください。"
-        
-        response = llm.generate(model, system_prompt, user_prompt, max_tokens=max_tokens)
+        context, user_prompt = split_prompt_for_cache(prompt_template, chunks[0])
+        response = llm.generate(model, EXTRACT_SYSTEM_PROMPT, user_prompt, max_tokens=max_tokens, context=context)
         return extract_json_from_response(response)
     
     # 長い動画（複数チャンク）- Map-Reduce方式
@@ -146,38 +227,65 @@ def extract_video_content(
     partial_results = []
     for idx, chunk in enumerate(chunks, 1):
         print(f"[map] チャンク {idx}/{len(chunks)} 処理中...")
-        chunk_with_header = f"[動画の一部: Part {idx}/{len(chunks)}]\n{chunk}"
-        user_prompt = inject_text_to_prompt(prompt_template, chunk_with_header)
-        system_prompt = "あなたは哲学に精通した編集者です。動画の一部から読み応えのある記事素材を抽出してください。"
-        
-        response = llm.generate(model, system_prompt, user_prompt, max_tokens=max_tokens)
-        try:
-            partial_json = extract_json_from_response(response)
-            partial_results.append(json.dumps(partial_json, ensure_ascii=False, indent=2))
-        except Exception as e:
-            print(f"[warn] チャンク{idx}のJSON抽出失敗: {e}")
-            partial_results.append(response)
+        partial_results.append(
+            extract_chunk_partial(chunk, idx, len(chunks), llm, model, prompt_template, max_tokens)
+        )
     
     # Reduce: 部分結果を統合
     print("[reduce] 部分結果を統合中...")
-    merged_text = "\n\n---\n\n".join(partial_results)
-    
-    reduce_prompt = f"""以下は同一動画の部分ごとに抽出された情報です。
-これらを統合して、一つの記事用JSON情報にまとめてください。
-重複を避け、動画全体の流れを保ちながら統合してください。
+    return merge_partial_extractions(partial_results, llm, model, max_tokens)
 
-【部分抽出結果】
-{merged_text}
-"""
+
+async def extract_video_content_chunked(
+    video_text: str,
+    llm: LLMClient,
+    model: str,
+    extraction_prompt_path: Path,
+    max_tokens: int = 16000,
+    llm_sem: Optional[asyncio.Semaphore] = None
+) -> Dict[str, Any]:
+    """
+    長い動画向けの extract_video_content（Map をチャンク単位で並行実行）
     
-    response = llm.generate(
-        model,
-        "あなたは哲学に精通した編集者です。部分情報を統合して完全な記事素材を作成してください。",
-        reduce_prompt,
-        max_tokens=max_tokens
-    )
+    各チャンクの LLM 呼び出しは llm_sem を1つずつ取るので、
+    他の動画・キーワードと同じ同時実行数の上限に収まる
     
-    return extract_json_from_response(response)
+    Args:
+        video_text: 動画の文字起こしテキスト
+        llm: LLMクライアント
+        model: 使用するモデル名
+        extraction_prompt_path: 抽出プロンプトのパス
+        max_tokens: 最大トークン数
+        llm_sem: LLM呼び出し用セマフォ（None=制限なし）
+    
+    Returns:
+        Dict: 抽出された情報（JSON形式）
+    """
+    prompt_template = load_prompt(extraction_prompt_path)
+    chunks = chunk_text(video_text, max_chars=EXTRACTION_CHUNK_CHARS, overlap=EXTRACTION_CHUNK_OVERLAP)
+    total = len(chunks)
+    
+    async def _limited(fn, *args):
+        if llm_sem is None:
+            return await asyncio.to_thread(fn, *args)
+        async with llm_sem:
+            return await asyncio.to_thread(fn, *args)
+    
+    if total == 1:
+        return await _limited(extract_video_content, video_text, llm, model, extraction_prompt_path, max_tokens)
+    
+    print(f"[info] 長い動画です。{total}チャンクに分割して並行処理します")
+    
+    async def _map(idx: int, chunk: str) -> str:
+        result = await _limited(extract_chunk_partial, chunk, idx, total, llm, model, prompt_template, max_tokens)
+        print(f"[map] チャンク {idx}/{total} 完了")
+        return result
+    
+    # gather は入力順で返すので、統合時のパート順は保たれる
+    partial_results = await asyncio.gather(*(_map(idx, chunk) for idx, chunk in enumerate(chunks, 1)))
+    
+    print("[reduce] 部分結果を統合中...")
+    return await _limited(merge_partial_extractions, list(partial_results), llm, model, max_tokens)
 
 
 def synthesize_multiple_videos(
@@ -212,9 +320,9 @@ def synthesize_multiple_videos(
         video_infos.append(f"=== 動画{idx}の抽出情報 ===\n{json_text}")
     
     merged_text = "\n\n".join(video_infos)
-    user_prompt = inject_text_to_prompt(prompt_template, merged_text)
+    context, user_prompt = split_prompt_for_cache(prompt_template, merged_text)
     
     system_prompt = "あなたは哲学に精通した編集者です。複数動画の情報を統合して、読み応えのある記事素材を作成してください。"
     
-    response = llm.generate(model, system_prompt, user_prompt, max_tokens=max_tokens)
+    response = llm.generate(model, system_prompt, user_prompt, max_tokens=max_tokens, context=context)
     return extract_json_from_response(response)
\ No newline at end of file
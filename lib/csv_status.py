@@ -0,0 +1,74 @@
+# lib/csv_status.py
+# -*- coding: utf-8 -*-
+"""CSVのステータス列を固定幅にして、mmap でその場書き換えする"""
+import io
+import csv
+import mmap
+import os
+import pathlib
+from typing import Dict, List
+
+# 行の書き出し時にステータス欄の位置を特定するための目印（私用領域の文字なのでクォートされない）
+_MARK = "\ue000"
+
+class FixedWidthStatusCSV:
+    """
+    ステータス列を width 文字（空白埋め）に揃えた CSV を書き出し、
+    以降の更新は各行のステータス欄（バイト位置を記録済み）だけを上書きする
+    - 1回の更新が O(1)（ファイル全体の書き直し不要）
+    - width を超える値は切り詰める。カンマ・引用符・改行は空白に置換する
+    """
+
+    def __init__(self, csv_path: pathlib.Path, fieldnames: List[str], rows: List[Dict[str, str]],
+                 status_col: str, width: int):
+        self.csv_path = csv_path
+        self.status_col = status_col
+        self.width = width
+        self.offsets: List[int] = []
+
+        # 初回だけ全体を書き出し、ステータス欄のバイト位置を記録
+        tmp_path = csv_path.with_suffix(csv_path.suffix + ".tmp")
+        pos = 0
+        with tmp_path.open("wb") as f:
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=fieldnames)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({**row, status_col: _MARK * width})
+            for line in buf.getvalue().splitlines(keepends=True):
+                i = line.find(_MARK * width)
+                if i >= 0:
+                    self.offsets.append(pos + len(line[:i].encode("utf-8")))
+                    line = line[:i] + " " * width + line[i + width:]
+                encoded = line.encode("utf-8")
+                f.write(encoded)
+                pos += len(encoded)
+        os.replace(tmp_path, csv_path)
+
+        # 空白で確保した欄を mmap 経由で実際の値に埋める
+        self._f = csv_path.open("r+b")
+        self._mm = mmap.mmap(self._f.fileno(), 0)
+        for idx, row in enumerate(rows):
+            self.set(idx, row.get(status_col, "") or "")
+        self.flush()
+
+    def _encode(self, value: str) -> bytes:
+        for ch in ',"\r\n':
+            value = value.replace(ch, " ")
+        # 文字の途中で切れないよう、切り詰め後に不完全なバイト列を落とす
+        data = value.encode("utf-8")[:self.width].decode("utf-8", errors="ignore").encode("utf-8")
+        return data.ljust(self.width, b" ")
+
+    def set(self, idx: int, value: str):
+        """idx 行目（ヘッダ除く）のステータスを上書き"""
+        start = self.offsets[idx]
+        data = self._encode(value)
+        self._mm[start:start + len(data)] = data
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        self.flush()
+        self._mm.close()
+        self._f.close()
@@ -0,0 +1,50 @@
+# lib/doc_manifest.py
+# -*- coding: utf-8 -*-
+"""作成済み Google Doc の対応表（内容ハッシュ → ファイルID）を JSON で保持"""
+import hashlib
+import pathlib
+import threading
+from typing import Any, Dict, Optional
+
+from lib.utils import dumps_json, read_json, save_json
+
+
+def doc_manifest_key(html_text: str, settings: Dict[str, Any]) -> str:
+    """キー: 生成HTMLと、Doc の中身・置き場所に影響する設定（タイトル・フォルダ・CTA文言など）の SHA-256"""
+    h = hashlib.sha256()
+    h.update(html_text.encode("utf-8"))
+    h.update(b"\0" + dumps_json(settings, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+class DocManifest:
+    """
+    同じ内容の Doc を作り直さないための対応表
+    - Drive は同じファイルを何度アップロードしても別ファイルとして作るため、こちらで重複を判定する
+    - 登録は全工程（共有・シート追記・各種編集）が成功してから行い、途中で失敗した Doc は再実行時に作り直す
+      （共有をまとめて行う場合は、その共有が成功した Doc だけを後から登録する）
+    - スレッド並列で使えるよう、読み書きはロックで直列化する
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            self.entries = read_json(self.path)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.entries.get(key)
+
+    def put(self, key: str, file_id: str, link: str, source: str = ""):
+        """エントリを追加して即保存"""
+        with self._lock:
+            self.entries[key] = {"file_id": file_id, "link": link, "source": source}
+            save_json(self.path, self.entries)
+
+    def drop(self, key: str):
+        """Drive 側で消えていたエントリを削除"""
+        with self._lock:
+            if self.entries.pop(key, None) is not None:
+                save_json(self.path, self.entries)
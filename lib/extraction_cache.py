@@ -0,0 +1,73 @@
+# lib/extraction_cache.py
+# -*- coding: utf-8 -*-
+"""動画ごとの抽出結果（JSON）をディスクにキャッシュ"""
+import hashlib
+import pathlib
+from typing import Any, Callable, Dict, Optional
+
+from lib.utils import read_json, save_json
+
+
+def extraction_key(video_id: str, prompt_path: pathlib.Path, model: str) -> str:
+    """キャッシュキー: 抽出プロンプト本文・モデル名・動画ID の SHA-256"""
+    h = hashlib.sha256()
+    h.update(pathlib.Path(prompt_path).read_bytes())
+    h.update(b"\0" + model.encode("utf-8"))
+    h.update(b"\0" + video_id.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _cache_path(video_id: str, prompt_path: pathlib.Path, model: str, cache_dir: pathlib.Path) -> pathlib.Path:
+    return pathlib.Path(cache_dir) / f"{extraction_key(video_id, prompt_path, model)}.json"
+
+
+def load_cached(
+    video_id: str,
+    prompt_path: pathlib.Path,
+    model: str,
+    cache_dir: pathlib.Path
+) -> Optional[Dict[str, Any]]:
+    """キャッシュ済みの抽出結果を返す（無ければ None）"""
+    path = _cache_path(video_id, prompt_path, model, cache_dir)
+    if not path.exists():
+        return None
+    print(f"[cache] 抽出結果を再利用: {video_id} ({path.stem[:12]})")
+    return read_json(path)
+
+
+def store_cached(
+    video_id: str,
+    prompt_path: pathlib.Path,
+    model: str,
+    result: Dict[str, Any],
+    cache_dir: pathlib.Path
+):
+    """抽出結果を保存"""
+    # save_json は一時ファイル経由で置換するので、書き込み途中のファイルをヒット扱いしない
+    save_json(_cache_path(video_id, prompt_path, model, cache_dir), result)
+
+
+def get_or_compute(
+    video_id: str,
+    prompt_path: pathlib.Path,
+    model: str,
+    compute_fn: Callable[[], Dict[str, Any]],
+    cache_dir: pathlib.Path
+) -> Dict[str, Any]:
+    """
+    キャッシュにあればそれを返し、無ければ compute_fn() を実行して保存する
+    
+    Args:
+        video_id: YouTube動画ID
+        prompt_path: 抽出プロンプトのパス（内容が変われば別キー）
+        model: 使用モデル名
+        compute_fn: 抽出処理（キャッシュミス時のみ呼ばれる）
+        cache_dir: 保存先ディレクトリ（<hash>.json）
+    """
+    cached = load_cached(video_id, prompt_path, model, cache_dir)
+    if cached is not None:
+        return cached
+    
+    result = compute_fn()
+    store_cached(video_id, prompt_path, model, result, cache_dir)
+    return result
@@ -0,0 +1,59 @@
+# lib/html_cache.py
+# -*- coding: utf-8 -*-
+"""Markdown から生成した HTML をディスクにキャッシュ"""
+import functools
+import hashlib
+import pathlib
+from typing import Callable, Optional
+
+from lib.utils import read_json, save_json
+
+
+@functools.lru_cache(maxsize=None)
+def _renderer_digest(renderer_path: pathlib.Path) -> bytes:
+    """変換スクリプト本体のハッシュ（フォルダ一括処理でも読み込みはプロセスごとに1回）"""
+    return hashlib.blake2b(pathlib.Path(renderer_path).read_bytes(), digest_size=32).digest()
+
+
+def html_cache_key(md_text: str, renderer_path: pathlib.Path, options: str = "") -> str:
+    """キャッシュキー: MD本文・変換スクリプト本体・変換オプションの BLAKE2b"""
+    h = hashlib.blake2b(digest_size=32)
+    h.update(md_text.encode("utf-8"))
+    # 変換コードを書き換えたら古い HTML を使わないよう、スクリプト本体もキーに含める
+    h.update(b"\0" + _renderer_digest(pathlib.Path(renderer_path)))
+    h.update(b"\0" + options.encode("utf-8"))
+    return h.hexdigest()
+
+
+def get_or_render(
+    md_text: str,
+    render_fn: Callable[[], str],
+    renderer_path: pathlib.Path,
+    cache_dir: Optional[pathlib.Path],
+    options: str = ""
+) -> str:
+    """
+    キャッシュにあればその HTML を返し、無ければ render_fn() を実行して保存する
+
+    Args:
+        md_text: 変換元の Markdown 本文
+        render_fn: 変換処理（キャッシュミス時のみ呼ばれる）
+        renderer_path: 変換処理を定義しているスクリプトのパス（内容が変われば別キー）
+        cache_dir: 保存先ディレクトリ（<hash>.json）。None ならキャッシュしない
+        options: 出力に影響する変換オプション（リズム改行の有無など）
+    """
+    if cache_dir is None:
+        return render_fn()
+
+    path = pathlib.Path(cache_dir) / f"{html_cache_key(md_text, renderer_path, options)}.json"
+    if path.exists():
+        print(f"[cache] HTML を再利用: {path.stem[:12]}")
+        return read_json(path)["html"]
+
+    html_text = render_fn()
+    try:
+        save_json(path, {"html": html_text})
+    except OSError as e:
+        # 同じ本文を別スレッドが同時に書いた場合など。キャッシュできなくても処理は続ける
+        print(f"[warn] HTML cache write failed: {e}")
+    return html_text
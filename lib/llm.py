@@ -1,15 +1,83 @@
 # lib/llm.py
 # -*- coding: utf-8 -*-
 """LLMクライアントの統合（GPT-5対応版・temperature削除版）"""
+import re
 import sys
-from typing import Optional
+import importlib.util
+import json
+import time
+import random
+import hashlib
+import pathlib
+import functools
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+import openai
 from openai import OpenAI
 
+from lib.utils import read_json, save_json
+
 try:
+    import anthropic
     from anthropic import Anthropic
 except ImportError:
+    anthropic = None
     Anthropic = None
 
+# h2 があれば HTTP/2 で接続する（同時リクエストを1本の接続に多重化できる）
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# 一時的なエラー（レート制限・接続断・5xx）は指数バックオフで再試行する
+_RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+if anthropic is not None:
+    _RETRYABLE_ERRORS += (anthropic.RateLimitError, anthropic.APIConnectionError, anthropic.InternalServerError)
+
+def cached_llm(fn):
+    """
+    generate() の応答をディスクにキャッシュするデコレータ
+    - キー: (provider, model, max_tokens, system, user) の SHA-256
+    - 保存先: <cache_dir>/<hash>.txt（メタ情報は <hash>.json）
+    - self.cache_dir が None ならキャッシュしない
+    ※ temperature は送っていない（プロバイダ既定値）ためキーに含めない
+    """
+    @functools.wraps(fn)
+    def wrapper(self, model: str, system: str, user: str, max_tokens: int = 6000, **kwargs) -> str:
+        cache_dir = getattr(self, "cache_dir", None)
+        if cache_dir is None:
+            return fn(self, model, system, user, max_tokens, **kwargs)
+        
+        key_src = [self.provider, model, max_tokens, system, user, sorted(kwargs.items())]
+        key = hashlib.sha256(
+            json.dumps(key_src, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        text_path = cache_dir / f"{key}.txt"
+        if text_path.exists():
+            text = text_path.read_text(encoding="utf-8")
+            print(f"[LLM] cache hit {key[:12]} ({len(text)}文字)", flush=True)
+            return text
+        
+        text = fn(self, model, system, user, max_tokens, **kwargs)
+        if text:
+            try:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                meta = {"provider": self.provider, "model": model, "max_tokens": max_tokens,
+                        "system_chars": len(system), "user_chars": len(user)}
+                (cache_dir / f"{key}.json").write_text(
+                    json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+                # 書き込み途中のファイルをヒット扱いしないよう一時ファイル経由で置換
+                # （同じキーを複数スレッドが同時に書いても衝突しないよう、一時ファイル名は毎回別にする）
+                with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=cache_dir,
+                                                 prefix=f"{key}.", suffix=".tmp", delete=False) as f:
+                    f.write(text)
+                pathlib.Path(f.name).replace(text_path)
+            except OSError as e:
+                # キャッシュできなくても、取得済みの応答はそのまま返す
+                print(f"[warn] LLM cache write failed: {e}", flush=True)
+        return text
+    return wrapper
+
 class LLMClient:
     """LLMクライアント（OpenAI/Anthropic統合）"""
     
@@ -58,19 +126,55 @@ class LLMClient:
         "o4-mini": 100000,
     }
     
-    def __init__(self, provider: str, api_key: str):
+    # モデルごとの能力フラグ（初回呼び出しで判明した値を記録）
+    # 例: {"o1-mini": {"max_tokens_key": "max_completion_tokens", "max_tokens_limit": 65536}}
+    MODEL_CAPS: Dict[str, Dict[str, Any]] = {}
+    
+    # 一時エラー時の最大試行回数
+    RETRY_MAX_ATTEMPTS = 6
+    
+    # 接続プールの上限（スレッド・asyncio.to_thread からの同時呼び出しを1つのクライアントで捌く）
+    HTTP_MAX_CONNECTIONS = 32
+    HTTP_MAX_KEEPALIVE = 16
+    
+    def __init__(self, provider: str, api_key: str, cache_dir: Optional[pathlib.Path] = None):
         self.provider = provider.lower()
         self.api_key = api_key
+        # 応答キャッシュの保存先（None=無効）
+        self.cache_dir = pathlib.Path(cache_dir) if cache_dir else None
         
+        # HTTPクライアントはインスタンスで1つだけ作り、全呼び出しで接続（TLSセッション）を使い回す
+        limits = httpx.Limits(max_connections=self.HTTP_MAX_CONNECTIONS,
+                              max_keepalive_connections=self.HTTP_MAX_KEEPALIVE)
         if self.provider == "openai":
-            self.client = OpenAI(api_key=api_key)
+            self.client = OpenAI(api_key=api_key,
+                                 http_client=openai.DefaultHttpxClient(limits=limits, http2=_HTTP2))
         elif self.provider == "anthropic":
             if Anthropic is None:
                 raise RuntimeError("anthropicパッケージが必要です: pip install anthropic")
-            self.client = Anthropic(api_key=api_key)
+            self.client = Anthropic(api_key=api_key,
+                                    http_client=anthropic.DefaultHttpxClient(limits=limits, http2=_HTTP2))
         else:
             raise ValueError(f"未対応のプロバイダー: {provider}")
     
+    def prewarm(self, model: str, connections: int = 1):
+        """
+        軽いAPI呼び出し（モデル情報の取得）で接続プールを温めておく
+        最初の生成リクエストが TLS ハンドシェイク分待たされないようにする。失敗しても無視
+        connections > 1 なら同時に投げて、並列数ぶんのアイドル接続を確保する
+        """
+        def _ping(_=None):
+            try:
+                self.client.models.retrieve(model)
+            except Exception:
+                pass
+        
+        if connections <= 1:
+            _ping()
+            return
+        with ThreadPoolExecutor(max_workers=connections) as ex:
+            list(ex.map(_ping, range(connections)))
+    
     def _get_max_tokens_for_model(self, model: str) -> int:
         """モデルごとの最大出力トークン数を取得"""
         # 完全一致
@@ -91,8 +195,15 @@ class LLMClient:
         reasoning_prefixes = ["gpt-5", "o1", "o3", "o4"]
         return any(model.startswith(prefix) for prefix in reasoning_prefixes)
     
-    def generate(self, model: str, system: str, user: str, max_tokens: int = 6000) -> str:
-        """テキスト生成（temperatureパラメータを削除）"""
+    @cached_llm
+    def generate(self, model: str, system: str, user: str, max_tokens: int = 6000,
+                 first_line_only: bool = False, context: str = "") -> str:
+        """
+        テキスト生成（temperatureパラメータを削除）
+        first_line_only=True のときはストリーミングで受け取り、最初の1行が揃った時点で
+        生成を打ち切る（タイトルのように1行目しか使わない呼び出し向け）
+        context は全呼び出しで共通の参照資料。system より前に置き、プロバイダ側でキャッシュさせる
+        """
         
         # max_tokensを制限
         if self.provider == "openai":
@@ -105,16 +216,84 @@ class LLMClient:
         print(f"[LLM] {self.provider}/{model} (max={max_tokens})", 
               file=sys.stdout, flush=True)
         
+        if first_line_only:
+            text = self._stream_first_line(model, system, user, max_tokens, context)
+            if text:
+                return text
+            # 空（推論トークンで上限到達など）なら通常呼び出しの再試行ロジックに任せる
+            print("[LLM] ストリーミング応答が空 → 通常呼び出しで再試行", file=sys.stderr, flush=True)
+        
         if self.provider == "anthropic":
-            return self._generate_anthropic(model, system, user, max_tokens)
+            return self._generate_anthropic(model, system, user, max_tokens, context)
         else:
-            return self._generate_openai(model, system, user, max_tokens)
+            return self._generate_openai(model, system, user, max_tokens, context)
+    
+    def _stream_first_line(self, model: str, system: str, user: str, max_tokens: int,
+                           context: str = "") -> str:
+        """ストリーミングで受信し、空でない1行目が改行で確定したら接続を閉じて返す"""
+        parts = []
+        
+        def _first_line_done() -> bool:
+            return "\n" in "".join(parts).lstrip()
+        
+        if self.provider == "anthropic":
+            with self.client.messages.stream(
+                model=model,
+                system=self._anthropic_system(system, context),
+                messages=[{"role": "user", "content": user}],
+                max_tokens=max_tokens,
+            ) as stream:
+                for delta in stream.text_stream:
+                    parts.append(delta)
+                    if _first_line_done():
+                        break
+        else:
+            params = self._openai_params(model, system, user, max_tokens, context)
+            params["stream"] = True
+            stream = self._create_openai(params)
+            try:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        if _first_line_done():
+                            break
+            finally:
+                stream.close()
+        
+        text = "".join(parts).strip()
+        print(f"[LLM] 完了 ({len(text)}文字・1行目で打ち切り)", flush=True)
+        return text
     
-    def _generate_anthropic(self, model: str, system: str, user: str, max_tokens: int) -> str:
+    def _with_retry(self, fn, *args, **kwargs):
+        """一時エラー時に指数バックオフ＋ジッタ（1秒〜最大60秒）で再試行"""
+        for attempt in range(1, self.RETRY_MAX_ATTEMPTS + 1):
+            try:
+                return fn(*args, **kwargs)
+            except _RETRYABLE_ERRORS as e:
+                if attempt == self.RETRY_MAX_ATTEMPTS:
+                    raise
+                delay = min(60.0, 2.0 ** (attempt - 1)) + random.uniform(0, 1)
+                print(f"[LLM] 一時エラー（{type(e).__name__}）→ {delay:.1f}秒後に再試行 "
+                      f"({attempt}/{self.RETRY_MAX_ATTEMPTS - 1})", file=sys.stderr, flush=True)
+                time.sleep(delay)
+    
+    @staticmethod
+    def _anthropic_system(system: str, context: str = ""):
+        """context があれば cache_control 付きのブロックとして system の前に置く"""
+        if not context:
+            return system
+        return [
+            {"type": "text", "text": context, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": system},
+        ]
+    
+    def _generate_anthropic(self, model: str, system: str, user: str, max_tokens: int,
+                            context: str = "") -> str:
         """Claude生成（temperatureはデフォルト値を使用）"""
-        resp = self.client.messages.create(
+        resp = self._with_retry(
+            self.client.messages.create,
             model=model,
-            system=system,
+            system=self._anthropic_system(system, context),
             messages=[{"role": "user", "content": user}],
             max_tokens=max_tokens,
         )
@@ -125,107 +304,320 @@ class LLMClient:
         print(f"[LLM] 完了 ({len(text)}文字)", flush=True)
         return text
     
-    def _generate_openai(self, model: str, system: str, user: str, max_tokens: int) -> str:
-        """OpenAI生成（Chat Completions・temperature削除）"""
-        
-        # 推論モデルの場合は max_completion_tokens を使用
-        if self._is_reasoning_model(model):
-            params = {
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user}
-                ],
-                "max_completion_tokens": max_tokens,
-            }
-        else:
-            # 通常モデルは max_tokens を使用
-            params = {
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user}
-                ],
-                "max_tokens": max_tokens,
-            }
-        
+    def _openai_params(self, model: str, system: str, user: str, max_tokens: int,
+                       context: str = "") -> Dict[str, Any]:
+        """
+        MODEL_CAPS（判明済みの能力）に従ってリクエストパラメータを組み立てる
+        context は先頭の system メッセージにする（全呼び出しで同一の先頭部＝自動キャッシュ対象）
+        """
+        caps = self.MODEL_CAPS.get(model, {})
+        # 推論モデルの場合は max_completion_tokens を使用、通常モデルは max_tokens
+        key = caps.get("max_tokens_key") or (
+            "max_completion_tokens" if self._is_reasoning_model(model) else "max_tokens"
+        )
+        limit = caps.get("max_tokens_limit")
+        if limit and max_tokens > limit:
+            max_tokens = limit
+        messages = [{"role": "system", "content": context}] if context else []
+        messages += [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
+        ]
+        return {
+            "model": model,
+            "messages": messages,
+            key: max_tokens,
+        }
+    
+    def _create_openai(self, params: Dict[str, Any]):
+        """
+        Chat Completions 呼び出し
+        パラメータ非対応エラーのときだけ params を直して1回再送し、
+        結果を MODEL_CAPS に記録する（同じモデルの2回目以降は試行錯誤しない）
+        """
+        model = params["model"]
         try:
-            resp = self.client.chat.completions.create(**params)
-            text = (resp.choices[0].message.content or "").strip()
-            
-            # 空レスポンスの検出
-            if not text:
-                print("[LLM] 警告: 空のレスポンスが返されました", file=sys.stderr)
-                finish_reason = resp.choices[0].finish_reason
-                print(f"[LLM] finish_reason: {finish_reason}", file=sys.stderr)
-                
-                # length制限の場合は最大3回まで再試行
-                if finish_reason == "length":
-                    model_max = self._get_max_tokens_for_model(model)
-                    retry_count = 0
-                    max_retries = 3
-                    current_max = max_tokens
-                    
-                    while retry_count < max_retries and not text:
-                        # トークン数を増やす（2倍または残り全て）
-                        new_max = min(current_max * 2, model_max)
-                        if new_max == current_max:
-                            print(f"[LLM] max_tokens上限に達しました: {model_max}", file=sys.stderr)
-                            break
-                        
-                        print(f"[LLM] max_tokens不足 → {new_max} で再試行 (試行 {retry_count + 1}/{max_retries})", flush=True)
-                        
-                        if self._is_reasoning_model(model):
-                            params["max_completion_tokens"] = new_max
-                        else:
-                            params["max_tokens"] = new_max
-                        
-                        resp = self.client.chat.completions.create(**params)
-                        text = (resp.choices[0].message.content or "").strip()
-                        
-                        if not text:
-                            finish_reason = resp.choices[0].finish_reason
-                            print(f"[LLM] まだ空: finish_reason={finish_reason}", file=sys.stderr)
-                            if finish_reason != "length":
-                                break
-                        
-                        current_max = new_max
-                        retry_count += 1
-            
-            print(f"[LLM] 完了 ({len(text)}文字)", flush=True)
-            return text
-            
-        except Exception as e:
+            resp = self._with_retry(self.client.chat.completions.create, **params)
+        except openai.BadRequestError as e:
             error_msg = str(e).lower()
+            caps = self.MODEL_CAPS.setdefault(model, {})
             
             # max_tokens が非対応 → max_completion_tokens に切り替え
             if "max_tokens" in error_msg and ("not supported" in error_msg or "unsupported" in error_msg):
                 print("[LLM] max_tokens非対応 → max_completion_tokensで再試行", flush=True)
-                params.pop("max_tokens", None)
-                params["max_completion_tokens"] = max_tokens
-                
-                resp = self.client.chat.completions.create(**params)
-                text = (resp.choices[0].message.content or "").strip()
-                print(f"[LLM] 完了 ({len(text)}文字)", flush=True)
-                return text
+                params["max_completion_tokens"] = params.pop("max_tokens")
             
             # max_tokensが大きすぎる
             elif "max_tokens is too large" in error_msg or "max_completion_tokens is too large" in error_msg:
-                import re
                 match = re.search(r"at most (\d+)", error_msg)
-                if match:
-                    limit = int(match.group(1))
-                    print(f"[LLM] トークン数超過 → {limit} に調整して再試行", flush=True)
+                if not match:
+                    raise
+                limit = int(match.group(1))
+                print(f"[LLM] トークン数超過 → {limit} に調整して再試行", flush=True)
+                key = "max_completion_tokens" if "max_completion_tokens" in params else "max_tokens"
+                params[key] = limit
+                caps["max_tokens_limit"] = limit
+            
+            # その他のエラー
+            else:
+                raise
+            
+            resp = self._with_retry(self.client.chat.completions.create, **params)
+        
+        key = "max_completion_tokens" if "max_completion_tokens" in params else "max_tokens"
+        self.MODEL_CAPS.setdefault(model, {})["max_tokens_key"] = key
+        return resp
+    
+    def _generate_openai(self, model: str, system: str, user: str, max_tokens: int,
+                         context: str = "") -> str:
+        """OpenAI生成（Chat Completions・temperature削除）"""
+        params = self._openai_params(model, system, user, max_tokens, context)
+        resp = self._create_openai(params)
+        text = (resp.choices[0].message.content or "").strip()
+        
+        # 空レスポンスの検出
+        if not text:
+            print("[LLM] 警告: 空のレスポンスが返されました", file=sys.stderr)
+            finish_reason = resp.choices[0].finish_reason
+            print(f"[LLM] finish_reason: {finish_reason}", file=sys.stderr)
+            
+            # length制限の場合は最大3回まで再試行
+            if finish_reason == "length":
+                model_max = self._get_max_tokens_for_model(model)
+                key = "max_completion_tokens" if "max_completion_tokens" in params else "max_tokens"
+                retry_count = 0
+                max_retries = 3
+                current_max = params[key]
+                
+                while retry_count < max_retries and not text:
+                    # トークン数を増やす（2倍または残り全て）
+                    new_max = min(current_max * 2, model_max)
+                    if new_max == current_max:
+                        print(f"[LLM] max_tokens上限に達しました: {model_max}", file=sys.stderr)
+                        break
                     
-                    if "max_completion_tokens" in params:
-                        params["max_completion_tokens"] = limit
-                    else:
-                        params["max_tokens"] = limit
+                    print(f"[LLM] max_tokens不足 → {new_max} で再試行 (試行 {retry_count + 1}/{max_retries})", flush=True)
                     
-                    resp = self.client.chat.completions.create(**params)
+                    params[key] = new_max
+                    resp = self._create_openai(params)
                     text = (resp.choices[0].message.content or "").strip()
-                    print(f"[LLM] 完了 ({len(text)}文字)", flush=True)
-                    return text
-            
-            # その他のエラー
-            raise e
\ No newline at end of file
+                    
+                    if not text:
+                        finish_reason = resp.choices[0].finish_reason
+                        print(f"[LLM] まだ空: finish_reason={finish_reason}", file=sys.stderr)
+                        if finish_reason != "length":
+                            break
+                    
+                    current_max = new_max
+                    retry_count += 1
+        
+        print(f"[LLM] 完了 ({len(text)}文字)", flush=True)
+        return text
+    
+    # ─────────────── Batch API ───────────────
+    # 大量CSV向け：応答は最大24時間後だが料金は約半額
+    BATCH_POLL_INTERVAL = 30
+    # 1バッチあたりの上限（リクエスト数, 入力サイズ[bytes]）。公称値より少し余裕を持たせる
+    # OpenAI: 50,000件 / 200MB、Anthropic: 100,000件 / 256MB
+    BATCH_LIMITS = {
+        "openai": (50_000, 190 * 1024 * 1024),
+        "anthropic": (100_000, 240 * 1024 * 1024),
+    }
+    
+    def generate_batch(
+        self,
+        model: str,
+        requests: Dict[str, Tuple[str, str]],
+        max_tokens: int,
+        workdir: pathlib.Path,
+        name: str,
+        context: str = "",
+    ) -> Dict[str, str]:
+        """
+        Batch API でまとめて生成する
+        - requests: {custom_id: (system, user)}
+        - context: 全リクエスト共通の参照資料（generate() と同じ扱い）
+        - 戻り値: {custom_id: text}（失敗した custom_id は含まれない）
+        - 入力/出力の JSONL は workdir/<name>.<n>.jsonl, workdir/<name>.<batch_id>.out.jsonl に残す
+        - 件数・サイズが上限を超える場合は複数のバッチに分けて投入する
+        - 投入したバッチIDと成功した応答は workdir/<name>.batch.json に保存する。
+          ポーリング中に中断しても、次回同じリクエストで呼べば投入済みのバッチを待ち直し、
+          取得済みの応答は再投入しない（リクエスト内容のハッシュが一致するものだけ再利用）
+        """
+        if not requests:
+            return {}
+        workdir.mkdir(parents=True, exist_ok=True)
+        if self.provider == "openai":
+            model_max = self._get_max_tokens_for_model(model)
+            if max_tokens > model_max:
+                print(f"[LLM] max_tokens={max_tokens} をモデル上限 {model_max} に調整", flush=True)
+                max_tokens = model_max
+        
+        print(f"[LLM] batch {self.provider}/{model} {name}: {len(requests)}件 (max={max_tokens})", flush=True)
+        lines = {
+            custom_id: json.dumps(self._batch_line(custom_id, model, system, user, max_tokens, context),
+                                  ensure_ascii=False) + "\n"
+            for custom_id, (system, user) in requests.items()
+        }
+        hashes = {
+            custom_id: hashlib.sha256(f"{self.provider}\0{line}".encode("utf-8")).hexdigest()
+            for custom_id, line in lines.items()
+        }
+        
+        state_path = workdir / f"{name}.batch.json"
+        state = read_json(state_path) if state_path.exists() else {}
+        saved = state.get("results", {})
+        results = {cid: r["text"] for cid, r in saved.items() if hashes.get(cid) == r.get("hash")}
+        if results:
+            print(f"[LLM] batch {name}: 前回取得済みの {len(results)}件を再利用", flush=True)
+        # 今回のリクエストに無い応答は捨てる（状態ファイルが際限なく大きくならないように）
+        state = {
+            "seq": state.get("seq", 0),
+            "parts": [p for p in state.get("parts", []) if any(hashes.get(c) == h for c, h in p["ids"].items())],
+            "results": {cid: saved[cid] for cid in results},
+        }
+        
+        # 前回の実行で投入済みのバッチに含まれるものは再投入しない
+        pending = {cid for p in state["parts"] for cid, h in p["ids"].items() if hashes.get(cid) == h}
+        todo = [cid for cid in requests if cid not in results and cid not in pending]
+        if state["parts"]:
+            print(f"[LLM] batch {name}: 投入済みのバッチ {len(state['parts'])}件を待ち直します", flush=True)
+        
+        for chunk in self._split_batch([lines[cid] for cid in todo], todo):
+            in_path = workdir / f"{name}.{state['seq']}.jsonl"
+            in_path.write_text("".join(lines[cid] for cid in chunk), encoding="utf-8")
+            batch_id = self._batch_submit(in_path, [lines[cid] for cid in chunk])
+            print(f"[LLM] batch submitted: {batch_id} ({len(chunk)}件)", flush=True)
+            # ポーリングに入る前に保存しておく（中断しても次回このバッチを待ち直せる）
+            state["seq"] += 1
+            state["parts"].append({"batch_id": batch_id, "ids": {cid: hashes[cid] for cid in chunk}})
+            save_json(state_path, state)
+        
+        while state["parts"]:
+            part = state["parts"][0]
+            for cid, text in self._batch_collect(part["batch_id"], workdir, name).items():
+                if hashes.get(cid) == part["ids"].get(cid):
+                    results[cid] = text
+                    state["results"][cid] = {"hash": hashes[cid], "text": text}
+            state["parts"].pop(0)
+            save_json(state_path, state)
+        
+        print(f"[LLM] batch {name} 完了 ({len(results)}/{len(requests)}件成功)", flush=True)
+        return results
+    
+    def _split_batch(self, lines: List[str], ids: List[str]) -> List[List[str]]:
+        """BATCH_LIMITS の件数・サイズに収まるよう custom_id を先頭から区切る"""
+        max_count, max_bytes = self.BATCH_LIMITS[self.provider]
+        chunks: List[List[str]] = []
+        size = 0
+        for cid, line in zip(ids, lines):
+            n = len(line.encode("utf-8"))
+            if not chunks or len(chunks[-1]) >= max_count or size + n > max_bytes:
+                chunks.append([])
+                size = 0
+            chunks[-1].append(cid)
+            size += n
+        return chunks
+    
+    def _batch_line(self, custom_id: str, model: str, system: str, user: str, max_tokens: int,
+                    context: str = "") -> Dict[str, Any]:
+        """Batch API に渡す1リクエスト分（入力 JSONL の1行）"""
+        if self.provider == "anthropic":
+            return {
+                "custom_id": custom_id,
+                "params": {
+                    "model": model,
+                    "system": self._anthropic_system(system, context),
+                    "messages": [{"role": "user", "content": user}],
+                    "max_tokens": max_tokens,
+                },
+            }
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": self._openai_params(model, system, user, max_tokens, context),
+        }
+    
+    def _batch_submit(self, in_path: pathlib.Path, lines: List[str]) -> str:
+        """バッチを投入してIDを返す"""
+        if self.provider == "anthropic":
+            batch = self._with_retry(self.client.messages.batches.create,
+                                     requests=[json.loads(line) for line in lines])
+            return batch.id
+        with in_path.open("rb") as f:
+            uploaded = self._with_retry(self.client.files.create, file=f, purpose="batch")
+        batch = self._with_retry(
+            self.client.batches.create,
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+    
+    def _batch_collect(self, batch_id: str, workdir: pathlib.Path, name: str) -> Dict[str, str]:
+        """バッチの終了を待って {custom_id: text} を返す（出力は workdir/<name>.<batch_id>.out.jsonl）"""
+        out_path = workdir / f"{name}.{batch_id}.out.jsonl"
+        if self.provider == "anthropic":
+            return self._collect_anthropic(batch_id, out_path)
+        return self._collect_openai(batch_id, out_path)
+    
+    def _wait_batch(self, retrieve, batch_id: str, is_done) -> Any:
+        """バッチが終了状態になるまでポーリング"""
+        while True:
+            batch = self._with_retry(retrieve, batch_id)
+            if is_done(batch):
+                return batch
+            print(f"[LLM] batch {batch_id} 待機中...", flush=True)
+            time.sleep(self.BATCH_POLL_INTERVAL)
+    
+    def _collect_openai(self, batch_id: str, out_path: pathlib.Path) -> Dict[str, str]:
+        batch = self._wait_batch(
+            self.client.batches.retrieve, batch_id,
+            lambda b: b.status in ("completed", "failed", "expired", "cancelled"),
+        )
+        if batch.status != "completed":
+            print(f"[LLM] 警告: batch {batch.id} status={batch.status}", file=sys.stderr)
+        if not batch.output_file_id:
+            return {}
+        
+        raw = self._with_retry(self.client.files.content, batch.output_file_id).text
+        out_path.write_text(raw, encoding="utf-8")
+        
+        results: Dict[str, str] = {}
+        for line in raw.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            resp = item.get("response") or {}
+            if item.get("error") or resp.get("status_code") != 200:
+                print(f"[LLM] batch error {item.get('custom_id')}: {item.get('error') or resp.get('body')}",
+                      file=sys.stderr)
+                continue
+            choices = resp.get("body", {}).get("choices") or [{}]
+            text = ((choices[0].get("message") or {}).get("content") or "").strip()
+            if text:
+                results[item["custom_id"]] = text
+        return results
+    
+    def _collect_anthropic(self, batch_id: str, out_path: pathlib.Path) -> Dict[str, str]:
+        self._wait_batch(
+            self.client.messages.batches.retrieve, batch_id,
+            lambda b: b.processing_status == "ended",
+        )
+        
+        results: Dict[str, str] = {}
+        out_lines = []
+        for entry in self._with_retry(self.client.messages.batches.results, batch_id):
+            out_lines.append(entry.model_dump_json())
+            if entry.result.type != "succeeded":
+                print(f"[LLM] batch error {entry.custom_id}: {entry.result.type}", file=sys.stderr)
+                continue
+            text = "".join(
+                block.text for block in entry.result.message.content
+                if getattr(block, "type", None) == "text"
+            ).strip()
+            if text:
+                results[entry.custom_id] = text
+        out_path.write_text("\n".join(out_lines) + "\n", encoding="utf-8")
+        return results
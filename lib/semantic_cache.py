@@ -0,0 +1,83 @@
+# lib/semantic_cache.py
+# -*- coding: utf-8 -*-
+"""埋め込みベクトルによる近似一致キャッシュ（同義キーワードの記事を使い回す）"""
+import json
+import pathlib
+from typing import Any, Dict, List, Optional
+import numpy as np
+from openai import OpenAI
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# embeddings API の1リクエストあたりの入力上限
+EMBEDDING_BATCH_SIZE = 2048
+
+def embed_texts(api_key: str, texts: List[str], model: str = EMBEDDING_MODEL) -> np.ndarray:
+    """
+    テキスト群を埋め込み、L2正規化した行列 (N, dim) を返す
+    2048件ずつまとめて送るため、HTTP往復は ceil(N/2048) 回で済む
+    """
+    client = OpenAI(api_key=api_key)
+    rows: List[List[float]] = []
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        resp = client.embeddings.create(model=model, input=texts[start:start + EMBEDDING_BATCH_SIZE])
+        rows.extend(d.embedding for d in sorted(resp.data, key=lambda d: d.index))
+    mat = np.array(rows, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return mat / np.maximum(norms, 1e-12)
+
+class SemanticCache:
+    """
+    正規化済みベクトルと記事パスの対応を保持するキャッシュ
+    - 保存先: <cache_dir>/vectors.npy（行列）と <cache_dir>/entries.json（各行のメタ情報）
+    - 内積（=コサイン類似度）が threshold 以上の既存エントリをヒットとみなす
+    """
+
+    def __init__(self, cache_dir: pathlib.Path, threshold: float = 0.95):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.threshold = threshold
+        self.vectors: Optional[np.ndarray] = None
+        self.entries: List[Dict[str, Any]] = []
+
+        vec_path = self.cache_dir / "vectors.npy"
+        ent_path = self.cache_dir / "entries.json"
+        if vec_path.exists() and ent_path.exists():
+            self.vectors = np.load(vec_path)
+            self.entries = json.loads(ent_path.read_text(encoding="utf-8"))
+            if len(self.entries) != len(self.vectors):
+                print("[warn] semantic cache が壊れているため破棄します")
+                self.vectors, self.entries = None, []
+
+    def lookup(self, vec: np.ndarray, exclude_path: Optional[pathlib.Path] = None) -> Optional[Dict[str, Any]]:
+        """
+        最も近いエントリを返す（しきい値未満なら None）
+        exclude_path と同じ保存先のエントリは候補から外す（再実行した行が自分の前回記事にヒットしないように）
+        """
+        if self.vectors is None or not len(self.entries):
+            return None
+        sims = self.vectors @ vec
+        if exclude_path is not None:
+            own = pathlib.Path(exclude_path).resolve()
+            for i, entry in enumerate(self.entries):
+                if pathlib.Path(entry["path"]).resolve() == own:
+                    sims[i] = -np.inf
+        best = int(sims.argmax())
+        if sims[best] < self.threshold:
+            return None
+        return dict(self.entries[best], similarity=float(sims[best]))
+
+    def add(self, vec: np.ndarray, entry: Dict[str, Any]):
+        """エントリを追加して即保存"""
+        row = vec.reshape(1, -1).astype(np.float32)
+        self.vectors = row if self.vectors is None else np.vstack([self.vectors, row])
+        self.entries.append(entry)
+        self._save()
+
+    def _save(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # 途中で落ちても vectors/entries の件数がずれないよう一時ファイル経由で置換
+        tmp_vec = self.cache_dir / "vectors.tmp.npy"
+        np.save(tmp_vec, self.vectors)
+        tmp_ent = self.cache_dir / "entries.json.tmp"
+        tmp_ent.write_text(json.dumps(self.entries, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp_vec.replace(self.cache_dir / "vectors.npy")
+        tmp_ent.replace(self.cache_dir / "entries.json")
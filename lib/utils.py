@@ -1,16 +1,41 @@
 # lib/utils.py
 # -*- coding: utf-8 -*-
 """共通ユーティリティ関数"""
+import os
 import json
 import pathlib
+import tempfile
 from typing import Any, Dict, List
 
+# orjson があれば使う（無ければ標準 json。区切り文字を揃えて出力を一致させる）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps_json(obj: Any, indent: bool = False, sort_keys: bool = False) -> str:
+    """JSON文字列化（非ASCIIはそのまま。indent=True で2スペース整形）"""
+    if orjson is not None:
+        option = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, option=option | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2, sort_keys=sort_keys)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys)
+
+def loads_json(text: str) -> Any:
+    """JSON読み込み（文字列から）"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
 def read_text(path: pathlib.Path) -> str:
     """テキストファイル読み込み"""
     return path.read_text(encoding="utf-8")
 
 def read_json(path: pathlib.Path) -> Dict[str, Any]:
     """JSON読み込み"""
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
     return json.loads(read_text(path))
 
 def read_lines_strip(path: pathlib.Path) -> List[str]:
@@ -26,5 +51,28 @@ def save_text(path: pathlib.Path, content: str):
     path.write_text(content, encoding="utf-8")
 
 def save_json(path: pathlib.Path, obj: Any):
-    """JSON保存"""
-    save_text(path, json.dumps(obj, ensure_ascii=False, indent=2))
\ No newline at end of file
+    """
+    JSON保存（orjson があれば bytes のまま書き込み、文字列化→再エンコードを省く）
+    一時ファイルに書いてから os.replace するので、中断しても壊れた JSON が残らない
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if orjson is not None:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        data = dumps_json(obj, indent=True).encode("utf-8")
+    write_bytes_atomic(path, data)
+
+def write_bytes_atomic(path: pathlib.Path, data: bytes):
+    """
+    同じディレクトリの一時ファイルに書いてから os.replace で置き換える
+    一時ファイル名は毎回別なので、同じパスへ複数スレッドが同時に書いても互いの一時ファイルを壊さない
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp",
+                                     delete=False) as f:
+        f.write(data)
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.unlink(f.name)
+        raise
@@ -30,6 +30,8 @@ class Config:
     
     # 処理設定
     ROW_LIMIT = int(os.getenv("ROW_LIMIT", "0"))
+    # アイキャッチ画像の再圧縮（"webp" で大きな PNG/JPEG を WebP にしてからアップロード。要 Pillow）
+    EYECATCH_RECOMPRESS = os.getenv("EYECATCH_RECOMPRESS", "").strip().lower()
     
     # スプレッドシート列定義
     COL_PERSONA = 0
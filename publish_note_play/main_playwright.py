@@ -104,7 +104,8 @@ async def process_rows_async(dry_run=False, sleep_sec=3.0, sheet_tab=None):
             print(f"[info] ヘッドレスモード: sleep={sleep_sec}秒に調整")
         
         try:
-            note = NoteAutomationPlaywright(page, NoteSelectors, PlaywrightUtils)
+            note = NoteAutomationPlaywright(page, NoteSelectors, PlaywrightUtils,
+                                            recompress=Config.EYECATCH_RECOMPRESS)
             
             # ログイン
             await note.login(Config.NOTE_EMAIL, Config.NOTE_PASSWORD)
@@ -1,18 +1,56 @@
 # publish_note_play/note_automation_playwright.py
 """note_automation_playwright.py (async版)"""
 
+import io
 import os
 import asyncio
-from typing import Optional
+from typing import Optional, Union
 from playwright.async_api import Page, Locator, TimeoutError as PlaywrightTimeout
 
+# Pillow は再圧縮を有効にしたときだけ必要
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# これより小さい画像は再圧縮しない（転送量の差より変換時間のほうが目立つ）
+RECOMPRESS_MIN_BYTES = 100 * 1024
+WEBP_QUALITY = 85
+
+def webp_payload(path: str) -> Optional[dict]:
+    """
+    PNG/JPEG を WebP に再圧縮し、set_input_files / set_files にそのまま渡せる形で返す
+    Pillow が無い・対象外の形式・小さい画像・かえって大きくなる場合は None（元ファイルを使う）
+    """
+    if Image is None:
+        print("[warn] Pillow が無いため再圧縮せずにアップロードします")
+        return None
+    ext = os.path.splitext(path)[1].lower()
+    size = os.path.getsize(path)
+    if ext not in (".png", ".jpg", ".jpeg") or size < RECOMPRESS_MIN_BYTES:
+        return None
+
+    buf = io.BytesIO()
+    with Image.open(path) as im:
+        # 透過を持ちうる画像は RGBA のまま（WebP は透過に対応）
+        im = im.convert("RGBA" if im.mode in ("RGBA", "LA", "P") else "RGB")
+        im.save(buf, "WEBP", quality=WEBP_QUALITY, method=6)
+    data = buf.getvalue()
+    if len(data) >= size:
+        return None
+    print(f"[info] アイキャッチを WebP に再圧縮: {size // 1024}KB -> {len(data) // 1024}KB")
+    name = os.path.splitext(os.path.basename(path))[0] + ".webp"
+    return {"name": name, "mimeType": "image/webp", "buffer": data}
+
 class NoteAutomationPlaywright:
     """note自動化クラス（Playwright/async版）"""
 
-    def __init__(self, page: Page, selectors, utils):
+    def __init__(self, page: Page, selectors, utils, recompress: str = ""):
         self.page = page
         self.sel = selectors
         self.utils = utils
+        # "webp" ならアイキャッチを WebP に再圧縮してからアップロードする
+        self.recompress = recompress
 
     async def is_logged_in(self) -> bool:
         try:
@@ -301,12 +339,21 @@ class NoteAutomationPlaywright:
                 print(f"[warn] サポートされていない画像形式: {ext}")
                 return False
 
+            # アップロードするもの（ファイルパス、または再圧縮したバイト列）
+            upload: Union[str, dict] = abs_path
+            if self.recompress == "webp":
+                try:
+                    # 変換は CPU 処理なのでイベントループを止めないよう別スレッドで
+                    upload = await asyncio.to_thread(webp_payload, abs_path) or abs_path
+                except Exception as e:
+                    print(f"[warn] 再圧縮に失敗したため元の画像を使います: {e}")
+
             # --- ① 直接 input[type=file] にセット（最優先: OSダイアログを出さない） ---
             file_input = await self._find_file_input()
             if file_input:
                 try:
                     # hidden でもOK。UIを一切クリックしないのでエクスプローラーは開かない
-                    await file_input.set_input_files(abs_path)
+                    await file_input.set_input_files(upload)
                     print("[info] ファイル入力完了（直接 set_input_files）")
                     # 保存ボタンがある場合は押しておく（あればでOK）
                     try:
@@ -358,7 +405,7 @@ class NoteAutomationPlaywright:
                     else:
                         raise RuntimeError("「画像をアップロード」ボタンが見つかりません")
                 chooser = await fc_info.value
-                await chooser.set_files(abs_path)  # ← ここでファイルを渡す（OSダイアログは実質制御下）
+                await chooser.set_files(upload)  # ← ここでファイルを渡す（OSダイアログは実質制御下）
                 print("[info] ファイル入力完了（expect_file_chooser）")
             except Exception as e:
                 print(f"[error] filechooser 経由のアップロード失敗: {e}")
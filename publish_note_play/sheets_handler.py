@@ -53,7 +53,9 @@ class SheetsHandler:
             with open("token.json", "w", encoding="utf-8") as f:
                 f.write(creds.to_json())
         
-        self.service = build("sheets", "v4", credentials=creds)
+        # 同梱のディスカバリ文書を使い、起動時の取得とファイルキャッシュの試行を省く
+        self.service = build("sheets", "v4", credentials=creds,
+                             static_discovery=True, cache_discovery=False)
         return self.service
     
     def read_rows(self) -> List[RowItem]:
@@ -15,44 +15,79 @@ YouTube動画から記事用情報を収集するスクリプト
     --csv half_data\keywords\test.csv 
     --out-dir data/generated_infos/
 """
+import os
+import re
 import sys
 import csv
-import json
+import asyncio
 import argparse
 import pathlib
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from lib.config import Config
 from lib.llm import LLMClient
-from lib.youtube_fetcher import fetch_youtube_text
+from lib.youtube_fetcher import extract_video_id, fetch_youtube_text
+from lib.utils import save_json
+from lib.extraction_cache import load_cached, store_cached
 from lib.content_extractor import (
+    EXTRACTION_CHUNK_CHARS,
     extract_video_content,
+    extract_video_content_chunked,
     synthesize_multiple_videos
 )
 
 ROOT = pathlib.Path(__file__).resolve().parent
 
+# 同時実行数の上限（429 やコネクション枯渇を防ぐ。LLMは環境変数で調整可）
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "4"))
+FETCH_CONCURRENCY = int(os.environ.get("FETCH_CONCURRENCY", "8"))
+KW_CONCURRENCY = int(os.environ.get("KW_CONCURRENCY", "2"))
+# CSV一括処理で先読みしておく行数の上限
+CSV_QUEUE_SIZE = 64
+
+# 動画URLの列（最大9本まで）
+URL_COLS = tuple(f"video_url_{i}" for i in range(1, 10))
+
+
+# ファイル名に使えない文字（削除用の変換表）と空白の連続
+_BAD_FILENAME_CHARS = str.maketrans("", "", '\\/:*?"<>|')
+_WHITESPACE_RE = re.compile(r'\s+')
+
 
 def sanitize_filename(text: str, max_length: int = 64) -> str:
     """ファイル名として安全な文字列に変換"""
-    import re
     # 使えない文字を除去
-    safe = re.sub(r'[\\/:*?"<>|]', '', text)
-    safe = re.sub(r'\s+', '_', safe)
+    safe = text.translate(_BAD_FILENAME_CHARS)
+    safe = _WHITESPACE_RE.sub('_', safe)
     return safe[:max_length]
 
 
-def process_single_keyword(
+def video_key(url: str) -> str:
+    """同じ動画を指すURL（watch?v= / youtu.be / shorts）を同一視するためのキー"""
+    try:
+        return extract_video_id(url)
+    except ValueError:
+        return url
+
+
+async def _process_single_keyword_async(
     keyword: str,
     video_urls: List[str],
     llm: LLMClient,
     config: Config,
     extraction_prompt: pathlib.Path,
     synthesis_prompt: pathlib.Path,
-    output_path: pathlib.Path
+    output_path: pathlib.Path,
+    fetch_sem: Optional[asyncio.Semaphore] = None,
+    llm_sem: Optional[asyncio.Semaphore] = None,
+    extraction_cache_dir: Optional[pathlib.Path] = None,
+    shared_videos: Optional[Dict[str, Dict[str, Any]]] = None
 ):
     """
-    1つのキーワードについて複数動画から情報を収集
+    1つのキーワードについて複数動画から情報を収集（動画ごとの取得＋抽出を並行実行）
+    取得は fetch_sem、LLM呼び出しは llm_sem で同時実行数を制限する（未指定なら既定値で作成）
+    extraction_cache_dir を指定すると動画ごとの抽出結果を再利用する（再実行時にLLMを呼ばない）
+    shared_videos をキーワード間で共有すると、同じ動画の取得＋抽出は1回だけ行い結果を使い回す
     
     Args:
         keyword: 主キーワード
@@ -62,47 +97,105 @@ def process_single_keyword(
         extraction_prompt: 抽出プロンプトパス
         synthesis_prompt: 統合プロンプトパス
         output_path: 出力先JSONパス
+        fetch_sem: 文字起こし取得用セマフォ（キーワード間で共有する場合に渡す）
+        llm_sem: LLM呼び出し用セマフォ（同上）
+        extraction_cache_dir: 抽出結果キャッシュの保存先（None=無効）
+        shared_videos: video_key -> {"task": 取得＋抽出タスク, "meta": 動画情報}（None=このキーワード内だけで共有）
     """
+    fetch_sem = fetch_sem or asyncio.Semaphore(FETCH_CONCURRENCY)
+    llm_sem = llm_sem or asyncio.Semaphore(LLM_CONCURRENCY)
+    shared_videos = {} if shared_videos is None else shared_videos
+    
     print(f"\n{'='*60}")
     print(f"[処理開始] キーワード: {keyword}")
     print(f"[処理開始] 動画数: {len(video_urls)}")
     print(f"{'='*60}\n")
     
-    # 各動画から情報抽出
-    extracted_contents = []
-    video_sources = []
+    total = len(video_urls)
+    # 文字起こしが取れた動画の情報（抽出に失敗しても残す）
+    sources: Dict[int, Dict[str, Any]] = {}
     
-    for idx, url in enumerate(video_urls, 1):
-        try:
-            print(f"[{idx}/{len(video_urls)}] 動画取得中: {url}")
-            video_id, text, segments = fetch_youtube_text(url)
-            
-            print(f"[{idx}/{len(video_urls)}] 文字起こし取得完了: {len(text)}文字, {len(segments)}セグメント")
-            
-            # 動画情報を保存
-            video_sources.append({
-                "video_id": video_id,
-                "url": url,
-                "text_length": len(text),
-                "segments_count": len(segments)
-            })
-            
-            # 情報抽出
-            print(f"[{idx}/{len(video_urls)}] 情報抽出中...")
-            content = extract_video_content(
+    async def _fetch_and_extract(idx: int, url: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        # 取得・抽出とも同期APIなのでスレッドに逃がす（待ち時間は動画間で重なる）
+        async with fetch_sem:
+            print(f"[{idx}/{total}] 動画取得中: {url}")
+            video_id, text, segments = await asyncio.to_thread(fetch_youtube_text, url)
+        
+        print(f"[{idx}/{total}] 文字起こし取得完了: {len(text)}文字, {len(segments)}セグメント")
+        
+        # 動画情報を保存（segments は件数だけ残して手放す。並行中の動画分がメモリに溜まらないように）
+        entry["meta"] = {
+            "video_id": video_id,
+            "url": url,
+            "text_length": len(text),
+            "segments_count": len(segments)
+        }
+        del segments
+        
+        if extraction_cache_dir is not None:
+            cached = await asyncio.to_thread(
+                load_cached, video_id, extraction_prompt, config.model_draft, extraction_cache_dir
+            )
+            if cached is not None:
+                print(f"[{idx}/{total}] 抽出完了（キャッシュ）\n")
+                return cached
+        
+        # 情報抽出（長い動画はチャンク単位で llm_sem を取り合って並行抽出）
+        if len(text) > EXTRACTION_CHUNK_CHARS:
+            print(f"[{idx}/{total}] 情報抽出中（チャンク並行）...")
+            content = await extract_video_content_chunked(
                 text,
                 llm,
                 config.model_draft,  # 記事生成と同じモデルを使用
                 extraction_prompt,
-                max_tokens=16000
+                max_tokens=16000,
+                llm_sem=llm_sem
             )
-            
-            extracted_contents.append(content)
-            print(f"[{idx}/{len(video_urls)}] 抽出完了\n")
-            
-        except Exception as e:
-            print(f"[ERROR] 動画{idx}の処理失敗: {e}\n")
+        else:
+            async with llm_sem:
+                print(f"[{idx}/{total}] 情報抽出中...")
+                content = await asyncio.to_thread(
+                    extract_video_content,
+                    text,
+                    llm,
+                    config.model_draft,  # 記事生成と同じモデルを使用
+                    extraction_prompt,
+                    max_tokens=16000
+                )
+        
+        if extraction_cache_dir is not None:
+            await asyncio.to_thread(
+                store_cached, video_id, extraction_prompt, config.model_draft, content, extraction_cache_dir
+            )
+        print(f"[{idx}/{total}] 抽出完了\n")
+        return content
+    
+    async def _one_video(idx: int, url: str) -> Dict[str, Any]:
+        key = video_key(url)
+        entry = shared_videos.get(key)
+        if entry is None:
+            entry = shared_videos[key] = {"meta": None}
+            entry["task"] = asyncio.create_task(_fetch_and_extract(idx, url, entry))
+        else:
+            print(f"[{idx}/{total}] 取得済み（取得中）の動画のため結果を共有: {url}")
+        try:
+            return await entry["task"]
+        finally:
+            # 文字起こしが取れた動画は、抽出に失敗しても情報を残す
+            if entry["meta"] is not None:
+                sources[idx] = dict(entry["meta"], url=url)
+    
+    tasks = [asyncio.create_task(_one_video(idx, url)) for idx, url in enumerate(video_urls, 1)]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    # 入力順を保って集約
+    extracted_contents = []
+    for idx, result in enumerate(results, 1):
+        if isinstance(result, Exception):
+            print(f"[ERROR] 動画{idx}の処理失敗: {result}\n")
             continue
+        extracted_contents.append(result)
+    video_sources = [sources[idx] for idx in sorted(sources)]
     
     if not extracted_contents:
         raise RuntimeError("すべての動画の処理に失敗しました")
@@ -110,13 +203,15 @@ def process_single_keyword(
     # 複数動画の場合は統合
     if len(extracted_contents) > 1:
         print(f"[統合] {len(extracted_contents)}本の動画情報を統合中...")
-        final_content = synthesize_multiple_videos(
-            extracted_contents,
-            llm,
-            config.model_draft,
-            synthesis_prompt,
-            max_tokens=16000
-        )
+        async with llm_sem:
+            final_content = await asyncio.to_thread(
+                synthesize_multiple_videos,
+                extracted_contents,
+                llm,
+                config.model_draft,
+                synthesis_prompt,
+                max_tokens=16000
+            )
         print("[統合] 完了\n")
     else:
         final_content = extracted_contents[0]
@@ -128,84 +223,164 @@ def process_single_keyword(
         "narrative_content": final_content
     }
     
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(
-        json.dumps(info_json, ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
+    # 一時ファイル経由で置換（中断時に壊れた info.json を残さない）
+    save_json(output_path, info_json)
     
     print(f"[完了] 出力: {output_path}")
     print(f"{'='*60}\n")
 
 
-def process_csv(
+def process_single_keyword(
+    keyword: str,
+    video_urls: List[str],
+    llm: LLMClient,
+    config: Config,
+    extraction_prompt: pathlib.Path,
+    synthesis_prompt: pathlib.Path,
+    output_path: pathlib.Path,
+    extraction_cache_dir: Optional[pathlib.Path] = None
+):
+    """1つのキーワードについて複数動画から情報を収集（同期版の入口）"""
+    asyncio.run(_process_single_keyword_async(
+        keyword, video_urls, llm, config, extraction_prompt, synthesis_prompt, output_path,
+        extraction_cache_dir=extraction_cache_dir
+    ))
+
+
+async def process_csv_async(
     csv_path: pathlib.Path,
     llm: LLMClient,
     config: Config,
     extraction_prompt: pathlib.Path,
     synthesis_prompt: pathlib.Path,
     output_dir: pathlib.Path,
-    limit: int = 0
+    limit: int = 0,
+    extraction_cache_dir: Optional[pathlib.Path] = None,
+    force: bool = False
 ):
     """
-    CSVファイルから一括処理
+    CSVファイルから一括処理（キーワードを KW_CONCURRENCY 件ずつ並行処理）
+    CSVは全行を読み込まず、1行ずつキューに流して KW_CONCURRENCY 個のワーカーで処理する
+    出力JSONが既にあるキーワードは取得・LLM呼び出しの前にスキップする（force=True で作り直す）
     
     CSV形式:
       primary_keyword,video_url_1,video_url_2,video_url_3
     """
-    with csv_path.open("r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-    
-    required_cols = ["primary_keyword"]
-    if not all(col in reader.fieldnames for col in required_cols):
-        raise ValueError(f"CSVに必須列がありません: {required_cols}")
-    
+    # 取得・LLM の各上限は全キーワードで共有する
+    fetch_sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+    llm_sem = asyncio.Semaphore(LLM_CONCURRENCY)
+    # 複数キーワードから参照される動画は取得＋抽出を1回だけにする
+    shared_videos: Dict[str, Dict[str, Any]] = {}
+    # 読み込み済みの行を溜めすぎないよう上限付き
+    queue: asyncio.Queue = asyncio.Queue(maxsize=CSV_QUEUE_SIZE)
     processed = 0
+    running = 0
+    skipped = 0
+    existing = 0
+    refs = 0
     
-    for idx, row in enumerate(rows, 1):
-        if limit > 0 and processed >= limit:
-            print(f"[制限] 処理上限({limit}件)に達しました")
-            break
-        
-        keyword = row.get("primary_keyword", "").strip()
-        if not keyword:
-            print(f"[スキップ] 行{idx}: キーワードが空です")
-            continue
-        
-        # 動画URLを収集（video_url_1, video_url_2, ... の列）
-        video_urls = []
-        for i in range(1, 10):  # 最大9本まで
-            url_col = f"video_url_{i}"
-            # Noneチェックを追加
-            if url_col in row and row[url_col] is not None and row[url_col].strip():
-                video_urls.append(row[url_col].strip())
-        
-        if not video_urls:
-            print(f"[スキップ] 行{idx}: 動画URLがありません")
-            continue
-        
-        # 出力ファイル名
-        filename = sanitize_filename(keyword) + ".json"
-        output_path = output_dir / filename
-        
+    async def _kw(keyword: str, video_urls: List[str], output_path: pathlib.Path):
+        nonlocal processed, running, skipped
+        # limit は成功件数の上限なので、処理中の件数も見込んで開始を止める
+        if limit > 0 and processed + running >= limit:
+            skipped += 1
+            return
+        running += 1
         try:
-            process_single_keyword(
+            await _process_single_keyword_async(
                 keyword,
                 video_urls,
                 llm,
                 config,
                 extraction_prompt,
                 synthesis_prompt,
-                output_path
+                output_path,
+                fetch_sem=fetch_sem,
+                llm_sem=llm_sem,
+                extraction_cache_dir=extraction_cache_dir,
+                shared_videos=shared_videos
             )
             processed += 1
         except Exception as e:
+            # 1件の失敗で他を止めない
             print(f"[ERROR] キーワード「{keyword}」の処理失敗: {e}\n")
-            continue
+        finally:
+            running -= 1
+    
+    async def _worker():
+        while (job := await queue.get()) is not None:
+            await _kw(*job)
+    
+    with csv_path.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames or []
+        
+        required_cols = ["primary_keyword"]
+        if not all(col in fieldnames for col in required_cols):
+            raise ValueError(f"CSVに必須列がありません: {required_cols}")
+        
+        # CSVに存在するURL列だけを見る
+        url_cols = [col for col in URL_COLS if col in fieldnames]
+        workers = [asyncio.create_task(_worker()) for _ in range(KW_CONCURRENCY)]
+        
+        try:
+            for idx, row in enumerate(reader, 1):
+                keyword = (row.get("primary_keyword") or "").strip()
+                if not keyword:
+                    print(f"[スキップ] 行{idx}: キーワードが空です")
+                    continue
+                
+                # 動画URLを収集（video_url_1, video_url_2, ... の列）
+                # 列が足りない行は None になるので空文字扱い
+                video_urls = [url for col in url_cols if (url := (row[col] or "").strip())]
+                
+                if not video_urls:
+                    print(f"[スキップ] 行{idx}: 動画URLがありません")
+                    continue
+                
+                # 出力ファイル名
+                output_path = output_dir / (sanitize_filename(keyword) + ".json")
+                # 出力は一時ファイル経由で置換しているので、存在すれば完成済み
+                if output_path.exists() and not force:
+                    print(f"[スキップ] 行{idx}: 出力済み {output_path}")
+                    existing += 1
+                    continue
+                
+                refs += len(video_urls)
+                # キューが一杯ならワーカーが空くまで待つ（読み込みが処理より先に進みすぎない）
+                await queue.put((keyword, video_urls, output_path))
+        finally:
+            # 終了の合図（ワーカー1つにつき1つ）
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
     
+    if refs > len(shared_videos) > 0:
+        print(f"[情報] 動画 {refs}件の参照のうち、取得・抽出したのは重複を除いた {len(shared_videos)}件です")
+    if skipped:
+        print(f"[制限] 処理上限({limit}件)に達しました")
+    if existing:
+        print(f"[スキップ] 出力済み: {existing}件（作り直す場合は --force）")
     print(f"\n[完了] {processed}件のキーワードを処理しました")
 
+def process_csv(
+    csv_path: pathlib.Path,
+    llm: LLMClient,
+    config: Config,
+    extraction_prompt: pathlib.Path,
+    synthesis_prompt: pathlib.Path,
+    output_dir: pathlib.Path,
+    limit: int = 0,
+    extraction_cache_dir: Optional[pathlib.Path] = None,
+    force: bool = False
+):
+    """CSVファイルから一括処理（同期版の入口）"""
+    asyncio.run(process_csv_async(
+        csv_path, llm, config, extraction_prompt, synthesis_prompt, output_dir, limit,
+        extraction_cache_dir=extraction_cache_dir,
+        force=force
+    ))
+
 
 def main():
     ap = argparse.ArgumentParser(
@@ -244,6 +419,11 @@ def main():
         default=0,
         help="処理上限（0=無制限）"
     )
+    ap.add_argument(
+        "--force",
+        action="store_true",
+        help="CSV一括処理: 出力JSONが既にあるキーワードも作り直す"
+    )
     
     # プロンプト設定（raw stringでWindows対応）
     ap.add_argument(
@@ -257,6 +437,18 @@ def main():
         help="複数動画統合プロンプト"
     )
     
+    # 抽出結果キャッシュ
+    ap.add_argument(
+        "--extraction-cache-dir",
+        default=str(ROOT / "data" / ".extraction_cache"),
+        help="動画ごとの抽出結果キャッシュの保存先"
+    )
+    ap.add_argument(
+        "--no-extraction-cache",
+        action="store_true",
+        help="抽出結果キャッシュを使わない"
+    )
+    
     args = ap.parse_args()
     
     # 設定読み込み
@@ -278,6 +470,8 @@ def main():
     if not synthesis_prompt.exists():
         raise FileNotFoundError(f"統合プロンプトが見つかりません: {synthesis_prompt}")
     
+    extraction_cache_dir = None if args.no_extraction_cache else pathlib.Path(args.extraction_cache_dir)
+    
     # 実行モード判定
     if args.keyword:
         # 単発実行
@@ -290,15 +484,16 @@ def main():
         
         output_path = pathlib.Path(args.out)
         
-        process_single_keyword(
+        asyncio.run(_process_single_keyword_async(
             args.keyword,
             urls,
             llm,
             config,
             extraction_prompt,
             synthesis_prompt,
-            output_path
-        )
+            output_path,
+            extraction_cache_dir=extraction_cache_dir
+        ))
     
     else:
         # CSV一括処理
@@ -311,15 +506,17 @@ def main():
         
         output_dir = pathlib.Path(args.out_dir)
         
-        process_csv(
+        asyncio.run(process_csv_async(
             csv_path,
             llm,
             config,
             extraction_prompt,
             synthesis_prompt,
             output_dir,
-            args.limit
-        )
+            args.limit,
+            extraction_cache_dir=extraction_cache_dir,
+            force=args.force
+        ))
 
 
 if __name__ == "__main__":
@@ -23,22 +23,23 @@ import argparse
 import io
 import re
 import html
-from typing import List, Tuple, Optional, Iterable
-
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Tuple, Optional, Iterable, Iterator
 
 # 共通モジュール
 from lib.auth import GoogleAuth
 from lib.config import Config
+from lib.doc_manifest import DocManifest, doc_manifest_key
+from lib.html_cache import get_or_render
 
 # ─────────────── Markdown → HTML 変換 ───────────────
 RX_UL_HEAD = re.compile(r"^\s*-\s+")
 RX_OL_HEAD = re.compile(r"^\s*\d+[.)]\s+")
-RX_UL_INLINE_START = re.compile(r"-\s+\S")
-RX_OL_INLINE_START = re.compile(r"\d+[.)]\s+\S")
-RX_UL_SPLIT = re.compile(r"-\s+")
-RX_OL_SPLIT = re.compile(r"\d+[.)]\s+")
+# 最初の「# 」行（タイトル）。行リストを作らず、見つかった時点で走査を打ち切る
+RX_H1_LINE = re.compile(r"^# (.*)$", re.M)
+# 行中の箇条書きマーカー（「- 」「1. 」「1) 」）。finditer 1回で全マーカーの位置を取る
+RX_INLINE_LIST = re.compile(r"(?P<ul>-)\s+(?=\S)|(?P<ol>\d+[.)])\s+(?=\S)")
 RX_POST_TOKENS = re.compile("|".join(map(re.escape, [
     "これらの", "これにより", "続いて", "次に", "ここでは", "なお", "ただし",
     "一方で", "以上", "また", "さらに", "加えて", "最後に"
@@ -59,6 +60,9 @@ def _split_last_item(item: str) -> Tuple[str, str]:
 
 def render_inline(text: str) -> str:
     """インライン要素のレンダリング(**..**を<strong>に)"""
+    # 太字の無い行（大半）は照合もリスト作成もせずにエスケープだけ
+    if "**" not in text:
+        return html.escape(text)
     out: List[str] = []
     pos = 0
     for m in BOLD_RX.finditer(text):
@@ -69,10 +73,86 @@ def render_inline(text: str) -> str:
     out.append(html.escape(text[pos:]))
     return "".join(out)
 
+def _split_inline_list(ln: str) -> Optional[Tuple[str, str, List[str]]]:
+    """
+    1行に詰め込まれた箇条書き（「- a - b - c」「1. a 2. b 3. c」）を (タグ, 前置き, 項目) に分ける
+    - 最初に現れたマーカーの種類で ul/ol を決め、同じ種類のマーカー位置で切る
+    - 項目が3つ未満なら None
+    """
+    marks = list(RX_INLINE_LIST.finditer(ln))
+    if not marks:
+        return None
+    kind = marks[0].lastgroup
+    cuts = [m for m in marks if m.lastgroup == kind]
+    ends = [m.start() for m in cuts[1:]] + [len(ln)]
+    parts = [ln[m.end():e].strip() for m, e in zip(cuts, ends)]
+    parts = [p for p in parts if p]
+    if len(parts) < 3:
+        return None
+    return kind, ln[:cuts[0].start()].strip(), parts
+
+def md_title(md: str) -> Optional[str]:
+    """最初の H1（「# 」行）の見出し文字列。無ければ None"""
+    m = RX_H1_LINE.search(md)
+    return (m.group(1).strip() or None) if m else None
+
+def _md_blocks(md: str) -> Iterator[Tuple[str, str]]:
+    """
+    Markdown を (種類, 本文) のブロック列にする（md_to_html / md_to_docs_requests 共通）
+    - 種類: h1/h2/h3/p/hr/blank、箇条書きの項目は ul/ol
+    - end は行中の箇条書きの前後の区切り（直前のリストをそこで閉じる）
+    """
+    for ln in md.splitlines():
+        # 先頭文字で行の種類を振り分け、正規表現は候補になった行にだけ使う
+        c = ln.lstrip()[:1]
+        if not c:
+            yield "blank", ""; continue
+
+        if c == "#":
+            if ln.startswith("### "):
+                yield "h3", ln[4:].strip(); continue
+            if ln.startswith("## "):
+                yield "h2", ln[3:].strip(); continue
+            if ln.startswith("# "):
+                yield "h1", ln[2:].strip(); continue
+        elif c == "-":
+            if ln.strip() == "---":
+                yield "hr", ""; continue
+            m = RX_UL_HEAD.match(ln)
+            if m:
+                yield "ul", ln[m.end():].strip(); continue
+        elif c.isdigit():
+            m = RX_OL_HEAD.match(ln)
+            if m:
+                yield "ol", ln[m.end():].strip(); continue
+
+        inline = _split_inline_list(ln)
+        if inline:
+            tag, prefix, parts = inline
+            parts[-1], post = _split_last_item(parts[-1])
+            if prefix: yield "p", prefix
+            yield "end", ""
+            for it in parts: yield tag, it
+            yield "end", ""
+            if post: yield "p", post
+            continue
+
+        yield "p", ln
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width,initial-scale=1">
+<title>Imported Article</title>
+</head>
+<body>"""
+_HTML_TAIL = "</body>\n</html>"
+
 def md_to_html(md: str) -> str:
     """Markdown→HTML変換(簡易版)"""
-    lines = md.splitlines()
-    out: List[str] = []
+    # 外枠（<!DOCTYPE>〜<body>、</body></html>）も同じリストに入れ、文書全体を1回の join で作る
+    out: List[str] = [_HTML_HEAD]
     in_list = False
     list_tag: Optional[str] = None
 
@@ -92,129 +172,158 @@ def md_to_html(md: str) -> str:
             in_list = True
             list_tag = tag
 
-    for raw in lines:
-        ln = raw.rstrip("\n")
-
-        if ln.strip() == "---":
-            close_list(); out.append("<hr>"); continue
-        if ln.startswith("### "):
-            close_list(); out.append(f"<h3>{render_inline(ln[4:].strip())}</h3>"); continue
-        if ln.startswith("## "):
-            close_list(); out.append(f"<h2>{render_inline(ln[3:].strip())}</h2>"); continue
-        if ln.startswith("# "):
-            close_list(); out.append(f"<h1>{render_inline(ln[2:].strip())}</h1>"); continue
-
-        if RX_UL_HEAD.match(ln):
-            after = RX_UL_HEAD.sub("", ln).strip()
-            open_list("ul"); out.append(f"<li>{render_inline(after)}</li>"); continue
-        if RX_OL_HEAD.match(ln):
-            after = RX_OL_HEAD.sub("", ln, count=1).strip()
-            open_list("ol"); out.append(f"<li>{render_inline(after)}</li>"); continue
-
-        m_ul = RX_UL_INLINE_START.search(ln)
-        m_ol = RX_OL_INLINE_START.search(ln)
-        if m_ul or m_ol:
-            if m_ul and (not m_ol or m_ul.start() <= m_ol.start()):
-                prefix = ln[:m_ul.start()].strip(); rest = ln[m_ul.start():].strip()
-                parts = [s.strip() for s in RX_UL_SPLIT.split(rest) if s.strip()]
-                if len(parts) >= 3:
-                    parts[-1], post = _split_last_item(parts[-1])
-                    close_list()
-                    if prefix: out.append(f"<p>{render_inline(prefix)}</p>")
-                    open_list("ul")
-                    for it in parts: out.append(f"<li>{render_inline(it)}</li>")
-                    close_list()
-                    if post: out.append(f"<p>{render_inline(post)}</p>")
-                    continue
-            else:
-                prefix = ln[:m_ol.start()].strip(); rest = ln[m_ol.start():].strip()
-                parts = [s.strip() for s in RX_OL_SPLIT.split(rest) if s.strip()]
-                if len(parts) >= 3:
-                    parts[-1], post = _split_last_item(parts[-1])
-                    close_list()
-                    if prefix: out.append(f"<p>{render_inline(prefix)}</p>")
-                    open_list("ol")
-                    for it in parts: out.append(f"<li>{render_inline(it)}</li>")
-                    close_list()
-                    if post: out.append(f"<p>{render_inline(post)}</p>")
-                    continue
-
-        if ln.strip() == "":
-            close_list(); out.append(""); continue
-
-        close_list(); out.append(f"<p>{render_inline(ln)}</p>")
+    for kind, text in _md_blocks(md):
+        if kind in ("ul", "ol"):
+            open_list(kind); out.append(f"<li>{render_inline(text)}</li>"); continue
+        close_list()
+        if kind == "blank":
+            # 連続する空行は1つにまとめる（close_list で閉じタグが入れば別の空行として残す）
+            if not out or out[-1] != "":
+                out.append("")
+        elif kind == "hr":
+            out.append("<hr>")
+        elif kind != "end":
+            out.append(f"<{kind}>{render_inline(text)}</{kind}>")
 
     close_list()
 
-    html_body: List[str] = []
-    prev_blank = False
-    for x in out:
-        if x == "":
-            if not prev_blank:
-                html_body.append("")
-            prev_blank = True
-        else:
-            html_body.append(x)
-            prev_blank = False
-
-    body = "\n".join(html_body)
-    return f"""<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8">
-<meta name="viewport" content="width=device-width,initial-scale=1">
-<title>Imported Article</title>
-</head>
-<body>
-{body}
-</body>
-</html>"""
+    if len(out) == 1:
+        # 本文が空でも <body> と </body> の間の空行は残す
+        out.append("")
+    out.append(_HTML_TAIL)
+    return "\n".join(out)
 
 # ─────────────── Google Drive/Docs/Sheets操作 ───────────────
+# 429・5xx・接続断は googleapiclient 組み込みの指数バックオフ（ジッター付き）で再試行する
+API_RETRIES = 5
+# これ以上のサイズは再開可能アップロード（チャンク単位で送信）にする
+RESUMABLE_UPLOAD_MIN_BYTES = 5 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+
 def drive_create_gdoc_from_html(auth: GoogleAuth, html_text: str, name: str,
                                folder_id: Optional[str] = None) -> Tuple[str, str]:
-    """HTMLからGoogleドキュメントを作成"""
+    """
+    HTMLからGoogleドキュメントを作成
+    RESUMABLE_UPLOAD_MIN_BYTES 以上は再開可能アップロードにし、途中で切れても送信済みのチャンクから続ける
+    """
+    from googleapiclient.http import MediaIoBaseUpload
+
     drive = auth.build_service("drive", "v3")
-    media = MediaIoBaseUpload(io.BytesIO(html_text.encode("utf-8")),
-                             mimetype="text/html", resumable=False)
+    data = html_text.encode("utf-8")
+    resumable = len(data) >= RESUMABLE_UPLOAD_MIN_BYTES
+    media = MediaIoBaseUpload(io.BytesIO(data), mimetype="text/html",
+                              chunksize=UPLOAD_CHUNK_BYTES, resumable=resumable)
     metadata = {"name": name, "mimeType": "application/vnd.google-apps.document"}
     if folder_id:
         metadata["parents"] = [folder_id]
-    file = drive.files().create(body=metadata, media_body=media,
-                               fields="id, webViewLink").execute()
+    request = drive.files().create(body=metadata, media_body=media, fields="id, webViewLink")
+    if not resumable:
+        file = request.execute(num_retries=API_RETRIES)
+    else:
+        file = None
+        while file is None:
+            _, file = request.next_chunk(num_retries=API_RETRIES)
     return file["id"], file.get("webViewLink", "")
 
+def drive_file_alive(auth: GoogleAuth, file_id: str) -> bool:
+    """ファイルが存在し、ゴミ箱にも入っていないか"""
+    from googleapiclient.errors import HttpError
+
+    drive = auth.build_service("drive", "v3")
+    try:
+        file = drive.files().get(fileId=file_id, fields="id,trashed").execute(num_retries=API_RETRIES)
+    except HttpError as e:
+        if e.resp.status == 404:
+            return False
+        raise
+    return not file.get("trashed", False)
+
 def drive_share_anyone_writer(auth: GoogleAuth, file_id: str):
     """誰でも編集可能に設定"""
     drive = auth.build_service("drive", "v3")
     drive.permissions().create(fileId=file_id,
-                              body={"type": "anyone", "role": "writer"}).execute()
+                              body={"type": "anyone", "role": "writer"}).execute(num_retries=API_RETRIES)
 
-def sheets_get_or_create_sheet_id(auth: GoogleAuth, spreadsheet_id: str,
-                                  sheet_name: str) -> int:
-    """シートIDを取得(なければ作成)"""
-    sheets = auth.build_service("sheets", "v4")
-    meta = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+# Drive のバッチリクエスト1回に載せられる上限
+DRIVE_BATCH_SIZE = 100
 
-    for sh in meta.get("sheets", []):
-        if sh.get("properties", {}).get("title") == sheet_name:
-            return int(sh["properties"]["sheetId"])
+def drive_share_anyone_writer_batch(auth: GoogleAuth, file_ids: List[str]) -> List[str]:
+    """
+    複数ファイルをまとめて誰でも編集可能に設定（バッチリクエストで100件ずつ、N件でも往復は ceil(N/100) 回）
+    失敗したファイルIDのリストを返す
+    """
+    drive = auth.build_service("drive", "v3")
+    failed: List[str] = []
 
-    sheets.spreadsheets().batchUpdate(
-        spreadsheetId=spreadsheet_id,
-        body={"requests": [{"addSheet": {"properties": {"title": sheet_name}}}]}
-    ).execute()
+    def _callback(request_id, response, exception):
+        if exception is not None:
+            failed.append(request_id)
+            print(f"[warn] sharing failed: {request_id} -> {exception}", file=sys.stderr)
 
-    meta = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-    for sh in meta.get("sheets", []):
-        if sh.get("properties", {}).get("title") == sheet_name:
-            return int(sh["properties"]["sheetId"])
+    for start in range(0, len(file_ids), DRIVE_BATCH_SIZE):
+        batch = drive.new_batch_http_request(callback=_callback)
+        for file_id in file_ids[start:start + DRIVE_BATCH_SIZE]:
+            batch.add(drive.permissions().create(fileId=file_id, fields="id",
+                                                 body={"type": "anyone", "role": "writer"}),
+                      request_id=file_id)
+        batch.execute()
+    return failed
 
-    raise RuntimeError(f"シート作成失敗: {sheet_name}")
+# (spreadsheet_id, シート名) → シートID。フォルダ一括処理で2件目以降は Sheets に問い合わせない
+_SHEET_IDS: Dict[Tuple[str, str], int] = {}
 
-def sheets_set_column_widths(auth: GoogleAuth, spreadsheet_id: str,
-                            sheet_id: int, widths_px: List[int]):
-    """列幅設定"""
+def sheets_get_or_create_sheet_id(auth: GoogleAuth, spreadsheet_id: str,
+                                  sheet_name: str, widths_px: Optional[List[int]] = None) -> int:
+    """
+    シートIDを取得（なければ作成）し、widths_px があれば列幅も設定する
+    - まず addSheet と列幅設定を1回の batchUpdate で送り、作成したシートIDを返信から読む
+    - 既にある場合は sheets.properties だけを get して、列幅を別途設定する
+    - 同じプロセスで解決済みのシートは、API を呼ばずに覚えている ID を返す
+    """
+    from googleapiclient.errors import HttpError
+
+    cached = _SHEET_IDS.get((spreadsheet_id, sheet_name))
+    if cached is not None:
+        return cached
+
+    sheets = auth.build_service("sheets", "v4")
+    # 列幅の指定に ID が要るので、作成前にタイトルから決めておく（0 は既定シートと重なるので避ける）
+    sheet_id = zlib.crc32(sheet_name.encode("utf-8")) & 0x7FFFFFFF or 1
+    reqs = [{"addSheet": {"properties": {"sheetId": sheet_id, "title": sheet_name}}}]
+    reqs += _column_width_requests(sheet_id, widths_px or [])
+    try:
+        resp = sheets.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id, body={"requests": reqs}
+        ).execute(num_retries=API_RETRIES)
+        sheet_id = int(resp["replies"][0]["addSheet"]["properties"]["sheetId"])
+        _SHEET_IDS[(spreadsheet_id, sheet_name)] = sheet_id
+        return sheet_id
+    except HttpError as e:
+        if e.resp.status != 400 or "already exists" not in str(e):
+            raise
+
+    meta = sheets.spreadsheets().get(
+        spreadsheetId=spreadsheet_id, fields="sheets.properties(sheetId,title)"
+    ).execute(num_retries=API_RETRIES)
+    for sh in meta.get("sheets", []):
+        if sh.get("properties", {}).get("title") == sheet_name:
+            sheet_id = int(sh["properties"]["sheetId"])
+            break
+    else:
+        # タイトルは無いのに ID が他のシートと重なった場合。ID は API に任せて作り直す
+        resp = sheets.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={"requests": [{"addSheet": {"properties": {"title": sheet_name}}}]}
+        ).execute(num_retries=API_RETRIES)
+        sheet_id = int(resp["replies"][0]["addSheet"]["properties"]["sheetId"])
+
+    if widths_px:
+        sheets_set_column_widths(auth, spreadsheet_id, sheet_id, widths_px)
+    _SHEET_IDS[(spreadsheet_id, sheet_name)] = sheet_id
+    return sheet_id
+
+def _column_width_requests(sheet_id: int, widths_px: List[int]) -> List[dict]:
+    """A列から順に widths_px の幅を設定する updateDimensionProperties 群"""
     reqs = []
     for idx, px in enumerate(widths_px):
         reqs.append({
@@ -225,23 +334,33 @@ def sheets_set_column_widths(auth: GoogleAuth, spreadsheet_id: str,
                 "fields": "pixelSize"
             }
         })
+    return reqs
+
+def sheets_set_column_widths(auth: GoogleAuth, spreadsheet_id: str,
+                            sheet_id: int, widths_px: List[int]):
+    """列幅設定"""
     sheets = auth.build_service("sheets", "v4")
     sheets.spreadsheets().batchUpdate(
         spreadsheetId=spreadsheet_id,
-        body={"requests": reqs}
-    ).execute()
+        body={"requests": _column_width_requests(sheet_id, widths_px)}
+    ).execute(num_retries=API_RETRIES)
 
 def sheets_append_title_url(auth: GoogleAuth, spreadsheet_id: str,
                            sheet_name: str, title: str, url: str):
     """タイトルとURLを追記"""
+    sheets_append_rows(auth, spreadsheet_id, sheet_name, [[title, url]])
+
+def sheets_append_rows(auth: GoogleAuth, spreadsheet_id: str,
+                       sheet_name: str, rows: List[List[str]]):
+    """複数行をまとめて追記（values().append 1回）"""
     sheets = auth.build_service("sheets", "v4")
     sheets.spreadsheets().values().append(
         spreadsheetId=spreadsheet_id,
         range=f"{sheet_name}!A1",
         valueInputOption="USER_ENTERED",
         insertDataOption="INSERT_ROWS",
-        body={"values": [[title, url]]}
-    ).execute()
+        body={"values": rows}
+    ).execute(num_retries=API_RETRIES)
 
 # ─────────────── Docs編集ユーティリティ ───────────────
 def _normalize_url(url: str) -> str:
@@ -250,9 +369,28 @@ def _normalize_url(url: str) -> str:
         u = "https:" + u
     return u
 
+# documents().get で受け取る項目（各処理が読む部分だけに絞り、本文全体の JSON を毎回受け取らない）
+DOC_FIELDS_HEADINGS = "body.content(startIndex,endIndex,paragraph.paragraphStyle.namedStyleType)"
+DOC_FIELDS_TEXT = "body.content.paragraph.elements(startIndex,textRun.content)"
+
+# batchUpdate 1回あたりのリクエスト数（途中で失敗しても、それまでのチャンクは反映済みになる）
+DOCS_BATCH_CHUNK = 200
+
+def docs_batch_update_chunked(docs_svc, document_id: str, requests: List[dict]):
+    """
+    requests を DOCS_BATCH_CHUNK 件ずつ先頭から順に batchUpdate する
+    削除を含む場合は、前のチャンクが後のチャンクの位置をずらさないよう末尾側から並べて渡す
+    """
+    for i in range(0, len(requests), DOCS_BATCH_CHUNK):
+        docs_svc.documents().batchUpdate(
+            documentId=document_id,
+            body={"requests": requests[i:i + DOCS_BATCH_CHUNK]}
+        ).execute(num_retries=API_RETRIES)
+
 def _find_heading1_insert_index(docs_svc, document_id: str) -> int:
     """H1の直後位置を取得"""
-    doc = docs_svc.documents().get(documentId=document_id).execute()
+    doc = docs_svc.documents().get(documentId=document_id,
+                                   fields=DOC_FIELDS_HEADINGS).execute(num_retries=API_RETRIES)
     for c in doc.get("body", {}).get("content", []):
         para = c.get("paragraph")
         if not para:
@@ -264,71 +402,123 @@ def _find_heading1_insert_index(docs_svc, document_id: str) -> int:
                 return end_index
     return 1
 
-def _find_range_for_text(doc: dict, needle: str, prefer: str = "last",
-                        near_index: Optional[int] = None) -> Tuple[Optional[int], Optional[int]]:
-    """テキストの範囲を検索"""
-    best_start = best_end = None
-    best_metric = -1 if prefer == "last" else 10**12
+def _utf16_len(text: str) -> int:
+    """Docs API のインデックスは UTF-16 単位（絵文字などは2つ分）"""
+    return len(text.encode("utf-16-le")) // 2
 
-    for c in doc.get("body", {}).get("content", []):
-        para = c.get("paragraph")
-        if not para:
-            continue
-        for el in para.get("elements", []):
-            tr = el.get("textRun")
-            if not tr:
-                continue
-            text = tr.get("content", "")
-            idx = text.find(needle)
-            if idx < 0:
+_DOCS_NAMED_STYLE = {"h1": "HEADING_1", "h2": "HEADING_2", "h3": "HEADING_3"}
+_DOCS_BULLET_PRESET = {"ul": "BULLET_DISC_CIRCLE_SQUARE", "ol": "NUMBERED_DECIMAL_ALPHA_ROMAN"}
+
+def md_to_docs_requests(md: str) -> List[dict]:
+    """
+    Markdown から Docs API の batchUpdate リクエストを直接組み立てる（HTML の生成・取り込みを経由しない）
+    - 本文は insertText 1回で先頭に入れ、見出し・箇条書き・太字はその後の書式指定で付ける
+    - 書式指定は位置をずらさないので、チャンク分割して送ってもよい
+    - 水平線（---）は API で挿入できないため省く
+    """
+    texts: List[str] = []
+    styles: List[dict] = []
+    bullets: List[dict] = []
+    bolds: List[dict] = []
+    index = 1
+    list_tag: Optional[str] = None
+    list_start = 0
+
+    def close_list():
+        nonlocal list_tag
+        if list_tag:
+            bullets.append({"createParagraphBullets": {
+                "range": {"startIndex": list_start, "endIndex": index},
+                "bulletPreset": _DOCS_BULLET_PRESET[list_tag]
+            }})
+            list_tag = None
+
+    for kind, text in _md_blocks(md):
+        if kind in ("ul", "ol"):
+            if list_tag != kind:
+                close_list()
+                list_tag, list_start = kind, index
+        else:
+            close_list()
+            if kind in ("blank", "hr", "end"):
                 continue
-            start = (el.get("startIndex") or 0) + idx
-            end = start + len(needle)
 
-            if prefer == "last":
-                metric = start
-                if best_start is None or metric >= best_metric:
-                    best_start, best_end, best_metric = start, end, metric
-            elif prefer == "near" and near_index is not None:
-                dist = max(0, start - near_index)
-                if best_start is None or dist < best_metric:
-                    best_start, best_end, best_metric = start, end, dist
+        # **..** は記号を外して入れ、太字にする範囲だけ覚えておく
+        start = index
+        pos = 0
+        for m in BOLD_RX.finditer(text):
+            before, inner = text[pos:m.start()], m.group(1)
+            texts.append(before)
+            index += _utf16_len(before)
+            bolds.append({"updateTextStyle": {
+                "range": {"startIndex": index, "endIndex": index + _utf16_len(inner)},
+                "textStyle": {"bold": True},
+                "fields": "bold"
+            }})
+            texts.append(inner)
+            index += _utf16_len(inner)
+            pos = m.end()
+        rest = text[pos:] + "\n"
+        texts.append(rest)
+        index += _utf16_len(rest)
+
+        if kind in _DOCS_NAMED_STYLE:
+            styles.append({"updateParagraphStyle": {
+                "range": {"startIndex": start, "endIndex": index},
+                "paragraphStyle": {"namedStyleType": _DOCS_NAMED_STYLE[kind]},
+                "fields": "namedStyleType"
+            }})
+
+    close_list()
+
+    if not texts:
+        return []
+    insert = {"insertText": {"location": {"index": 1}, "text": "".join(texts)}}
+    return [insert] + styles + bullets + bolds
+
+def docs_create_from_markdown(auth: GoogleAuth, md_text: str, name: str,
+                              folder_id: Optional[str] = None) -> Tuple[str, str]:
+    """
+    空の Google ドキュメントを作り、md_to_docs_requests の内容を書き込む
+    HTML のアップロードと Drive 側の HTML 変換を省ける
+    """
+    drive = auth.build_service("drive", "v3")
+    metadata = {"name": name, "mimeType": "application/vnd.google-apps.document"}
+    if folder_id:
+        metadata["parents"] = [folder_id]
+    file = drive.files().create(body=metadata, fields="id, webViewLink").execute(num_retries=API_RETRIES)
 
-    return best_start, best_end
+    docs = auth.build_service("docs", "v1")
+    docs_batch_update_chunked(docs, file["id"], md_to_docs_requests(md_text))
+    return file["id"], file.get("webViewLink", "")
 
 def docs_insert_disclosure_below_title(auth: GoogleAuth, document_id: str, text: str):
     """タイトル直下に注意書き挿入"""
     docs = auth.build_service("docs", "v1")
 
     insert_at = _find_heading1_insert_index(docs, document_id)
-    to_insert = text.strip() + "\n\n"
-    docs.documents().batchUpdate(
-        documentId=document_id,
-        body={"requests": [{"insertText": {"location": {"index": insert_at}, "text": to_insert}}]}
-    ).execute()
-
-    doc = docs.documents().get(documentId=document_id).execute()
-    start_idx, end_idx = _find_range_for_text(doc, text.strip(), prefer="near", near_index=insert_at)
-    if start_idx is None:
-        print("[warn] disclosure text not found", file=sys.stderr)
-        return
-
+    text = text.strip()
+    # 挿入した文字列は insert_at から並ぶので、書式を付ける範囲は再取得せずに決まる
+    end_idx = insert_at + _utf16_len(text)
     docs.documents().batchUpdate(
         documentId=document_id,
         body={
-            "requests": [{
-                "updateTextStyle": {
-                    "range": {"startIndex": start_idx, "endIndex": end_idx},
-                    "textStyle": {
-                        "bold": True,
-                        "link": None,
-                        "fontSize": {"magnitude": 11, "unit": "PT"}
-                    },
-                    "fields": "bold,link,fontSize"
+            "requests": [
+                {"insertText": {"location": {"index": insert_at}, "text": text + "\n\n"}},
+                {
+                    "updateTextStyle": {
+                        "range": {"startIndex": insert_at, "endIndex": end_idx},
+                        "textStyle": {
+                            "bold": True,
+                            "link": None,
+                            "fontSize": {"magnitude": 11, "unit": "PT"}
+                        },
+                        "fields": "bold,link,fontSize"
+                    }
                 }
-            }]
+            ]
         }
-    ).execute()
+    ).execute(num_retries=API_RETRIES)
     print("[ok] disclosure inserted")
 
 def docs_insert_midpage_cta(auth: GoogleAuth, document_id: str, anchor_text: str,
@@ -336,7 +526,8 @@ def docs_insert_midpage_cta(auth: GoogleAuth, document_id: str, anchor_text: str
     """中盤にCTA挿入"""
     docs = auth.build_service("docs", "v1")
 
-    doc = docs.documents().get(documentId=document_id).execute()
+    doc = docs.documents().get(documentId=document_id,
+                               fields=DOC_FIELDS_HEADINGS).execute(num_retries=API_RETRIES)
     h2_positions: List[int] = []
     for c in doc.get("body", {}).get("content", []):
         para = c.get("paragraph")
@@ -355,18 +546,6 @@ def docs_insert_midpage_cta(auth: GoogleAuth, document_id: str, anchor_text: str
     h2_positions.sort()
     insert_at = h2_positions[len(h2_positions) // 2]
 
-    docs.documents().batchUpdate(
-        documentId=document_id,
-        body={"requests": [{"insertText": {"location": {"index": insert_at},
-                                          "text": "\n" + anchor_text + "\n\n"}}]}
-    ).execute()
-
-    doc = docs.documents().get(documentId=document_id).execute()
-    start_idx, end_idx = _find_range_for_text(doc, anchor_text, prefer="near", near_index=insert_at)
-    if start_idx is None:
-        print("[warn] mid CTA text not found", file=sys.stderr)
-        return
-
     url = _normalize_url(url)
     style = {"link": {"url": url}, "bold": bool(bold)}
     fields = "link,bold"
@@ -374,18 +553,25 @@ def docs_insert_midpage_cta(auth: GoogleAuth, document_id: str, anchor_text: str
         style["fontSize"] = {"magnitude": int(font_size_pt), "unit": "PT"}
         fields += ",fontSize"
 
+    # "\n" + anchor_text + "\n\n" を挿入するので、アンカーは insert_at + 1 から始まる
+    start_idx = insert_at + 1
+    end_idx = start_idx + _utf16_len(anchor_text)
     docs.documents().batchUpdate(
         documentId=document_id,
         body={
-            "requests": [{
-                "updateTextStyle": {
-                    "range": {"startIndex": start_idx, "endIndex": end_idx},
-                    "textStyle": style,
-                    "fields": fields
+            "requests": [
+                {"insertText": {"location": {"index": insert_at},
+                                "text": "\n" + anchor_text + "\n\n"}},
+                {
+                    "updateTextStyle": {
+                        "range": {"startIndex": start_idx, "endIndex": end_idx},
+                        "textStyle": style,
+                        "fields": fields
+                    }
                 }
-            }]
+            ]
         }
-    ).execute()
+    ).execute(num_retries=API_RETRIES)
     print(f"[ok] mid CTA inserted (bold={bold}, font={font_size_pt or 'default'})")
 
 def docs_append_anchor_link(auth: GoogleAuth, document_id: str, anchor_text: str,
@@ -393,38 +579,35 @@ def docs_append_anchor_link(auth: GoogleAuth, document_id: str, anchor_text: str
     """末尾にアンカーリンク追加"""
     docs = auth.build_service("docs", "v1")
 
-    insert_text = f"\n\n{anchor_text}\n"
-    docs.documents().batchUpdate(
-        documentId=document_id,
-        body={"requests": [{"insertText": {"endOfSegmentLocation": {}, "text": insert_text}}]}
-    ).execute()
+    # 末尾への挿入位置は本文最後の改行の直前（endOfSegmentLocation と同じ位置）
+    doc = docs.documents().get(documentId=document_id,
+                               fields="body.content.endIndex").execute(num_retries=API_RETRIES)
+    content = doc.get("body", {}).get("content", [])
+    end_of_body = (content[-1].get("endIndex") or 1) - 1 if content else 1
 
-    doc = docs.documents().get(documentId=document_id).execute()
-    start_idx, end_idx = _find_range_for_text(doc, anchor_text, prefer="last")
-    if start_idx is None:
-        print("[warn] anchor text not found", file=sys.stderr)
-        return
-
-    url = _normalize_url(url)
+    requests = [{"insertText": {"endOfSegmentLocation": {}, "text": f"\n\n{anchor_text}\n"}}]
+    if anchor_text:
+        # "\n\n" の後ろにアンカーが並ぶ
+        start_idx = end_of_body + 2
+        requests.append({
+            "updateTextStyle": {
+                "range": {"startIndex": start_idx, "endIndex": start_idx + _utf16_len(anchor_text)},
+                "textStyle": {"link": {"url": _normalize_url(url)}, "bold": bool(bold)},
+                "fields": "link,bold"
+            }
+        })
     docs.documents().batchUpdate(
         documentId=document_id,
-        body={
-            "requests": [{
-                "updateTextStyle": {
-                    "range": {"startIndex": start_idx, "endIndex": end_idx},
-                    "textStyle": {"link": {"url": url}, "bold": bool(bold)},
-                    "fields": "link,bold"
-                }
-            }]
-        }
-    ).execute()
+        body={"requests": requests}
+    ).execute(num_retries=API_RETRIES)
     print(f"[ok] anchor link appended")
 
 def docs_add_links_to_all_keywords(auth: GoogleAuth, document_id: str,
                                   keyword: str, url: str):
     """全キーワードにリンク付与"""
     docs = auth.build_service("docs", "v1")
-    doc = docs.documents().get(documentId=document_id).execute()
+    doc = docs.documents().get(documentId=document_id,
+                               fields=DOC_FIELDS_TEXT).execute(num_retries=API_RETRIES)
 
     ranges_to_update: List[Tuple[int, int]] = []
 
@@ -463,21 +646,18 @@ def docs_add_links_to_all_keywords(auth: GoogleAuth, document_id: str,
             }
         })
 
-    docs.documents().batchUpdate(
-        documentId=document_id,
-        body={"requests": requests}
-    ).execute()
+    docs_batch_update_chunked(docs, document_id, requests)
 
     print(f"[ok] {len(ranges_to_update)} keyword links added")
 
 def docs_bold_markdown_asterisks(auth: GoogleAuth, document_id: str):
     """残った**記法を太字化"""
     docs = auth.build_service("docs", "v1")
-    doc = docs.documents().get(documentId=document_id).execute()
+    doc = docs.documents().get(documentId=document_id,
+                               fields=DOC_FIELDS_TEXT).execute(num_retries=API_RETRIES)
 
     bold_requests = []
     delete_ranges = []
-    pat = re.compile(r"\*\*(.+?)\*\*")
 
     for c in doc.get("body", {}).get("content", []):
         para = c.get("paragraph")
@@ -489,7 +669,7 @@ def docs_bold_markdown_asterisks(auth: GoogleAuth, document_id: str):
                 continue
             txt = tr.get("content", "")
             base = (el.get("startIndex") or 0)
-            for m in pat.finditer(txt):
+            for m in BOLD_RX.finditer(txt):
                 inner_start = base + m.start() + 2
                 inner_end = base + m.end() - 2
                 bold_requests.append({
@@ -506,16 +686,15 @@ def docs_bold_markdown_asterisks(auth: GoogleAuth, document_id: str):
         print("[info] no '**..**' found")
         return
 
+    # 書式変更は位置をずらさないので、そのままチャンク分割して送る
     if bold_requests:
-        docs.documents().batchUpdate(documentId=document_id,
-                                    body={"requests": bold_requests}).execute()
+        docs_batch_update_chunked(docs, document_id, bold_requests)
 
     if delete_ranges:
-        delete_ranges.sort(key=lambda x: x[0], reverse=True)
+        # 本文を先頭から走査して集めたので昇順。逆順にすれば末尾側から削除できる
         del_reqs = [{"deleteContentRange": {"range": {"startIndex": s, "endIndex": e}}}
-                   for s, e in delete_ranges]
-        docs.documents().batchUpdate(documentId=document_id,
-                                    body={"requests": del_reqs}).execute()
+                    for s, e in reversed(delete_ranges)]
+        docs_batch_update_chunked(docs, document_id, del_reqs)
 
     print(f"[ok] {len(delete_ranges)//2} bold regions fixed")
 
@@ -526,7 +705,8 @@ def docs_strip_remaining_asterisks(auth: GoogleAuth, document_id: str):
     ※ 箇条書きの黒点(•)等は段落のリスト装飾で管理されるため、ここでは削除対象にならない。
     """
     docs = auth.build_service("docs", "v1")
-    doc = docs.documents().get(documentId=document_id).execute()
+    doc = docs.documents().get(documentId=document_id,
+                               fields=DOC_FIELDS_TEXT).execute(num_retries=API_RETRIES)
 
     delete_reqs = []
     for c in doc.get("body", {}).get("content", []):
@@ -553,14 +733,9 @@ def docs_strip_remaining_asterisks(auth: GoogleAuth, document_id: str):
         print("[info] no remaining '*' to strip")
         return
 
-    # インデックスずれ防止のため降順、さらに分割して送信
-    delete_reqs.sort(key=lambda r: r["deleteContentRange"]["range"]["startIndex"], reverse=True)
-    CHUNK = 200
-    for i in range(0, len(delete_reqs), CHUNK):
-        docs.documents().batchUpdate(
-            documentId=document_id,
-            body={"requests": delete_reqs[i:i+CHUNK]}
-        ).execute()
+    # インデックスずれ防止のため降順（先頭から集めたので逆順にするだけ）、さらに分割して送信
+    delete_reqs.reverse()
+    docs_batch_update_chunked(docs, document_id, delete_reqs)
 
     print(f"[ok] stripped {len(delete_reqs)} remaining '*'")
 
@@ -572,13 +747,7 @@ def load_and_clean_md(md_path: pathlib.Path) -> Tuple[str, str]:
     md_text = RX_GDOC_URL_COMMENT.sub("", md_text)
 
     # タイトル抽出 (# の最初の行)
-    doc_title = None
-    for line in md_text.splitlines():
-        if line.startswith("# "):
-            doc_title = line[2:].strip()
-            break
-    if not doc_title:
-        doc_title = md_path.stem
+    doc_title = md_title(md_text) or md_path.stem
 
     return md_text, doc_title
 
@@ -586,37 +755,84 @@ def load_and_clean_md(md_path: pathlib.Path) -> Tuple[str, str]:
 def process_single_md(md_path: pathlib.Path,
                       args: argparse.Namespace,
                       auth: GoogleAuth,
-                      config: Config):
+                      config: Config,
+                      share_queue: Optional[List[str]] = None,
+                      manifest: Optional[DocManifest] = None,
+                      defer_sheet: bool = False) -> Dict[str, Any]:
+    """
+    MD 1件を Google Doc 化して各種編集を行う
+    share_queue を渡すと共有設定はその場で行わず、ファイルIDを積むだけ（呼び出し側でまとめて設定）
+    defer_sheet=True ならスプレッドシートに追記せず、行 [タイトル, URL] を戻り値の "sheet_row" で返す
+    manifest を渡すと、同じ内容・同じ設定で作成済みの Doc が残っている場合は何もしない
+    共有・シート追記を呼び出し側に任せた場合は対応表に登録せず、登録内容 (key, file_id, link, source) を
+    戻り値の "manifest_entry" で返す（呼び出し側で共有・追記が済んだ分だけ manifest.put する）
+    """
+    result: Dict[str, Any] = {"sheet_row": None, "manifest_entry": None}
     if not md_path.is_file():
         raise FileNotFoundError(f"md not found: {md_path}")
 
     md_text, doc_title = load_and_clean_md(md_path)
     name = (args.title_prefix + " " + doc_title).strip() if args.title_prefix else doc_title
-    html_text = md_to_html(md_text)
+    direct = int(args.direct_docs) == 1
+    if direct:
+        html_text = None
+    else:
+        # 同じMDなら前回の変換結果（HTML）を使い回す
+        html_text = get_or_render(
+            md_text, lambda: md_to_html(md_text), pathlib.Path(__file__),
+            pathlib.Path(args.cache_dir) if args.cache_dir else None
+        )
+
+    # タブ名の決定: CLI引数 > Config/.env > デフォルト"Articles"
+    sheet_tab = args.tab.strip() if args.tab.strip() else config.sheet_name
+
+    # 直接書き込みのときは MD 本文をキーにする（HTML とは別エントリになる）
+    doc_key = doc_manifest_key(md_text if direct else html_text, {
+        "name": name, "folder_id": args.folder_id, "share": int(args.share_anyone_writer),
+        "sheet": args.sheet, "tab": sheet_tab, "ad_disclosure": args.ad_disclosure,
+        "mid_cta_text": args.mid_cta_text, "last_cta_text": args.last_cta_text,
+        "official_url": config.official_url or "", "fix_bold": int(args.fix_bold),
+    })
+    if manifest is not None:
+        hit = manifest.get(doc_key)
+        if hit and drive_file_alive(auth, hit["file_id"]):
+            print(f"[skip] unchanged, reusing Google Doc: {hit['file_id']}")
+            print(f"[link] {hit['link']}")
+            return result
+        if hit:
+            manifest.drop(doc_key)
 
     # Google Doc 作成
-    file_id, link = drive_create_gdoc_from_html(
-        auth, html_text, name, args.folder_id or None
-    )
+    if direct:
+        file_id, link = docs_create_from_markdown(auth, md_text, name, args.folder_id or None)
+    else:
+        file_id, link = drive_create_gdoc_from_html(
+            auth, html_text, name, args.folder_id or None
+        )
     print(f"[ok] Google Doc created: {file_id}")
     print(f"[link] {link}")
 
     # 共有設定
     if int(args.share_anyone_writer) == 1:
-        drive_share_anyone_writer(auth, file_id)
-        print("[ok] sharing enabled")
+        if share_queue is not None:
+            share_queue.append(file_id)
+        else:
+            drive_share_anyone_writer(auth, file_id)
+            print("[ok] sharing enabled")
 
     # スプレッドシート追記
     if args.sheet:
-        # タブ名の決定: CLI引数 > Config/.env > デフォルト"Articles"
-        sheet_tab = args.tab.strip() if args.tab.strip() else config.sheet_name
-        sheet_id = sheets_get_or_create_sheet_id(auth, args.sheet, sheet_tab)
-        sheets_append_title_url(auth, args.sheet, sheet_tab, doc_title, link)
-        sheets_set_column_widths(auth, args.sheet, sheet_id,
-                                 [args.col_a_width, args.col_b_width])
-        print(f"[ok] sheet updated: tab={sheet_tab}")
+        if defer_sheet:
+            result["sheet_row"] = [doc_title, link]
+        else:
+            sheets_get_or_create_sheet_id(auth, args.sheet, sheet_tab,
+                                           [args.col_a_width, args.col_b_width])
+            sheets_append_title_url(auth, args.sheet, sheet_tab, doc_title, link)
+            print(f"[ok] sheet updated: tab={sheet_tab}")
 
     official_url = config.official_url or None
+    # 以下の編集は失敗しても続行する。1つでも失敗した Doc は対応表に登録しない（再実行で作り直す）
+    edits_ok = True
 
     # 注意書き
     try:
@@ -624,6 +840,7 @@ def process_single_md(md_path: pathlib.Path,
             docs_insert_disclosure_below_title(auth, file_id, args.ad_disclosure.strip())
     except Exception as e:
         print(f"[warn] disclosure failed: {e}", file=sys.stderr)
+        edits_ok = False
 
     # 中盤CTA
     if official_url and args.mid_cta_text:
@@ -632,6 +849,7 @@ def process_single_md(md_path: pathlib.Path,
                                     official_url, bold=True, font_size_pt=11)
         except Exception as e:
             print(f"[warn] mid CTA failed: {e}", file=sys.stderr)
+            edits_ok = False
 
     # 末尾CTA
     if official_url:
@@ -640,6 +858,7 @@ def process_single_md(md_path: pathlib.Path,
                                     official_url, bold=True)
         except Exception as e:
             print(f"[warn] last CTA failed: {e}", file=sys.stderr)
+            edits_ok = False
 
     # キーワードリンク
     if official_url:
@@ -647,6 +866,7 @@ def process_single_md(md_path: pathlib.Path,
             docs_add_links_to_all_keywords(auth, file_id, "公式サイト", official_url)
         except Exception as e:
             print(f"[warn] keyword links failed: {e}", file=sys.stderr)
+            edits_ok = False
 
     # **記法修正
     if int(args.fix_bold) == 1:
@@ -654,19 +874,43 @@ def process_single_md(md_path: pathlib.Path,
             docs_bold_markdown_asterisks(auth, file_id)
         except Exception as e:
             print(f"[warn] bold fix failed: {e}", file=sys.stderr)
+            edits_ok = False
 
     # ← 追加：太字変換の後に残った '*' を全削除（CLI追加なし、常時実行）
     try:
         docs_strip_remaining_asterisks(auth, file_id)
     except Exception as e:
         print(f"[warn] strip remaining asterisks failed: {e}", file=sys.stderr)
+        edits_ok = False
+
+    if manifest is None:
+        return result
+    if not edits_ok:
+        print("[info] some edits failed; not recorded in manifest")
+        return result
+    entry = (doc_key, file_id, link, str(md_path))
+    if (int(args.share_anyone_writer) == 1 and share_queue is not None) or result["sheet_row"]:
+        # 共有・シート追記がまだ済んでいないので、呼び出し側でそれらが成功してから登録する
+        result["manifest_entry"] = entry
+    else:
+        manifest.put(*entry)
+    return result
 
 # ─────────────── ユーティリティ(フォルダ列挙) ───────────────
 def iter_md_files(root: pathlib.Path, recursive: bool) -> Iterable[pathlib.Path]:
-    if recursive:
-        yield from (p for p in root.rglob("*.md") if p.is_file())
-    else:
-        yield from (p for p in root.glob("*.md") if p.is_file())
+    """
+    root 直下（recursive なら配下すべて）の .md を列挙
+    os.scandir のエントリ情報でファイル/フォルダを判定し、1件ずつ stat し直さない
+    拡張子は Windows の glob と同じく大文字小文字を区別しない
+    """
+    dirs = [root]
+    while dirs:
+        with os.scandir(dirs.pop()) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(".md"):
+                    yield pathlib.Path(entry.path)
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
 
 # ─────────────── エントリポイント ───────────────
 def main():
@@ -688,17 +932,24 @@ def main():
     ap.add_argument("--mid-cta-text", default="")
     ap.add_argument("--last-cta-text", default="")
     ap.add_argument("--fix-bold", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=4, help="--md-dir のとき同時に処理するファイル数")
+    ap.add_argument("--direct-docs", type=int, default=0,
+                    help="1=HTMLを経由せずDocs APIで本文を直接書き込む（水平線は入らない）")
+    ap.add_argument("--cache-dir", default=".cache/html", help="生成HTMLのキャッシュ先（空文字でキャッシュしない）")
+    ap.add_argument("--manifest", default=".cache/gdoc_manifest.json",
+                    help="作成済みDocの対応表（同じ内容なら作り直さない。空文字で無効）")
 
     args = ap.parse_args()
 
     # 設定・認証
     config = Config()
     auth = GoogleAuth()
+    manifest = DocManifest(pathlib.Path(args.manifest)) if args.manifest else None
 
     # フォルダ or 単体
     if args.md:
         md_path = pathlib.Path(args.md)
-        process_single_md(md_path, args, auth, config)
+        process_single_md(md_path, args, auth, config, manifest=manifest)
     else:
         root = pathlib.Path(args.md_dir)
         if not root.exists() or not root.is_dir():
@@ -710,14 +961,54 @@ def main():
             return
 
         print(f"[info] {len(files)} file(s) to process")
-        for i, md_path in enumerate(sorted(files), start=1):
-            print("\n" + "="*70)
-            print(f"[{i}/{len(files)}] {md_path}")
-            print("="*70)
-            try:
-                process_single_md(md_path, args, auth, config)
-            except Exception as e:
-                print(f"[ERROR] failed: {md_path} -> {e}", file=sys.stderr)
+        # 共有設定は最後にバッチでまとめて行う（途中で中断しても作成済みの分は設定する）
+        share_queue: List[str] = []
+        # ファイル単位でスレッド並列（Google API はスレッドごとに別のサービス・接続を使う）
+        # 認証（トークン更新・ブラウザ認証）はスレッドを立てる前に1回だけ済ませておく
+        auth.get_credentials()
+
+        # 共有・シート追記待ちの Doc の対応表エントリ（それらが成功してから登録する）
+        pending: List[Tuple[str, str, str, str]] = []
+        # シートの行は完了順ではなくファイル名順に、最後に1回でまとめて追記する
+        sheet_rows: Dict[int, List[str]] = {}
+        sheet_tab = args.tab.strip() if args.tab.strip() else config.sheet_name
+
+        def _one(i: int, md_path: pathlib.Path):
+            print(f"\n[{i}/{len(files)}] start: {md_path}")
+            return process_single_md(md_path, args, auth, config, share_queue, manifest,
+                                     defer_sheet=bool(args.sheet))
+
+        pool = ThreadPoolExecutor(max_workers=max(1, args.workers))
+        try:
+            futures = {pool.submit(_one, i, md_path): (i, md_path)
+                       for i, md_path in enumerate(sorted(files), start=1)}
+            for fut in as_completed(futures):
+                i, md_path = futures[fut]
+                try:
+                    result = fut.result()
+                    if result["sheet_row"]:
+                        sheet_rows[i] = result["sheet_row"]
+                    if result["manifest_entry"]:
+                        pending.append(result["manifest_entry"])
+                    print(f"[done] {md_path}")
+                except Exception as e:
+                    print(f"[ERROR] failed: {md_path} -> {e}", file=sys.stderr)
+        finally:
+            # 中断時は未着手のファイルを取り消し、処理中のものだけ待つ
+            pool.shutdown(wait=True, cancel_futures=True)
+            failed_ids = set()
+            if share_queue:
+                failed = drive_share_anyone_writer_batch(auth, share_queue)
+                print(f"[ok] sharing enabled: {len(share_queue) - len(failed)}/{len(share_queue)}")
+                failed_ids = set(failed)
+            if sheet_rows:
+                sheets_get_or_create_sheet_id(auth, args.sheet, sheet_tab,
+                                               [args.col_a_width, args.col_b_width])
+                sheets_append_rows(auth, args.sheet, sheet_tab, [sheet_rows[i] for i in sorted(sheet_rows)])
+                print(f"[ok] sheet updated: tab={sheet_tab} ({len(sheet_rows)} rows)")
+            for entry in pending:
+                if entry[1] not in failed_ids:
+                    manifest.put(*entry)
 
 if __name__ == "__main__":
     main()
@@ -18,6 +18,7 @@ import os
 import re
 import sys
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Optional, Tuple
 
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -37,6 +38,38 @@ SCOPES = [
 # =========================
 
 DOC_ID_RE = re.compile(r"/document/d/([a-zA-Z0-9_-]+)")
+# 制御文字 → スペース（\r は削除して \r\n を1つのスペースにする）。正規表現を通さず str.translate で置換
+CONTROL_CHARS_TABLE = {i: " " for i in range(0x20)}
+CONTROL_CHARS_TABLE[0x0D] = None
+MULTI_NEWLINE_RE = re.compile(r"\n{3,}")
+# シート名付きの A1 形式の範囲（例: 'Articles!A2:E'）
+# シート名だけ・名前付き範囲（'Articles' / 'Sheet1'）を列参照と取り違えないよう、'!' と3文字以内の列名を必須にする
+A1_RANGE_RE = re.compile(r"^(?P<sheet>.+)!(?P<c1>[A-Za-z]{1,3})(?P<r1>\d*)(?::(?P<c2>[A-Za-z]{1,3})(?P<r2>\d*))?$")
+
+class _SlugTable(dict):
+    """
+    slugify 用の str.translate テーブル（単語文字と '-' 以外を '-' に）
+    コードポイントごとに初回だけ判定し、結果を覚えておく
+    """
+    def __missing__(self, cp: int):
+        ch = chr(cp)
+        # re の \w は「isalnum() または '_'」と同じ
+        value = cp if (ch.isalnum() or ch in "_-") else "-"
+        self[cp] = value
+        return value
+
+_SLUG_TABLE = _SlugTable()
+
+# 末尾の LINE/メルマガ告知ブロック（この文から最後まで）
+TAIL_CTA_RE = re.compile(r"\n?[ \t]*僕はLINEとメルマガをやっていて.*\Z", re.S | re.M)
+# 告知の残り行
+CTA_LINE_RES = [
+    re.compile(r"^[ \t]*👉.*\n?", re.M),                             # 👉で始まる行
+    re.compile(r"^.*公式LINE.*\n?", re.M),                          # 公式LINE の行
+    re.compile(r"^.*メルマガ.*\n?", re.M),                          # メルマガ の行
+    re.compile(r"^.*line\.me/R/ti/p/%40dxw9105c.*\n?", re.M),        # LINE URL
+    re.compile(r"^.*バックパッカー\.jp/manga/?\S*.*\n?", re.M),      # メルマガURL
+]
 
 def extract_doc_id(doc_url: str) -> Optional[str]:
     if not doc_url:
@@ -47,9 +80,8 @@ def extract_doc_id(doc_url: str) -> Optional[str]:
 def slugify(text: str) -> str:
     text = unicodedata.normalize("NFKC", text)
     text = text.strip().lower()
-    # 括弧や記号をダッシュへ
-    text = re.sub(r"[^\w\-]+", "-", text)
-    text = re.sub(r"-{2,}", "-", text)
+    # 括弧や記号をダッシュへ（連続するダッシュは1つにまとめる）
+    text = "-".join(part for part in text.translate(_SLUG_TABLE).split("-") if part)
     text = text.strip("-_")
     return text or "untitled"
 
@@ -101,54 +133,53 @@ def get_clients():
         with open(token_path, "wb") as f:
             pickle.dump(creds, f)
 
-    sheets = build("sheets", "v4", credentials=creds)
-    docs   = build("docs",   "v1", credentials=creds)
-    drive  = build("drive",  "v3", credentials=creds)
+    # 同梱のディスカバリ文書を使い、起動時の取得とファイルキャッシュの試行を省く
+    opts = {"credentials": creds, "static_discovery": True, "cache_discovery": False}
+    sheets = build("sheets", "v4", **opts)
+    docs   = build("docs",   "v1", **opts)
+    drive  = build("drive",  "v3", **opts)
     return sheets, docs, drive
 
 # =========================
 # Docs → Markdown 変換
 # =========================
 
-def text_run_to_md(tr: Dict) -> str:
+def text_run_to_md(tr: Dict, out: List[str]) -> None:
     """
-    Docs API: ParagraphElement.textRun を Markdown に変換
-    - 制御文字 (VTなど [\x00-\x1F]) はスペースに置換してゴミ混入を防止
+    Docs API: ParagraphElement.textRun を Markdown に変換して out に追加
+    - 制御文字 (VT・CR・LF など [\x00-\x1F]) はスペースに置換してゴミ混入を防止
     """
     if "content" not in tr:
-        return ""
-    txt = tr["content"]
-    # 制御文字（vt等）を除去
-    txt = re.sub(r"[\x00-\x1F]+", " ", txt)
+        return
+    # 制御文字（vt等）を除去（\r もここで消える）
+    txt = tr["content"].translate(CONTROL_CHARS_TABLE)
     style = (tr.get("textStyle") or {})
     link = (style.get("link") or {}).get("url")
     bold = style.get("bold", False)
     italic = style.get("italic", False)
     code = style.get("code", False)
 
-    # 行末の単独改行を維持（Docs は要素単位で改行含むことが多い）
-    txt = txt.replace("\r", "")
-
     # マークダウン装飾
-    out = txt
     if link:
         # リンク優先（装飾は中に含めない簡易実装）
-        out = f"[{out.strip()}]({link})"
-    else:
-        if code:
-            out = f"`{out.strip()}`"
-        if bold and italic:
-            out = f"***{out.strip()}***"
-        elif bold:
-            out = f"**{out.strip()}**"
-        elif italic:
-            out = f"*{out.strip()}*"
-
-    return out
-
-def paragraph_to_md(p: Dict, lists_meta: Dict) -> str:
+        out.append(f"[{txt.strip()}]({link})")
+        return
+    if not (code or bold or italic):
+        out.append(txt)
+        return
+    if code:
+        txt = f"`{txt.strip()}`"
+    if bold and italic:
+        txt = f"***{txt.strip()}***"
+    elif bold:
+        txt = f"**{txt.strip()}**"
+    elif italic:
+        txt = f"*{txt.strip()}*"
+    out.append(txt)
+
+def paragraph_to_md(p: Dict, lists_meta: Dict, out: List[str]) -> None:
     """
-    Docs API: Paragraph を Markdown に変換
+    Docs API: Paragraph を Markdown に変換して out に追加
     - 見出し: HEADING_1..6
     - 箇条書き: bullet があれば「・」に統一（ordered/unordered 問わず）
     - 通常段落
@@ -156,12 +187,12 @@ def paragraph_to_md(p: Dict, lists_meta: Dict) -> str:
     pstyle = (p.get("paragraphStyle") or {})
     named = pstyle.get("namedStyleType", "NORMAL_TEXT")
 
-    # テキスト要素の連結
+    # テキスト要素の連結（見出し/箇条書きの判定に段落全体が要るので段落単位で1回だけ結合）
     texts: List[str] = []
     for el in p.get("elements", []):
         tr = el.get("textRun")
         if tr:
-            texts.append(text_run_to_md(tr))
+            text_run_to_md(tr, texts)
     content = "".join(texts).rstrip("\n")
 
     # 見出し
@@ -171,7 +202,8 @@ def paragraph_to_md(p: Dict, lists_meta: Dict) -> str:
         except:
             level = 2
         level = min(max(level, 1), 6)
-        return f"{'#' * level} {content}\n"
+        out.extend(("#" * level, " ", content, "\n"))
+        return
 
     # 箇条書き（ordered/unordered に関わらず「・」を使用）
     bullet = p.get("bullet")
@@ -181,13 +213,14 @@ def paragraph_to_md(p: Dict, lists_meta: Dict) -> str:
             nesting = bullet["nestingLevel"]
         indent = "  " * nesting
         prefix = "・"  # ←ご要望に合わせて固定
-        line = f"{indent}{prefix} {content}".rstrip()
-        return f"{line}\n"
+        out.extend((f"{indent}{prefix} {content}".rstrip(), "\n"))
+        return
 
     # 通常段落
     if content.strip() == "":
-        return "\n"
-    return f"{content}\n"
+        out.append("\n")
+        return
+    out.extend((content, "\n"))
 
 def analyze_lists(document: Dict) -> Dict[str, Dict]:
     """
@@ -211,20 +244,40 @@ def document_to_markdown(document: Dict) -> str:
     body = (document.get("body") or {}).get("content", [])
     lists_meta = analyze_lists(document)
 
-    lines: List[str] = []
+    # 全段落を1つのバッファに追記し、最後に1回だけ結合する
+    out: List[str] = []
     for el in body:
         if "horizontalRule" in el:
             continue
         p = el.get("paragraph")
         if p:
-            lines.append(paragraph_to_md(p, lists_meta))
+            paragraph_to_md(p, lists_meta, out)
         # 表・画像・図形などは今回はスキップ（必要に応じて拡張）
 
     # 末尾の余計な空行を整理
-    md = "".join(lines)
-    md = re.sub(r"\n{3,}", "\n\n", md).strip() + "\n"
+    md = "".join(out)
+    md = MULTI_NEWLINE_RE.sub("\n\n", md).strip() + "\n"
     return md
 
+def convert_document(document: Dict) -> str:
+    """Document → 本文 Markdown（告知ブロック除去済み）。プロセスプールから呼べるようモジュール直下に置く"""
+    return remove_tail_cta(document_to_markdown(document))
+
+# この件数以上のときだけプロセスプールで変換する（少ないと起動コストの方が大きい）
+PROCESS_POOL_MIN_DOCS = 8
+
+def convert_documents(documents: Dict[str, object], workers: int) -> Dict[str, str]:
+    """
+    取得済みドキュメントをまとめて Markdown 化（docId -> Markdown）
+    変換は純 Python の文字列処理で GIL に縛られるため、件数が多ければ複数プロセスに分ける
+    """
+    items = [(doc_id, doc) for doc_id, doc in documents.items() if not isinstance(doc, Exception)]
+    if workers <= 1 or len(items) < PROCESS_POOL_MIN_DOCS:
+        return {doc_id: convert_document(doc) for doc_id, doc in items}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        mds = pool.map(convert_document, [doc for _, doc in items], chunksize=4)
+        return {doc_id: md for (doc_id, _), md in zip(items, mds)}
+
 # =========================
 # シート読み取り & 書き出し
 # =========================
@@ -233,9 +286,96 @@ def read_sheet_rows(sheets, sheet_id: str, range_a1: str) -> List[List[str]]:
     res = sheets.spreadsheets().values().get(spreadsheetId=sheet_id, range=range_a1).execute()
     return res.get("values", [])
 
+def col_to_num(col: str) -> int:
+    n = 0
+    for ch in col.upper():
+        n = n * 26 + (ord(ch) - ord("A") + 1)
+    return n
+
+def num_to_col(n: int) -> str:
+    col = ""
+    while n > 0:
+        n, r = divmod(n - 1, 26)
+        col = chr(ord("A") + r) + col
+    return col
+
+# 1回の batchGet に載せる範囲数（GET のクエリ文字列が長くなりすぎないように）
+SHEET_BATCH_RANGES = 100
+
+def read_ok_rows(sheets, sheet_id: str, range_a1: str,
+                 col_flag: int, ok_token: str) -> Tuple[List[Tuple[int, List[str]]], int]:
+    """
+    フラグ列だけを先に読み、OK の行だけを batchGet で取得する
+    - 戻り値: ([(範囲内の行番号(1始まり), 行データ), ...], 範囲内の全行数)
+    - 'シート名!A1範囲' の形で解釈できなければ（シート名だけ・名前付き範囲など）従来どおり全体を読んで手元で絞り込む
+    """
+    m = A1_RANGE_RE.match(range_a1.strip())
+    if not m:
+        rows = read_sheet_rows(sheets, sheet_id, range_a1)
+        return [(i, row) for i, row in enumerate(rows, start=1) if is_ok_row(row, col_flag, ok_token)], len(rows)
+
+    prefix = f"{m.group('sheet')}!" if m.group("sheet") else ""
+    first_col = m.group("c1").upper()
+    last_col = (m.group("c2") or m.group("c1")).upper()
+    start_row = int(m.group("r1") or 1)
+    end_row = m.group("r2") or ""
+    flag_col = num_to_col(col_to_num(first_col) + col_flag - 1)
+
+    # 1) フラグ列だけ読む（1列分なので全列読むより軽い）
+    res = sheets.spreadsheets().values().get(
+        spreadsheetId=sheet_id, range=f"{prefix}{flag_col}{start_row}:{flag_col}{end_row}"
+    ).execute()
+    flags = res.get("values", [])
+    ok_idx = [i for i, cell in enumerate(flags, start=1) if is_ok_row(cell, 1, ok_token)]
+    if not ok_idx:
+        return [], len(flags)
+
+    # 2) OK の行を連続区間にまとめて batchGet（区間ごとに1範囲）
+    blocks: List[Tuple[int, int]] = []
+    for i in ok_idx:
+        if blocks and blocks[-1][1] == i - 1:
+            blocks[-1] = (blocks[-1][0], i)
+        else:
+            blocks.append((i, i))
+
+    out: List[Tuple[int, List[str]]] = []
+    for start in range(0, len(blocks), SHEET_BATCH_RANGES):
+        chunk = blocks[start:start + SHEET_BATCH_RANGES]
+        ranges = [
+            f"{prefix}{first_col}{start_row + a - 1}:{last_col}{start_row + b - 1}"
+            for a, b in chunk
+        ]
+        res = sheets.spreadsheets().values().batchGet(spreadsheetId=sheet_id, ranges=ranges).execute()
+        for (a, b), vr in zip(chunk, res.get("valueRanges", [])):
+            values = vr.get("values", [])
+            for offset in range(b - a + 1):
+                out.append((a + offset, values[offset] if offset < len(values) else []))
+    return out, len(flags)
+
 def fetch_document(docs, doc_id: str) -> Dict:
     return docs.documents().get(documentId=doc_id).execute()
 
+# 1回のバッチリクエストにまとめる件数（Google API のバッチ上限は 100）
+DOCS_BATCH_SIZE = 50
+
+def fetch_documents_batch(docs, doc_ids: List[str]) -> Dict[str, object]:
+    """
+    複数ドキュメントをバッチリクエストでまとめて取得
+    戻り値: docId -> Document（dict）または HttpError
+    """
+    results: Dict[str, object] = {}
+
+    def _callback(request_id, response, exception):
+        results[request_id] = exception if exception is not None else response
+
+    unique_ids = list(dict.fromkeys(doc_ids))
+    for start in range(0, len(unique_ids), DOCS_BATCH_SIZE):
+        batch = docs.new_batch_http_request(callback=_callback)
+        for doc_id in unique_ids[start:start + DOCS_BATCH_SIZE]:
+            batch.add(docs.documents().get(documentId=doc_id), request_id=doc_id)
+        batch.execute()
+    return results
+
 def build_front_matter(title: str, src_url: str, doc_url: str) -> str:
     """
     先頭に H1 とコメントを付与。
@@ -253,23 +393,11 @@ def remove_tail_cta(md: str) -> str:
     """
     末尾に入っているLINE/メルマガ誘導の告知ブロックを削除する。
     """
-    md = re.sub(
-        r"(?s)\n?[ \t]*僕はLINEとメルマガをやっていて.*\Z",
-        "\n",
-        md,
-        flags=re.MULTILINE,
-    )
-    patterns = [
-        r"(?m)^[ \t]*👉.*\n?",                 # 👉で始まる行
-        r"(?m)^.*公式LINE.*\n?",              # 公式LINE の行
-        r"(?m)^.*メルマガ.*\n?",              # メルマガ の行
-        r"(?m)^.*line\.me/R/ti/p/%40dxw9105c.*\n?",            # LINE URL
-        r"(?m)^.*バックパッカー\.jp/manga/?\S*.*\n?",          # メルマガURL
-    ]
-    for pat in patterns:
-        md = re.sub(pat, "", md)
-
-    md = re.sub(r"\n{3,}", "\n\n", md).strip() + "\n"
+    md = TAIL_CTA_RE.sub("\n", md)
+    for pat in CTA_LINE_RES:
+        md = pat.sub("", md)
+
+    md = MULTI_NEWLINE_RE.sub("\n\n", md).strip() + "\n"
     return md
 
 def process_row(
@@ -281,9 +409,13 @@ def process_row(
     col_url: int,
     col_docurl: int,
     outdir: str,
+    prefetched: Optional[Dict[str, object]] = None,
+    converted: Optional[Dict[str, str]] = None,
 ) -> Optional[str]:
     """
     1 行処理して MD をファイルに保存。成功したらパスを返す
+    prefetched: fetch_documents_batch() の結果（あればそこから取り出し、無ければ個別取得）
+    converted: convert_documents() の結果（あれば変換済みの本文を使う）
     """
     def safe_get(col: int) -> str:
         # 1始まり → 0-based
@@ -299,14 +431,20 @@ def process_row(
         print(f"[warn] row {idx}: ドキュメントURL不正のためスキップ ({doc_url})", file=sys.stderr)
         return None
 
-    try:
-        document = fetch_document(docs, doc_id)
-    except HttpError as e:
-        print(f"[error] row {idx}: Docs取得に失敗 docId={doc_id} {e}", file=sys.stderr)
-        return None
-
-    body_md = document_to_markdown(document)
-    body_md = remove_tail_cta(body_md)
+    if converted is not None and doc_id in converted:
+        body_md = converted[doc_id]
+    else:
+        try:
+            if prefetched is not None and doc_id in prefetched:
+                document = prefetched[doc_id]
+                if isinstance(document, Exception):
+                    raise document
+            else:
+                document = fetch_document(docs, doc_id)
+        except HttpError as e:
+            print(f"[error] row {idx}: Docs取得に失敗 docId={doc_id} {e}", file=sys.stderr)
+            return None
+        body_md = convert_document(document)
     head = build_front_matter(title, url, doc_url)
 
     base_name = slugify(title)
@@ -330,6 +468,8 @@ def main():
     # ★追加: フィルタ列とトークン
     ap.add_argument("--col-flag", type=int, default=5, help="変換フラグ列番号(1始まり) 例: E列=5")
     ap.add_argument("--ok-token", default="OK", help="変換対象とみなすセルの値（大文字小文字無視）")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="Markdown 変換に使うプロセス数（1=メインプロセスのみ）")
     args = ap.parse_args()
 
     try:
@@ -338,18 +478,27 @@ def main():
         print(f"[fatal] Google API 認証/初期化に失敗: {e}", file=sys.stderr)
         sys.exit(1)
 
-    rows = read_sheet_rows(sheets, args.sheet_id, args.range)
-    if not rows:
+    # OK の行だけをシートから取得（フラグ列以外は対象行の分しか転送しない）
+    ok_rows, total = read_ok_rows(sheets, args.sheet_id, args.range, args.col_flag, args.ok_token)
+    if not total:
         print("[info] シートにデータがありません")
         return
+    if total > len(ok_rows):
+        print(f"[skip] {total - len(ok_rows)} 行: フラグ列がOKではないためスキップ")
+
+    # 対象行のドキュメントはバッチリクエストでまとめて取得（行ごとの往復をなくす）
+    ok_doc_ids = []
+    for _, row in ok_rows:
+        i = args.col_docurl - 1
+        doc_id = extract_doc_id(row[i].strip() if 0 <= i < len(row) else "")
+        if doc_id:
+            ok_doc_ids.append(doc_id)
+    prefetched = fetch_documents_batch(docs, ok_doc_ids) if ok_doc_ids else {}
+    # 変換（CPU処理）は先にまとめて済ませ、行ごとの処理はファイル書き込みだけにする
+    converted = convert_documents(prefetched, args.workers)
 
     count = 0
-    for i, row in enumerate(rows, start=1):
-        # ★ E列(既定)が OK の行だけ処理
-        if not is_ok_row(row, args.col_flag, args.ok_token):
-            print(f"[skip] row {i}: フラグ列がOKではないためスキップ")
-            continue
-
+    for i, row in ok_rows:
         p = process_row(
             docs,
             row,
@@ -359,6 +508,8 @@ def main():
             col_url=args.col_url,
             col_docurl=args.col_docurl,
             outdir=args.outdir,
+            prefetched=prefetched,
+            converted=converted,
         )
         if p:
             count += 1
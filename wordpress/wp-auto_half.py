@@ -6,6 +6,7 @@
 # python wordpress/wp-auto_half.py
 import os
 import sys
+import importlib.util
 import pathlib
 
 # プロジェクトルートをパスに追加
@@ -13,16 +14,25 @@ project_root = pathlib.Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 import re
+import html
 import base64
+import functools
+import asyncio
 import argparse
+import threading
+import time
+import random
 from datetime import datetime
 from googleapiclient.discovery import build
-import requests
+import httpx
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from xmlrpc.client import ServerProxy, Fault, ProtocolError
 
+# 任意: h2 が入っていれば WordPress への REST 呼び出しを HTTP/2 で多重化する
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
 
 # ====== 設定 ======
 SHEET_TAB = 'kasegenai'  # ここにタブ名
@@ -34,53 +44,102 @@ SPREADSHEET_ID = '1XEOsAIiKNBe5IwqGmvV87ui8tVrvyA6TF8wVPkW_zNA'
 from lib.auth import GoogleAuth
 
 # テキストランのスタイルを適用してHTMLに変換
+# - 本文は1回だけエスケープし、タグは内側から a → strong → em → u の順で一度に付ける
 def apply_text_style(text, text_style):
     if not text:
         return ''
-    html = text
-    if text_style and 'link' in text_style:
-        url = text_style['link'].get('url', '')
-        html = f'<a href="{url}">{html}</a>'
-    if text_style and text_style.get('bold'):
-        html = f'<strong>{html}</strong>'
-    if text_style and text_style.get('italic'):
-        html = f'<em>{html}</em>'
-    if text_style and text_style.get('underline'):
-        html = f'<u>{html}</u>'
-    return html
+    escaped = html.escape(text, quote=False)
+    if not text_style:
+        return escaped
+    opens, closes = [], []
+    if 'link' in text_style:
+        url = html.escape(text_style['link'].get('url', ''), quote=True)
+        opens.append(f'<a href="{url}">')
+        closes.append('</a>')
+    for key, tag in (('bold', 'strong'), ('italic', 'em'), ('underline', 'u')):
+        if text_style.get(key):
+            opens.append(f'<{tag}>')
+            closes.append(f'</{tag}>')
+    return ''.join(reversed(opens)) + escaped + ''.join(closes)
 
-# Google Docsから記事内容を取得してHTML化
-def get_document_content(docs_service, doc_url):
-    m = re.search(r'/document/d/([a-zA-Z0-9-_]+)', doc_url)
+_DOC_ID_RE = re.compile(r'/document/d/([a-zA-Z0-9\-_]+)')
+
+# Google DocsのURLからドキュメントIDを取り出す
+def extract_doc_id(doc_url):
+    m = _DOC_ID_RE.search(doc_url)
     if not m:
         raise ValueError(f"無効なGoogle Docs URL: {doc_url}")
-    doc_id = m.group(1)
-    document = docs_service.documents().get(documentId=doc_id).execute()
-    content = document.get('body', {}).get('content', [])
-    html_body, title = [], None
+    return m.group(1)
+
+# 段落スタイル → タグ（表にないスタイルは <p>）
+_NAMED_TO_TAG = {'HEADING_1': 'h1', 'HEADING_2': 'h2', 'HEADING_3': 'h3',
+                 'HEADING_4': 'h4', 'HEADING_5': 'h5', 'HEADING_6': 'h6',
+                 'NORMAL_TEXT': 'p', 'TITLE': 'h1', 'SUBTITLE': 'h2'}
+_DEFAULT_TAG = 'p'
+
+# 本文の段落を (段落スタイル, HTML化したテキスト) の順に返す（空の段落は飛ばす）
+def _iter_paragraphs(content):
     for element in content:
-        if 'paragraph' in element:
-            p = element['paragraph']
-            named = p.get('paragraphStyle', {}).get('namedStyleType', 'NORMAL_TEXT')
-            paragraph_text = ''
-            for el in p.get('elements', []):
-                if 'textRun' in el:
-                    run = el['textRun']
-                    paragraph_text += apply_text_style(run.get('content', ''), run.get('textStyle', {}))
-            paragraph_text = paragraph_text.strip()
-            if not paragraph_text:
-                continue
+        p = element.get('paragraph')
+        if p is None:
+            continue
+        paragraph_text = ''.join(
+            apply_text_style(el['textRun'].get('content', ''), el['textRun'].get('textStyle', {}))
+            for el in p.get('elements', []) if 'textRun' in el
+        ).strip()
+        if paragraph_text:
+            yield p.get('paragraphStyle', {}).get('namedStyleType', 'NORMAL_TEXT'), paragraph_text
+
+
+# 取得済みのドキュメント（Docs API のレスポンス）をHTML化
+# - 最初の HEADING_1 はタイトルとして本文から外す
+def document_to_html(document):
+    title = None
+
+    def _body():
+        nonlocal title
+        for named, paragraph_text in _iter_paragraphs(document.get('body', {}).get('content', [])):
             if named == 'HEADING_1' and title is None:
                 title = paragraph_text
                 continue
-            tag = {'HEADING_1':'h1','HEADING_2':'h2','HEADING_3':'h3','HEADING_4':'h4','HEADING_5':'h5','HEADING_6':'h6'}.get(named)
-            if tag:
-                html_body.append(f'<{tag}>{paragraph_text}</{tag}>')
-            else:
-                html_body.append(f'<p>{paragraph_text}</p>')
+            tag = _NAMED_TO_TAG.get(named, _DEFAULT_TAG)
+            yield f'<{tag}>{paragraph_text}</{tag}>'
+
+    body = '\n'.join(_body())
     if title is None:
         title = document.get('title', 'タイトルなし')
-    return title, '\n'.join(html_body)
+    return title, body
+
+# Docs API で取得するフィールド（HTML化に使う見出し種別・テキスト・装飾だけ）
+DOC_FIELDS = ("title,body(content(paragraph(paragraphStyle/namedStyleType,"
+              "elements(textRun(content,textStyle(bold,italic,underline,link/url))))))")
+
+# Google Docsから記事内容を取得してHTML化
+def get_document_content(docs_service, doc_url):
+    document = docs_service.documents().get(
+        documentId=extract_doc_id(doc_url), fields=DOC_FIELDS, includeTabsContent=False
+    ).execute()
+    return document_to_html(document)
+
+# 複数ドキュメントをバッチリクエストでまとめて取得（docId -> Document または HttpError）
+DOCS_BATCH_SIZE = 50
+
+def fetch_documents_batch(docs_service, doc_ids):
+    results = {}
+
+    def _callback(request_id, response, exception):
+        results[request_id] = exception if exception is not None else response
+
+    unique_ids = list(dict.fromkeys(doc_ids))
+    for start in range(0, len(unique_ids), DOCS_BATCH_SIZE):
+        batch = docs_service.new_batch_http_request(callback=_callback)
+        for doc_id in unique_ids[start:start + DOCS_BATCH_SIZE]:
+            batch.add(
+                docs_service.documents().get(documentId=doc_id, fields=DOC_FIELDS, includeTabsContent=False),
+                request_id=doc_id
+            )
+        batch.execute()
+    return results
 
 # URLを正規化（https://を追加）
 def normalize_url(url):
@@ -92,6 +151,9 @@ def normalize_url(url):
         url = 'https://' + url
     return url.rstrip('/')
 
+# 1回の batchGet に載せる範囲数（GET のクエリ文字列が長くなりすぎないように）
+SHEET_BATCH_RANGES = 100
+
 # スプレッドシートから投稿情報を取得（列順 A:J）
 # A: サイトURL
 # B: タイトル
@@ -103,93 +165,199 @@ def normalize_url(url):
 # H: 投稿済み
 # I: 投稿日時
 # J: WordPress記事URL
+# - まず A列（行数の判定用）と H列（投稿済み）だけを読み、未投稿の行を連続区間ごとに batchGet する
+#   （投稿済みの行が大半を占めるシートでも、転送量が未投稿の行数ぶんで済む）
 def get_posts_to_publish(sheets_service):
     sheet = sheets_service.spreadsheets()
-    result = sheet.values().get(
+    result = sheet.values().batchGet(
         spreadsheetId=SPREADSHEET_ID,
-        range=f"{SHEET_TAB}!A2:J"
+        ranges=[f"{SHEET_TAB}!A2:A", f"{SHEET_TAB}!H2:H"],
+        majorDimension='COLUMNS'
     ).execute()
-    values = result.get('values', [])
+    site_col, posted_col = [(vr.get('values') or [[]])[0] for vr in result.get('valueRanges', [])]
+    pending = [i for i in range(len(site_col))
+               if i >= len(posted_col) or (posted_col[i] or '').strip() != '済']
+
+    # 連続する行をまとめて1範囲にする（0始まりの位置 → シートの行番号は +2）
+    blocks = []
+    for i in pending:
+        if blocks and blocks[-1][1] == i - 1:
+            blocks[-1] = (blocks[-1][0], i)
+        else:
+            blocks.append((i, i))
+    rows = []
+    for start in range(0, len(blocks), SHEET_BATCH_RANGES):
+        chunk = blocks[start:start + SHEET_BATCH_RANGES]
+        res = sheet.values().batchGet(
+            spreadsheetId=SPREADSHEET_ID,
+            ranges=[f"{SHEET_TAB}!A{a + 2}:J{b + 2}" for a, b in chunk]
+        ).execute()
+        for (a, b), vr in zip(chunk, res.get('valueRanges', [])):
+            values = vr.get('values', [])
+            for k in range(b - a + 1):
+                rows.append((a + k + 2, values[k] if k < len(values) else []))
+
     posts = []
-    for i, row in enumerate(values, start=2):
-        while len(row) < 10:
-            row.append('')
-        site_url, title, doc_url, username, app_password, slug, categories, posted, post_date, wp_url = row
-        if not posted or posted.lower() != '済':
-            posts.append({
-                'row_number': i,
-                'site_url': normalize_url(site_url),  # ★ ここで正規化
-                'title': (title or '').strip(),
-                'doc_url': (doc_url or '').strip(),
-                'username': (username or '').strip(),
-                'app_password': (app_password or '').strip(),
-                'slug': (slug or '').strip(),
-                'categories': (categories or '').strip(),
-            })
+    for i, row in rows:
+        # 投稿済みなら他の列には触れずに飛ばす（読み込みと書き込みの間に済になった行など）
+        posted = row[7] if len(row) > 7 else ''
+        if posted.strip() == '済':
+            continue
+        site_url, title, doc_url, username, app_password, slug, categories, *_ = row + [''] * (7 - len(row))
+        posts.append({
+            'row_number': i,
+            'site_url': normalize_url(site_url),  # ★ ここで正規化
+            'title': (title or '').strip(),
+            'doc_url': (doc_url or '').strip(),
+            'username': (username or '').strip(),
+            'app_password': (app_password or '').strip(),
+            'slug': (slug or '').strip(),
+            'categories': (categories or '').strip(),
+        })
     return posts
 
+# REST API 用の共有クライアント（接続プールを使い回し、投稿ごとの TCP/TLS ハンドシェイクを省く）
+# - HTTP/2 が使えれば同じサイトへの要求は1本の接続に多重化される。httpx.Client はスレッド間で共有できる
+# - 接続に失敗したときはトランスポートが再試行し、429/5xx の再試行は wp_send で行う
+_HTTP = httpx.Client(
+    transport=httpx.HTTPTransport(
+        http2=_HTTP2, retries=3,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+    ),
+    timeout=30.0,
+)
+
+# 429/5xx のときの再試行（Retry-After があれば従い、なければ指数バックオフ＋ジッター）
+# POST は応答後に再送すると二重投稿になり得るので、処理されていないことが明らかな 429/503 だけ再試行する
+RETRY_STATUS = (429, 500, 502, 503, 504)
+RETRY_STATUS_POST = (429, 503)
+RETRY_MAX = 5
+RETRY_BACKOFF = 0.75
+RETRY_DELAY_MAX = 60.0
+
+def retry_delay(r, attempt):
+    retry_after = r.headers.get('Retry-After', '').strip()
+    if retry_after.isdigit():
+        return min(float(retry_after), RETRY_DELAY_MAX)
+    delay = min(RETRY_BACKOFF * 2 ** attempt, RETRY_DELAY_MAX)
+    return delay + random.uniform(0, 0.25 * delay)
+
+def wp_send(method, url, headers, json=None, stream=False):
+    """WordPress へ要求を送り、再試行対象のステータスなら待って送り直す（最後の応答を返す）"""
+    retry_status = RETRY_STATUS if method == 'GET' else RETRY_STATUS_POST
+    for attempt in range(RETRY_MAX + 1):
+        r = _HTTP.send(_HTTP.build_request(method, url, headers=headers, json=json), stream=stream)
+        if r.status_code not in retry_status or attempt == RETRY_MAX:
+            return r
+        r.close()
+        time.sleep(retry_delay(r, attempt))
+
+# 認証ヘッダ（ユーザー名・アプリパスワードごとに1回だけ作る。呼び出し側で書き換えないこと）
+@functools.lru_cache(maxsize=None)
+def auth_headers(username, app_password):
+    credentials = f"{username}:{app_password}"
+    token = base64.b64encode(credentials.encode()).decode('utf-8')
+    return {'Authorization': f'Basic {token}', 'Content-Type': 'application/json'}
+
+# サイトごとのカテゴリ一覧キャッシュ（site_url -> {名前/スラッグ(小文字): ID}）
+# 投稿はスレッドで並行するので、サイトごとのロックで一覧取得・新規作成を1本にまとめる
+_category_cache = {}
+_category_locks = {}
+
+# サイトの全カテゴリを取得（100件ずつページング）
+def load_site_categories(site_url, headers):
+    cats = {}
+    page = 1
+    while True:
+        api_url = f"{site_url}/wp-json/wp/v2/categories?per_page=100&page={page}&_fields=id,name,slug"
+        r = wp_send('GET', api_url, headers)
+        if r.status_code != 200:
+            print(f"    カテゴリ一覧の取得に失敗: {r.status_code}")
+            break
+        batch = r.json()
+        for cat in batch:
+            cats[cat.get('name', '').lower()] = cat['id']
+            cats[cat.get('slug', '').lower()] = cat['id']
+        total_pages = int(r.headers.get('X-WP-TotalPages', page))
+        if len(batch) < 100 or page >= total_pages:
+            break
+        page += 1
+    return cats
+
 # カテゴリIDを取得または作成（REST API用）
 def get_or_create_category_ids_rest(site_url, username, app_password, category_names):
     """
     カテゴリ名のリストからカテゴリIDのリストを取得
     存在しない場合は新規作成
+    サイトのカテゴリ一覧は初回に1度だけ取得してキャッシュし、以降は名前ごとの検索をしない
     """
     if not category_names:
         return []
     
-    credentials = f"{username}:{app_password}"
-    token = base64.b64encode(credentials.encode()).decode('utf-8')
-    headers = {'Authorization': f'Basic {token}', 'Content-Type': 'application/json'}
+    headers = auth_headers(username, app_password)
     
     category_ids = []
     
-    for cat_name in category_names:
-        cat_name = cat_name.strip()
-        if not cat_name:
-            continue
+    with _category_locks.setdefault(site_url, threading.Lock()):
+        if site_url not in _category_cache:
+            try:
+                _category_cache[site_url] = load_site_categories(site_url, headers)
+            except Exception as e:
+                print(f"    カテゴリ一覧の取得でエラー: {e}")
+                _category_cache[site_url] = {}
+        cache = _category_cache[site_url]
         
-        # 既存カテゴリを検索
-        api_url = f"{site_url}/wp-json/wp/v2/categories?search={cat_name}&per_page=100"
-        try:
-            r = requests.get(api_url, headers=headers, timeout=30)
-            if r.status_code == 200:
-                categories = r.json()
-                # 完全一致を探す
-                found = None
-                for cat in categories:
-                    if cat.get('name', '').lower() == cat_name.lower() or cat.get('slug', '').lower() == cat_name.lower():
-                        found = cat
-                        break
-                
-                if found:
-                    category_ids.append(found['id'])
-                    print(f"    カテゴリ '{cat_name}' 見つかりました (ID: {found['id']})")
-                    continue
+        for cat_name in category_names:
+            cat_name = cat_name.strip()
+            if not cat_name:
+                continue
+            
+            # 既存カテゴリ（キャッシュ）から探す
+            found = cache.get(cat_name.lower())
+            if found is not None:
+                category_ids.append(found)
+                print(f"    カテゴリ '{cat_name}' 見つかりました (ID: {found})")
+                continue
             
             # 見つからなければ新規作成
-            create_url = f"{site_url}/wp-json/wp/v2/categories"
-            payload = {'name': cat_name}
-            r = requests.post(create_url, json=payload, headers=headers, timeout=30)
-            if r.status_code == 201:
-                new_cat = r.json()
-                category_ids.append(new_cat['id'])
-                print(f"    カテゴリ '{cat_name}' を作成しました (ID: {new_cat['id']})")
-            else:
-                print(f"    カテゴリ '{cat_name}' の作成に失敗: {r.status_code}")
-        
-        except Exception as e:
-            print(f"    カテゴリ '{cat_name}' の処理でエラー: {e}")
+            try:
+                create_url = f"{site_url}/wp-json/wp/v2/categories"
+                payload = {'name': cat_name}
+                r = wp_send('POST', create_url, headers, json=payload)
+                if r.status_code == 201:
+                    new_cat = r.json()
+                    category_ids.append(new_cat['id'])
+                    cache[cat_name.lower()] = new_cat['id']
+                    print(f"    カテゴリ '{cat_name}' を作成しました (ID: {new_cat['id']})")
+                elif r.status_code == 400 and r.json().get('code') == 'term_exists':
+                    # 一覧の取得に失敗していた／別の実行が先に作成した
+                    term_id = r.json().get('data', {}).get('term_id')
+                    category_ids.append(term_id)
+                    cache[cat_name.lower()] = term_id
+                    print(f"    カテゴリ '{cat_name}' は作成済みでした (ID: {term_id})")
+                else:
+                    print(f"    カテゴリ '{cat_name}' の作成に失敗: {r.status_code}")
+            
+            except Exception as e:
+                print(f"    カテゴリ '{cat_name}' の処理でエラー: {e}")
     
     return category_ids
 
+# 失敗レスポンスの本文は先頭だけ読む（WAF のブロックページなど大きな HTML を丸ごと受信・デコードしない）
+def response_excerpt(r, limit=300):
+    head = b''
+    for chunk in r.iter_bytes():
+        head += chunk
+        if len(head) >= limit * 4:
+            break
+    return head.decode(r.encoding or 'utf-8', errors='replace')[:limit]
+
 # WordPress REST API（まず試す）
 def post_to_wordpress_rest(site_url, username, app_password, title, content, slug, categories_str, status='publish'):
     if not site_url:
         return False, "エラー: site_url が空です"
     
-    credentials = f"{username}:{app_password}"
-    token = base64.b64encode(credentials.encode()).decode('utf-8')
-    headers = {'Authorization': f'Basic {token}', 'Content-Type': 'application/json'}
+    headers = auth_headers(username, app_password)
     
     # カテゴリ処理
     category_ids = []
@@ -207,20 +375,39 @@ def post_to_wordpress_rest(site_url, username, app_password, title, content, slu
         payload['categories'] = category_ids
     
     try:
-        r = requests.post(api_url, json=payload, headers=headers, timeout=30)
-    except requests.RequestException as e:
+        r = wp_send('POST', api_url, headers, json=payload, stream=True)
+        try:
+            if r.status_code == 201:
+                r.read()
+                return True, r.json().get('link', '')
+            return False, f"REST失敗: {r.status_code} - {response_excerpt(r)}"
+        finally:
+            r.close()
+    except httpx.HTTPError as e:
         return False, f"REST接続エラー: {e}"
-    if r.status_code == 201:
-        return True, r.json().get('link', '')
-    return False, f"REST失敗: {r.status_code} - {r.text[:300]}"
+
+# XML-RPC のプロキシをエンドポイントごとに使い回す（接続を再利用して TLS ハンドシェイクを省く）
+# ServerProxy は1本の接続を持つのでスレッド間では共有せず、スレッドごとに持つ
+_xmlrpc_local = threading.local()
+
+def xmlrpc_proxy(endpoint):
+    proxies = getattr(_xmlrpc_local, 'proxies', None)
+    if proxies is None:
+        proxies = _xmlrpc_local.proxies = {}
+    if endpoint not in proxies:
+        proxies[endpoint] = ServerProxy(endpoint, allow_none=True)
+    return proxies[endpoint]
 
 # XML-RPC（RESTがダメな環境のフォールバック）
-def post_to_wordpress_xmlrpc(site_url, username, app_password, title, content, slug, categories_str, status='publish'):
+# - リンクは {site_url}/?p=ID をその場で組み立てる（パーマリンクが必要なときだけ pretty_link=True で getPost する）
+# - スラッグからは組み立てない（パーマリンク設定が /%postname%/ 以外だと誤った URL になる。?p=ID はどの設定でも
+#   正規の URL へ転送され、wp-auto-delete.py もこの形式から記事IDを取り出す）
+def post_to_wordpress_xmlrpc(site_url, username, app_password, title, content, slug, categories_str, status='publish', pretty_link=False):
     if not site_url:
         return False, "エラー: site_url が空です"
     endpoint = f"{site_url}/xmlrpc.php"
     try:
-        s = ServerProxy(endpoint)
+        s = xmlrpc_proxy(endpoint)
         blog_id = 0
         
         # カテゴリ処理（XML-RPCではカテゴリ名を直接指定可能）
@@ -243,6 +430,8 @@ def post_to_wordpress_xmlrpc(site_url, username, app_password, title, content, s
             content_struct['terms_names'] = terms_names
         
         post_id = s.wp.newPost(blog_id, username, app_password, content_struct)
+        if not pretty_link:
+            return True, f"{site_url}/?p={post_id}"
         post = s.wp.getPost(blog_id, username, app_password, post_id)
         link = post.get('link') or post.get('permalink') or ''
         return True, link or f"(ID:{post_id})"
@@ -251,20 +440,158 @@ def post_to_wordpress_xmlrpc(site_url, username, app_password, title, content, s
     except Fault as e:
         return False, f"XML-RPC Fault: {e.faultString}"
     except Exception as e:
+        # 接続が壊れている可能性があるので、次回は作り直す
+        getattr(_xmlrpc_local, 'proxies', {}).pop(endpoint, None)
         return False, f"XML-RPC 接続エラー: {e}"
 
-# スプレッドシートを更新
-def update_spreadsheet(sheets_service, row_number, status, post_date, wp_url):
-    sheet = sheets_service.spreadsheets()
-    values = [[status, post_date, wp_url]]
-    body = {'values': values}
-    sheet.values().update(
+# スプレッドシートの更新内容（H:J 列）を1件分作る
+def sheet_update_entry(row_number, status, wp_url):
+    return {
+        'range': f"{SHEET_TAB}!H{row_number}:J{row_number}",
+        'values': [[status, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), wp_url]],
+    }
+
+# 何件たまったらシートに書き込むか（途中で落ちても書き込み済みの分は残る）
+SHEET_FLUSH_EVERY = 20
+
+# たまった更新をまとめて書き込む（N行でも API 呼び出しは1回）
+def flush_sheet_updates(sheets_service, updates):
+    if not updates:
+        return
+    sheets_service.spreadsheets().values().batchUpdate(
         spreadsheetId=SPREADSHEET_ID,
-        range=f"{SHEET_TAB}!H{row_number}:J{row_number}",
-        valueInputOption='RAW',
-        body=body
+        body={'valueInputOption': 'RAW', 'data': updates}
     ).execute()
 
+# 1件を投稿して結果を updates に積む（rendered は document_to_html の結果。スレッドで実行し、ログは1件分まとめて出す）
+def publish_post(post, rendered, post_status, updates):
+    lines = [f"処理中: {post['site_url']}"]
+    try:
+        doc_title, content = rendered
+        final_title = post['title'] if post['title'] else doc_title
+        lines.append(f"  タイトル: {final_title}")
+        lines.append(f"  スラッグ: {post['slug']}")
+        if post['categories']:
+            lines.append(f"  カテゴリ: {post['categories']}")
+
+        # まず REST でトライ
+        ok, result = post_to_wordpress_rest(
+            post['site_url'], post['username'], post['app_password'],
+            final_title, content, post['slug'], post['categories'],
+            status=post_status
+        )
+
+        # RESTが失敗したら XML-RPC に自動フォールバック
+        if not ok and ('rest_not_logged_in' in result or '401' in result or 'Authorization' in result):
+            lines.append("  ↪ RESTが拒否（ヘッダ未通過の可能性）。XML-RPC で再試行します…")
+            ok, result = post_to_wordpress_xmlrpc(
+                post['site_url'], post['username'], post['app_password'],
+                final_title, content, post['slug'], post['categories'],
+                status=post_status
+            )
+    except Exception as e:
+        ok, result = False, str(e)
+        lines.append(f"  ✗ エラー: {result}\n")
+    else:
+        lines.append(f"  ✓ 投稿成功: {result}\n" if ok else f"  ✗ 投稿失敗: {result}\n")
+
+    updates.append(sheet_update_entry(post['row_number'], '済' if ok else '失敗', result))
+    print('\n'.join(lines))
+    return ok
+
+# 同じサイトへの同時投稿数（サイトごとに制限し、全体は並行させる）
+WP_CONCURRENCY_PER_SITE = 4
+
+# 投稿前の疎通確認（サイトごとに1回。落ちているサイトは REST/XML-RPC のタイムアウトを行数ぶん待たずに失敗にする）
+SITE_CHECK_TIMEOUT = 5.0
+
+# 応答が返ればステータスコードは問わず到達可能とみなす。接続できなければエラー内容を返す
+def check_site(site_url):
+    if not site_url:
+        return None  # 空の site_url は投稿処理側でエラーにする
+    try:
+        _HTTP.head(f"{site_url}/wp-json/", timeout=SITE_CHECK_TIMEOUT, follow_redirects=True)
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
+        return str(e) or type(e).__name__
+    return None
+
+async def process_all(posts, docs_service, sheets_service, post_status, updates):
+    """
+    Docs をバッチで取得しながら WordPress へ並行投稿し、シート更新内容を updates に積む
+    投稿はスレッドの中で updates に積むので、中断しても投稿済みの分は記録される
+    SHEET_FLUSH_EVERY 件たまるごとにシートへ書き込み、書き込み済みの件数を返す
+    """
+    # 1) docId を取り出す（URL不正はその行だけ失敗扱い）。同じ docId を使う投稿はまとめる
+    posts_by_doc = {}
+    for post in posts:
+        try:
+            doc_id = extract_doc_id(post['doc_url'])
+        except ValueError as e:
+            print(f"  ✗ エラー: {e}\n")
+            updates.append(sheet_update_entry(post['row_number'], '失敗', str(e)))
+            continue
+        posts_by_doc.setdefault(doc_id, []).append(post)
+    doc_ids = list(posts_by_doc)
+    print(f"Google Docs を取得中...（{len(doc_ids)}件）")
+
+    # サイトの疎通確認を Docs の取得と並行して始めておく
+    site_checks = {
+        site_url: asyncio.create_task(asyncio.to_thread(check_site, site_url))
+        for site_url in {post['site_url'] for post in posts}
+    }
+    site_sems = {}
+
+    async def _one(post, rendered):
+        error = await site_checks[post['site_url']]
+        if error:
+            print(f"処理中: {post['site_url']}\n  ✗ エラー: サイトに接続できません: {error}\n")
+            updates.append(sheet_update_entry(post['row_number'], '失敗', f"サイトに接続できません: {error}"))
+            return
+        sem = site_sems.setdefault(post['site_url'], asyncio.Semaphore(WP_CONCURRENCY_PER_SITE))
+        async with sem:
+            await asyncio.to_thread(publish_post, post, rendered, post_status, updates)
+
+    flushed = 0
+
+    def _flush_if_due():
+        nonlocal flushed
+        if len(updates) - flushed >= SHEET_FLUSH_EVERY:
+            pending = updates[flushed:]
+            flush_sheet_updates(sheets_service, pending)
+            flushed += len(pending)
+
+    # 2) DOCS_BATCH_SIZE 件ずつ取得し、取得できた分からすぐ並行投稿を始める
+    #    （次のバッチの取得と、前のバッチの投稿が重なる。取得失敗はその行だけ失敗扱い）
+    tasks = []
+    for start in range(0, len(doc_ids), DOCS_BATCH_SIZE):
+        chunk = doc_ids[start:start + DOCS_BATCH_SIZE]
+        documents = await asyncio.to_thread(fetch_documents_batch, docs_service, chunk)
+        for doc_id in chunk:
+            document = documents.get(doc_id)
+            if document is None or isinstance(document, Exception):
+                for post in posts_by_doc[doc_id]:
+                    print(f"処理中: {post['site_url']}\n  ✗ エラー: ドキュメント取得失敗: {document}\n")
+                    updates.append(sheet_update_entry(post['row_number'], '失敗', f"ドキュメント取得失敗: {document}"))
+                continue
+            # 同じドキュメントを複数サイトへ投稿する場合も、HTML化は1回だけ
+            rendered = document_to_html(document)
+            for post in posts_by_doc[doc_id]:
+                tasks.append(asyncio.create_task(_one(post, rendered)))
+        _flush_if_due()
+
+    for fut in asyncio.as_completed(tasks):
+        await fut
+        _flush_if_due()
+    return flushed
+
+def print_summary(updates, header):
+    success_count = sum(1 for u in updates if u['values'][0][0] == '済')
+    print("=" * 50)
+    print(header)
+    print(f"成功: {success_count}件")
+    print(f"失敗: {len(updates) - success_count}件")
+    print("=" * 50)
+
 # メイン処理
 def main():
     # コマンドライン引数の設定
@@ -288,80 +615,19 @@ def main():
         return
 
     print(f"{len(posts)}件の記事を投稿します。\n")
-    success_count = 0
-    failed_count = 0
-
-    for post in posts:
-        try:
-            print(f"処理中: {post['site_url']}")
-            doc_title, content = get_document_content(docs_service, post['doc_url'])
-            final_title = post['title'] if post['title'] else doc_title
-            print(f"  タイトル: {final_title}")
-            print(f"  スラッグ: {post['slug']}")
-            if post['categories']:
-                print(f"  カテゴリ: {post['categories']}")
-
-            # まず REST でトライ
-            ok, result = post_to_wordpress_rest(
-                post['site_url'], post['username'], post['app_password'],
-                final_title, content, post['slug'], post['categories'], 
-                status=post_status
-            )
+    updates = []
+    flushed = None
 
-            # RESTが失敗したら XML-RPC に自動フォールバック
-            if not ok and ('rest_not_logged_in' in result or '401' in result or 'Authorization' in result):
-                print("  ↪ RESTが拒否（ヘッダ未通過の可能性）。XML-RPC で再試行します…")
-                ok, result = post_to_wordpress_xmlrpc(
-                    post['site_url'], post['username'], post['app_password'],
-                    final_title, content, post['slug'], post['categories'],
-                    status=post_status
-                )
-
-            if ok:
-                print(f"  ✓ 投稿成功: {result}\n")
-                update_spreadsheet(
-                    sheets_service,
-                    post['row_number'],
-                    '済',
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    result
-                )
-                success_count += 1
-            else:
-                print(f"  ✗ 投稿失敗: {result}\n")
-                update_spreadsheet(
-                    sheets_service,
-                    post['row_number'],
-                    '失敗',
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    result
-                )
-                failed_count += 1
-
-        except KeyboardInterrupt:
-            print("\n\n処理を中断しました。")
-            print("=" * 50)
-            print("中断時点の結果")
-            print(f"成功: {success_count}件")
-            print(f"失敗: {failed_count}件")
-            print("=" * 50)
-            sys.exit(0)
-        except Exception as e:
-            print(f"  ✗ エラー: {str(e)}\n")
-            update_spreadsheet(
-                sheets_service,
-                post['row_number'],
-                '失敗',
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                str(e)
-            )
-            failed_count += 1
+    try:
+        flushed = asyncio.run(process_all(posts, docs_service, sheets_service, post_status, updates))
+    except KeyboardInterrupt:
+        print("\n\n処理を中断しました。")
+    finally:
+        # 中断・例外でも、そこまでの結果は必ず書き込む
+        # （どこまで書き込んだか分からないときは全件書き直す。同じ値なので重複しても問題ない）
+        flush_sheet_updates(sheets_service, updates if flushed is None else updates[flushed:])
 
-    print("=" * 50)
-    print("処理完了")
-    print(f"成功: {success_count}件")
-    print(f"失敗: {failed_count}件")
-    print("=" * 50)
+    print_summary(updates, "処理完了" if flushed is not None else "中断時点の結果")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()